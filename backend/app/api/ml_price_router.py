@@ -1,9 +1,33 @@
 import os
+import logging
+import math
+import tempfile
+import threading
+import time
 from pathlib import Path
-from typing import List, Optional
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field, field_validator
-from app.ml.predictor import load_model, predict_one
+from typing import List, Literal, Optional
+import numpy as np
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from starlette.datastructures import UploadFile
+from app.ml.cache import PredictionCache, payload_key
+from app.ml.registry import ModelRegistry, _id_from_stem
+from app.ml.sidecar import SidecarClient, SidecarError
+from app.ml.batcher import MicroBatcher
+from app.ml.jobs import MEDIA_TYPES, JobError, JobManager
+from app.ml.postprocess import (
+    NEIGHBORHOOD_BLEND, FURNISHED_ALL_PTYPES, FURNISHED_ANCHOR, UNFURNISHED_PCT,
+    APT_FURNISHED_CAP, APT_FURNISHED_FLOOR, APT_FURNISHED_BOOST,
+    APT_GF_PREMIUM, APT_UP_STEP, APT_B1_DROP, APT_DOWN_STEP, APT_UP_CAP, APT_DOWN_CAP,
+    HV_STORIES_STEP, HV_STORIES_CAP, MARKET_BLEND,
+    apply_rules, controlled_variants, rule_inputs,
+)
+from app.ml import threads as ml_threads
+from app.ml.normalize import normalize as _normalize, normalize_records
+
+log = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/ml/price", tags=["ml:price"])
 
@@ -12,54 +36,182 @@ PTYPES = {"Apartment", "House", "Townhouse", "Villa", "Farm"}
 BASE_DIR = Path(__file__).resolve().parents[2]
 DEFAULT_MODEL = BASE_DIR / "models" / "aqarak_price_model_latest.joblib"
 MODEL_PATH = Path(os.getenv("AQARAK_MODEL_PATH", str(DEFAULT_MODEL))).expanduser()
-NEIGHBORHOOD_BLEND = 0.85
-FURNISHED_ALL_PTYPES = True
-FURNISHED_ANCHOR = "furnished"
-UNFURNISHED_PCT = 0.107
-APT_FURNISHED_CAP = 0.15
-APT_FURNISHED_FLOOR = 0.08
-APT_FURNISHED_BOOST = 2.0
-
-APT_GF_PREMIUM = 0.11
-APT_UP_STEP = 0.035
-APT_B1_DROP = 0.20
-APT_DOWN_STEP = 0.035
-APT_UP_CAP= 0.20
-APT_DOWN_CAP= 0.35
-HV_STORIES_STEP = 0.05
-HV_STORIES_CAP  = 0.15
-MARKET_BLEND= 0.35
-
-_PSQM_BASE = {
-    ("amman", "abdoun", "apartment"): 950.0,
-    ("amman", "khalda", "apartment"): 700.0,
-    ("amman", "jubihaa", "apartment"): 520.0,
-    ("amman", "khalda", "villa"): 900.0,
-}
-_PSQM_CITY_FALLBACK = {"amman": 500.0}
-_PSQM_GLOBAL_FALLBACK = 450.0
-
-_model = None
+_cache = PredictionCache(
+    maxsize=int(os.getenv("AQARAK_PRED_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("AQARAK_PRED_CACHE_TTL", "600")),
+    redis_url=os.getenv("AQARAK_PRED_CACHE_REDIS") or None,
+)
+
+def _load_model(path: str):
+    # imported lazily: workers talking to the sidecar never pull in pandas/sklearn/xgboost
+    from app.ml.predictor import load_model
+    return ml_threads.apply(load_model(path))
+
+_registry = ModelRegistry(
+    BASE_DIR / "models",
+    load_fn=_load_model,
+    predict_fn=lambda model, rows: _predict_controlled_batch(model, rows),
+    log_path=os.getenv("AQARAK_SHADOW_LOG") or None,
+)
+SHADOW_MODEL_ID = os.getenv("AQARAK_SHADOW_MODEL", "")
+ML_SOCKET = os.getenv("AQARAK_ML_SOCKET", "")
+_sidecar: Optional[SidecarClient] = SidecarClient(ML_SOCKET) if ML_SOCKET else None
+
+def _model_id_for(p: Path) -> str:
+    return _id_from_stem(Path(p).resolve().stem)
+
+class _ModelState:
+    """what's being served; swapped as one reference so readers never see a mix"""
+    __slots__ = ("model", "model_id", "path", "sig")
+
+    def __init__(self, model, model_id: str, path: Path, sig: tuple):
+        self.model, self.model_id, self.path, self.sig = model, model_id, path, sig
+
+_state: Optional[_ModelState] = None
+_model_lock = threading.Lock()
+_reload_lock = threading.Lock()
+MODEL_WATCH_S = float(os.getenv("AQARAK_MODEL_WATCH_S", "10"))
+ADMIN_TOKEN = os.getenv("AQARAK_ADMIN_TOKEN", "")
+
+def _resolve_model_path() -> Path:
+    p = MODEL_PATH
+    models_dir = BASE_DIR / "models"
+    try:
+        target_missing = p.is_symlink() and not p.resolve().exists()
+    except Exception:
+        target_missing = False
+    if (not p.exists()) or target_missing:
+        cands = sorted(
+            models_dir.glob("aqarak_price_model_*.joblib"),
+            key=lambda x: x.stat().st_mtime,
+            reverse=True,
+        )
+        if not cands:
+            raise FileNotFoundError(f"No model found at {MODEL_PATH} or in {models_dir}")
+        p = cands[0]
+    return p
+
+def _model_sig(p: Path) -> tuple:
+    st = os.stat(p)
+    return (str(Path(p).resolve()), st.st_ino, st.st_mtime_ns)
+
+def _get_state() -> _ModelState:
+    global _state
+    st = _state
+    if st is not None:
+        return st
+    with _model_lock:
+        if _state is None:
+            p = _resolve_model_path()
+            sig = _model_sig(p)
+            _state = _ModelState(_load_model(str(p)), _model_id_for(p), p, sig)
+        return _state
+
 def _get_model():
-    global _model
-    if _model is None:
-        p = MODEL_PATH
-        models_dir = BASE_DIR / "models"
+    return _get_state().model
+
+_ready = threading.Event()
+_WARMUP_ROWS = [
+    {"bedrooms": 3, "bathrooms": 2, "area_sqm": 150.0, "floor": 2.0, "building_age": 10.0,
+     "city": "Amman", "neighborhood": "Khalda", "property_type": "Apartment", "furnished": False},
+    {"bedrooms": 5, "bathrooms": 4, "area_sqm": 450.0, "floor": 2.0, "building_age": 5.0,
+     "city": "Amman", "neighborhood": "Dabouq", "property_type": "Villa", "furnished": True},
+    {"bedrooms": 2, "bathrooms": 1, "area_sqm": 90.0, "floor": 0.0, "building_age": 20.0,
+     "city": "Irbid", "neighborhood": "", "property_type": "Apartment", "furnished": False},
+]
+
+def _smoke(model) -> None:
+    """warm a model on synthetic rows; raises if it can't produce sane prices"""
+    rows = [_normalize(dict(r)) for r in _WARMUP_ROWS]
+    ys = _predict_controlled_batch(model, rows)
+    for r in rows:
+        _predict_controlled(model, r)
+    if not (np.all(np.isfinite(ys)) and np.all(ys > 0)):
+        raise ValueError(f"smoke prediction failed: {ys.tolist()}")
+
+def _wait_for_sidecar(timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if _sidecar.info().get("ready"):
+                _ready.set()
+                log.info("price model sidecar %s ready (%s)", ML_SOCKET, _sidecar.model_id)
+                return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    log.error("price model sidecar %s not ready after %.0fs", ML_SOCKET, timeout)
+
+def warm_up() -> None:
+    """load the model and push a few synthetic rows through it (bypassing the cache)"""
+    if _sidecar is not None:
+        _wait_for_sidecar()
+        return
+    try:
+        _smoke(_get_model())
+        _ready.set()
+        log.info("price model %s warmed up", _get_state().model_id)
+    except Exception as e:
+        log.exception("price model warm-up failed: %s", e)
+    if SHADOW_MODEL_ID:
         try:
-            target_missing = p.is_symlink() and not p.resolve().exists()
-        except Exception:
-            target_missing = False
-        if (not p.exists()) or target_missing:
-            cands = sorted(
-                models_dir.glob("aqarak_price_model_*.joblib"),
-                key=lambda x: x.stat().st_mtime,
-                reverse=True,
-            )
-            if not cands:
-                raise FileNotFoundError(f"No model found at {MODEL_PATH} or in {models_dir}")
-            p = cands[0]
-        _model = load_model(str(p))
-    return _model
+            _registry.set_shadow(SHADOW_MODEL_ID)
+        except KeyError as e:
+            log.warning("shadow model disabled: %s", e)
+
+def start_warm_up() -> threading.Thread:
+    if _sidecar is None:
+        ml_threads.limit_serving_pools()
+    t = threading.Thread(target=warm_up, name="price-model-warmup", daemon=True)
+    t.start()
+    return t
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+def local_info() -> dict:
+    """what the sidecar reports over the socket"""
+    return {"ready": is_ready(), "model_id": _state.model_id if _state else None,
+            "cache": _cache.stats(), "pid": os.getpid()}
+
+def reload_model(force: bool = False) -> dict:
+    """
+    Load whatever MODEL_PATH points at now, smoke-test and warm it, then swap
+    it in. In-flight requests keep the state they already read.
+    """
+    global _state
+    with _reload_lock:
+        p = _resolve_model_path()
+        sig = _model_sig(p)
+        cur = _state
+        if cur is not None and cur.sig == sig and not force:
+            return {"reloaded": False, "model_id": cur.model_id}
+        new = _ModelState(_load_model(str(p)), _model_id_for(p), p, sig)
+        _smoke(new.model)
+        with _model_lock:
+            old, _state = _state, new
+        _cache.clear()
+    _ready.set()
+    log.info("price model swapped: %s -> %s", old.model_id if old else None, new.model_id)
+    return {"reloaded": True, "model_id": new.model_id,
+            "previous_model_id": old.model_id if old else None}
+
+def _watch_model(interval: float) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            if _state is not None and _model_sig(_resolve_model_path()) != _state.sig:
+                reload_model()
+        except Exception as e:
+            log.warning("price model reload skipped: %s", e)
+
+def start_model_watcher() -> Optional[threading.Thread]:
+    """poll the MODEL_PATH target (symlink, inode, mtime); AQARAK_MODEL_WATCH_S=0 turns it off"""
+    if MODEL_WATCH_S <= 0 or _sidecar is not None:
+        return None
+    t = threading.Thread(target=_watch_model, args=(MODEL_WATCH_S,), name="price-model-watch", daemon=True)
+    t.start()
+    return t
 
 class PriceInput(BaseModel):
     bedrooms: int = Field(ge=0)
@@ -81,241 +233,326 @@ class PriceInput(BaseModel):
             raise ValueError(f"property_type must be one of {sorted(PTYPES)}")
         return v2
 
-_NEIGH_MAP = {
-    "shmesani": "Shmaisani",
-    "um uthina": "Um Uthaiena",
-    "rabieh": "Al Rabiah",
-    "swefieh": "Swefieh",
-    "abdoun": "Abdoun",
-    "abdoun al janobi": "Abdoun",
-    "abdoun al shamali": "Abdoun",
-    "dabouq": "Dabouq",
-    "deir ghbar": "Deir Ghbar",
-    "mecca st": "Mecca St",
-    "mecca street": "Mecca St",
-    "mecca": "Mecca St",
-    "jabal amman": "Jabal Amman",
-    "khalda": "Khalda",
-    "tla ali": "Tla Ali",
-    "tla al ali": "Tla Ali",
-    "tla al ali al shamali": "Tla Ali",
-    "tla al ali al sharqi": "Tla Ali",
-    "jubeiha": "Jubaiha",
-    "jubaiha": "Jubaiha",
-    "university": "University District",
-    "university street": "University District",
-    "seventh circle": "7th Circle",
-    "7th circle": "7th Circle",
-    "al gardens": "Gardens",
-    "gardens": "Gardens",
-    "um uthaiena al gharbi": "Um Uthaiena",
-    "um uthaiena al sharqi": "Um Uthaiena",
-    "nazzal": "Hai Nazzal",
-    "yasmeen": "Daheit Al Yasmeen",
-    "al yasmeen": "Daheit Al Yasmeen",
-    "rasheed": "Daheit Al Rasheed",
-    "al rasheed": "Daheit Al Rasheed",
-    "hussain": "Jabal Al Hussain",
-    "jabal hussain": "Jabal Al Hussain",
-    "lweibdeh": "Jabal Al-Lweibdeh",
-    "al lweibdeh": "Jabal Al-Lweibdeh",
-    "nuzha": "Jabal Al Nuzha",
-    "al nuzha": "Jabal Al Nuzha",
-    "taj": "Jabal Al-Taj",
-    "al taj": "Jabal Al-Taj",
-    "bayader": "Al Bayader",
-    "al bayader wadi al seer": "Al Bayader",
-    "bnayyat": "Al Bnayyat",
-    "jandaweel": "Al Jandaweel",
-    "kursi": "Al Kursi",
-    "rawnaq": "Al Rawnaq",
-    "ridwan": "Al Ridwan",
-    "urdon st": "Al Urdon Street",
-    "urdon street": "Al Urdon Street",
-    "yadudah": "Al Yadudah",
-    "summaq": "Um El Summaq",
-    "um summaq": "Um El Summaq",
-    "umm summaq": "Um El Summaq",
-    "bunayat": "Al Bnayyat",
-    "jubeiha": "Jubaiha",
-    "jubaiha": "Jubaiha",
-    "university": "University District",
-    "ashrafyeh": "Al Ashrafyeh",
-    "al ashrafyeh": "Al Ashrafyeh",
-    "muqabalain": "Al Muqabalain",
-    "al muqabalain": "Al Muqabalain",
-    "qwaismeh": "Al Qwaismeh",
-    "al qwaismeh": "Al Qwaismeh",
-    "nakheel": "Dahiet Al-Nakheel",
-    "al nakheel": "Dahiet Al-Nakheel",
-    "rawda": "Dahiet Al-Rawda",
-    "al rawda": "Dahiet Al-Rawda",
-    "zohor": "Jabal Al Zohor",
-    "al zohor": "Jabal Al Zohor",
-    "zohoor": "Jabal Al Zohor",
-    "al zohoor": "Jabal Al Zohor",
-    "nathif": "Jabal Al-Nathif",
-    "al nathif": "Jabal Al-Nathif",
-    "marj al hamam": "Marj El Hamam",
-    "tabarbour": "Tabarboor",
-    "kamaliya": "Al Kamaliya",
-    "al kamaliya": "Al Kamaliya",
-    "haj hassan": "Daheit Al-Haj Hassan",
-    "al haj hassan": "Daheit Al-Haj Hassan",
-    "ameer hasan": "Daheit Al Ameer Hasan",
-    "al ameer hasan": "Daheit Al Ameer Hasan",
-}
-
-def _fix_neighborhood(n: str) -> str:
-    s = str(n).strip().lower()
-    if s in _NEIGH_MAP:
-        return _NEIGH_MAP[s]
-    return s.title()
-
-def _normalize(d: dict) -> dict:
-    if "neighborhood" in d:
-        d["neighborhood"] = _fix_neighborhood(d["neighborhood"])
-
-    pt = str(d.get("property_type","")).title()
-    if pt in {"House","Villa","Townhouse"} and d.get("floor") is None:
-        tf = d.get("total_floors")
-        if tf is not None:
-            d["floor"] = tf
-    d.pop("total_floors", None)
-    try:
-        a = float(d.get("area_sqm", None))
-        if a > 0:
-            d["area_sq"] = a * a
-    except (TypeError, ValueError):
-        pass
-    
-    return d
-    
-def _norm(s) -> str:
-    return str(s or "").strip().lower()
-def _psqm_baseline(payload: dict) -> float:
-    city = _norm(payload.get("city"))
-    nb   = _norm(payload.get("neighborhood"))
-    pt   = _norm(payload.get("property_type"))
-    v = _PSQM_BASE.get((city, nb, pt))
-    if v: return float(v)
-    v = _PSQM_BASE.get((city, nb, "*")) or _PSQM_BASE.get((city, "*", pt))
-    if v: return float(v)
-    if city in _PSQM_CITY_FALLBACK:
-        return float(_PSQM_CITY_FALLBACK[city])
-    return float(_PSQM_GLOBAL_FALLBACK)
-
-def _market_blend(y: float, payload: dict) -> float:
-    """Lift predictions toward area×neighborhood per-sqm floor"""
-    try:
-        area = float(payload.get("area_sqm") or 0.0)
-    except Exception:
-        area = 0.0
-    if area <= 0 or y <= 0:
-        return y
-    psqm_floor = max(1.0, _psqm_baseline(payload))
-    y_market = psqm_floor * area
-    if y_market <= y:
-        return y
-    ratio = y_market / y
-    return float(y * (ratio ** MARKET_BLEND))  
-
-def _apply_neigh_blend(model, payload: dict, blend: float) -> float:
-    neutral = dict(payload); neutral["neighborhood"] = ""
-    y0 = float(predict_one(model, neutral))
-    y1 = float(predict_one(model, payload))
-    y = float(y0 + blend * (y1 - y0))
-    return _market_blend(y, payload)
-
-def _apt_floor_factor(floor) -> float:
-    try:
-        f = int(round(float(floor)))
-    except Exception:
-        return 1.0
-    if f == 0:
-        return 1.0 + APT_GF_PREMIUM
-    if f > 0:
-        steps = max(0, f - 1)
-        drop = min(APT_UP_CAP, steps * APT_UP_STEP)
-        return max(0.0, 1.0 - drop)
-    if f == -1:
-        return max(0.0, 1.0 - APT_B1_DROP)
-    extra = abs(f) - 1
-    base = max(0.0, 1.0 - APT_B1_DROP)
-    factor = base * ((1.0 - APT_DOWN_STEP) ** extra)
-    min_cap = 1.0 - APT_B1_DROP - APT_DOWN_CAP
-    return max(min_cap, factor)
-
-def _hv_stories_factor(floor) -> float:
-    try:
-        stories = max(1, int(round(float(floor or 1))))
-    except Exception:
-        stories = 1
-    inc = min(HV_STORIES_CAP, (stories - 1) * HV_STORIES_STEP)
-    return 1.0 + inc
-
-def _apply_floor_adj(y: float, floor, pt) -> float:
-    if str(pt).title() == "Apartment":
-        return float(max(0.0, y) * _apt_floor_factor(floor))
-    if str(pt).title() in {"House", "Villa", "Townhouse"}:
-        return float(max(0.0, y) * _hv_stories_factor(floor))
-    return float(max(0.0, y))
+def _predict_controlled_batch(model, payloads: List[dict]) -> np.ndarray:
+    """
+    Controlled prediction for many rows: every row's four variants go
+    through one predict_batch call, the rules run on whole arrays.
+    """
+    from app.ml.predictor import predict_batch
+    if not payloads:
+        return np.zeros(0, dtype=float)
+    bases = [{k: v for k, v in p.items() if v is not None} for p in payloads]
+    variants: List[dict] = []
+    for b in bases:
+        variants.extend(controlled_variants(b))
+    return apply_rules(predict_batch(model, variants), rule_inputs(bases))
 
 def _predict_controlled(model, payload: dict) -> float:
-    base = {k: v for k, v in payload.items() if v is not None}
-    pt = str(base.get("property_type", "")).strip().title()
-    p_t = dict(base); p_t["furnished"] = True
-    p_f = dict(base); p_f["furnished"] = False
-    y_t = _apply_neigh_blend(model, p_t, NEIGHBORHOOD_BLEND)
-    y_f = _apply_neigh_blend(model, p_f, NEIGHBORHOOD_BLEND)
-    apply_furn = FURNISHED_ALL_PTYPES or pt == "Apartment"
-    if not apply_furn:
-        y = y_t if base.get("furnished", False) else y_f
-        return _apply_floor_adj(y, base.get("floor"), pt)
-    if FURNISHED_ANCHOR == "furnished":
-        if base.get("furnished", False):
-            return _apply_floor_adj(y_t, base.get("floor"), pt)
-        uf = y_t * (1.0 - UNFURNISHED_PCT)
-        return _apply_floor_adj(uf, base.get("floor"), pt)
-    mid = 0.5 * (y_t + y_f)
-    cap_amt   = abs(APT_FURNISHED_CAP)   * max(1.0, mid)
-    floor_amt = abs(APT_FURNISHED_FLOOR) * max(1.0, mid)
-    raw_delta = (y_t - y_f) * max(0.0, APT_FURNISHED_BOOST)
-    target = (min(max(raw_delta, floor_amt), cap_amt)
-              if raw_delta >= 0 else
-              max(min(raw_delta, -floor_amt), -cap_amt))
-    final_f  = _apply_floor_adj(y_f + target,  base.get("floor"), pt)
-    final_uf = _apply_floor_adj(y_t - target,  base.get("floor"), pt)
-    return float(final_f if base.get("furnished", False) else final_uf)
+    return float(_predict_controlled_batch(model, [payload])[0])
+
+def _predict_cached(payloads: List[dict]) -> np.ndarray:
+    """_predict_controlled_batch behind the prediction cache; only misses hit the model"""
+    if _sidecar is not None:
+        # the sidecar owns model, cache and shadow
+        return _sidecar.predict(payloads)
+    state = _get_state()
+    keys = [payload_key(state.model_id, p) for p in payloads]
+    out = np.empty(len(payloads), dtype=float)
+    miss = []
+    for i, k in enumerate(keys):
+        v = _cache.get(k)
+        if v is None:
+            miss.append(i)
+        else:
+            out[i] = v
+    if miss:
+        ys = _predict_controlled_batch(state.model, [payloads[i] for i in miss])
+        for i, y in zip(miss, ys):
+            out[i] = y
+            _cache.set(keys[i], float(y))
+    _registry.submit_shadow(payloads, out)
+    return out
+
+_batcher = MicroBatcher(
+    _predict_cached,
+    max_rows=int(os.getenv("AQARAK_BATCH_MAX_ROWS", "64")),
+    window_s=float(os.getenv("AQARAK_BATCH_WINDOW_MS", "2")) / 1000.0,
+)
 
 class BatchRequest(BaseModel):
     rows: List[PriceInput]
 
 @router.post("/predict")
-def predict(inp: PriceInput):
+async def predict(inp: PriceInput):
     try:
         payload = _normalize(inp.model_dump())
-        y = _predict_controlled(_get_model(), payload)
+        y = await _batcher.submit(payload)
         return {"price_jod": round(max(0.0, y), 2)}
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Prediction error: {e}")
+        log.exception("prediction failed: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/predict-batch")
 def predict_many(req: BatchRequest):
     try:
-        rows = [_normalize(r.model_dump()) for r in req.rows]
-        ys = [_predict_controlled(_get_model(), r) for r in rows]
-        return {"prices_jod": [round(max(0.0, v), 2) for v in ys]}
+        rows = normalize_records([r.model_dump() for r in req.rows])
+        ys = _predict_cached(rows)
+        return {"prices_jod": [round(max(0.0, float(v)), 2) for v in ys]}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _predict_uncached(payloads: List[dict]) -> np.ndarray:
+    """bulk scoring: skips the cache (and shadow) so a 50k-row file doesn't evict live traffic"""
+    if _sidecar is not None:
+        return _sidecar.predict(payloads)
+    return _predict_controlled_batch(_get_state().model, payloads)
+
+class JobRow(PriceInput):
+    """bulk rows may leave bedrooms/bathrooms/furnished empty, like the listings data; the featurizer fills them"""
+    bedrooms: Optional[int] = Field(default=None, ge=0)
+    bathrooms: Optional[int] = Field(default=None, ge=0)
+    furnished: Optional[bool] = None
+
+_INT_FIELDS = {"bedrooms", "bathrooms"}
+
+def _job_payload(raw: dict) -> dict:
+    """one uploaded row (csv strings or json values) -> validated payload; normalized per chunk"""
+    clean = {}
+    for k in JobRow.model_fields:
+        v = raw.get(k)
+        if v is None or (isinstance(v, str) and v.strip().lower() in ("", "nan", "none", "null")):
+            continue
+        if k in _INT_FIELDS:
+            try:
+                v = int(float(v))
+            except (TypeError, ValueError):
+                raise ValueError(f"{k}: not a number ({v!r})")
+        clean[k] = v
+    try:
+        row = JobRow.model_validate(clean)
+    except ValidationError as e:
+        raise ValueError("; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    return row.model_dump()
+
+_jobs = JobManager(
+    Path(os.getenv("AQARAK_JOBS_DIR") or Path(tempfile.gettempdir()) / "aqarak-price-jobs"),
+    prepare_fn=_job_payload,
+    predict_fn=lambda rows: _predict_uncached(normalize_records(rows)),
+    chunk_rows=int(os.getenv("AQARAK_JOBS_CHUNK_ROWS", "2000")),
+    workers=int(os.getenv("AQARAK_JOBS_WORKERS", "1")),
+    max_bytes=int(os.getenv("AQARAK_JOBS_MAX_MB", "512")) << 20,
+    ttl_s=float(os.getenv("AQARAK_JOBS_TTL_S", "86400")),
+    max_jobs=int(os.getenv("AQARAK_JOBS_MAX", "100")),
+)
+JOBS_FORM_OVERHEAD = 64 << 10  # multipart boundary and part headers on top of the file itself
+
+_UPLOAD_SCHEMA = {"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file"],
+    "properties": {"file": {"type": "string", "format": "binary"}}}}}}}
+
+@router.post("/jobs", status_code=202, openapi_extra=_UPLOAD_SCHEMA)
+async def create_job(request: Request):
+    """
+    CSV (same columns as data/eval-cleaned-data.csv) or NDJSON as multipart
+    field `file`; poll /jobs/{id}, then GET /jobs/{id}/result. The size cap is
+    checked on Content-Length before the body is read.
+    """
+    try:
+        size = int(request.headers["content-length"])
+    except KeyError:
+        raise HTTPException(status_code=411, detail="Content-Length required")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bad Content-Length")
+    if size > _jobs.max_bytes + JOBS_FORM_OVERHEAD:
+        raise HTTPException(status_code=413, detail=f"upload exceeds {_jobs.max_bytes >> 20} MB")
+    async with request.form(max_files=1, max_fields=10) as form:
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=422, detail="multipart field 'file' is required")
+        try:
+            job = await run_in_threadpool(_jobs.create, file.filename, file.content_type)
+        except JobError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            await run_in_threadpool(_jobs.spool, job, file.file)
+        except Exception as e:
+            await run_in_threadpool(_jobs.discard, job)
+            if isinstance(e, JobError):
+                raise HTTPException(status_code=413, detail=str(e))
+            raise
+    await run_in_threadpool(_jobs.submit, job)
+    return job.summary()
+
+def _job_or_404(job_id: str):
+    job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return _job_or_404(job_id).summary()
+
+@router.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = _job_or_404(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"job is {job.status}")
+    return FileResponse(job.result_path, media_type=MEDIA_TYPES[job.fmt],
+                        filename=f"prices_{job.job_id}.{job.fmt}")
+
+@router.delete("/jobs/{job_id}", status_code=204)
+def delete_job(job_id: str):
+    if not _jobs.delete(job_id):
+        raise HTTPException(status_code=404, detail="job not found")
+
+SURFACE_MAX_POINTS = int(os.getenv("AQARAK_SURFACE_MAX_POINTS", "2500"))
+_SURFACE_INT_FIELDS = {"bedrooms", "bathrooms"}
+
+class SurfaceAxis(BaseModel):
+    field: Literal["area_sqm", "floor", "building_age", "furnished", "bedrooms", "bathrooms"]
+    start: Optional[float] = None
+    stop: Optional[float] = None
+    step: Optional[float] = None
+    values: Optional[List[float]] = Field(default=None, max_length=SURFACE_MAX_POINTS)
+
+    def size(self) -> int:
+        """number of points, worked out from start/stop/step without building them"""
+        if self.values is not None:
+            return len(self.values)
+        if self.field == "furnished":
+            return 2
+        if self.start is None or self.stop is None or not self.step or self.step <= 0:
+            raise ValueError(f"{self.field}: give values, or start/stop and a positive step")
+        if self.stop < self.start:
+            raise ValueError(f"{self.field}: stop < start")
+        n = np.floor((self.stop - self.start) / self.step + 1e-9) + 1
+        if not np.isfinite(n) or n > SURFACE_MAX_POINTS:
+            raise ValueError(f"{self.field}: {n:.0f} points exceeds {SURFACE_MAX_POINTS}")
+        return int(n)
+
+    def points(self) -> list:
+        n = self.size()
+        if self.field == "furnished":
+            vals = self.values if self.values is not None else [0, 1]
+            return [bool(v) for v in vals]
+        if self.values is not None:
+            vals = list(self.values)
+        else:
+            vals = (self.start + self.step * np.arange(n)).round(6).tolist()
+        if not vals:
+            raise ValueError(f"{self.field}: no points")
+        if self.field in _SURFACE_INT_FIELDS:
+            vals = [int(round(v)) for v in vals]
+        if self.field == "area_sqm" and min(vals) <= 0:
+            raise ValueError("area_sqm must be > 0")
+        if self.field in _SURFACE_INT_FIELDS and min(vals) < 0:
+            raise ValueError(f"{self.field} must be >= 0")
+        return vals
+
+class SurfaceRequest(BaseModel):
+    base: PriceInput
+    axes: List[SurfaceAxis] = Field(min_length=1, max_length=2)
+
+@router.post("/surface")
+def price_surface(req: SurfaceRequest):
+    """
+    Prices over a 1-D or 2-D grid of one or two fields around a base listing,
+    scored in one batch call. prices_jod[i][j] is axes[0].values[i] x axes[1].values[j].
+    """
+    if len({a.field for a in req.axes}) != len(req.axes):
+        raise HTTPException(status_code=400, detail="axes must sweep different fields")
+    try:
+        shape = tuple(a.size() for a in req.axes)
+        if math.prod(shape) > SURFACE_MAX_POINTS:
+            raise ValueError(f"grid {'x'.join(map(str, shape))} exceeds {SURFACE_MAX_POINTS} points")
+        grids = [a.points() for a in req.axes]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    base = req.base.model_dump()
+    fields = [a.field for a in req.axes]
+    rows = []
+    for idx in np.ndindex(*shape):
+        r = dict(base)
+        for f, g, i in zip(fields, grids, idx):
+            r[f] = g[i]
+        rows.append(r)
+    normalize_records(rows)
+    try:
+        ys = np.maximum(0.0, _predict_uncached(rows)).round(2).reshape(shape)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "axes": [{"field": f, "values": g} for f, g in zip(fields, grids)],
+        "prices_jod": ys.tolist(),
+        "model_id": _primary_id(),
+    }
+
+def _require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN or token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="forbidden")
+
+def _require_local():
+    if _sidecar is not None:
+        raise HTTPException(status_code=409, detail=f"model is served by the sidecar at {ML_SOCKET}")
+
+def _cache_stats() -> dict:
+    """the cache that actually serves: the sidecar's in client mode"""
+    if _sidecar is None:
+        return _cache.stats()
+    try:
+        return _sidecar.info().get("cache") or {}
+    except (OSError, SidecarError) as e:
+        return {"error": f"sidecar unreachable: {e}"}
+
+def _primary_id() -> Optional[str]:
+    if _sidecar is not None:
+        return _sidecar.model_id
+    return _state.model_id if _state else None
+
+@router.post("/reload")
+def reload(force: bool = False, x_admin_token: Optional[str] = Header(default=None)):
+    _require_admin(x_admin_token)
+    _require_local()
+    try:
+        return reload_model(force=force)
+    except Exception as e:
+        raise HTTPException(status_code=409, detail=f"reload rejected, still serving previous model: {e}")
+
+@router.get("/models")
+def list_models():
+    _registry.refresh()
+    sh = _registry.shadow
+    return {
+        "primary": _primary_id(),
+        "shadow": sh.entry.model_id if sh else None,
+        "models": [e.summary() for e in _registry.entries()],
+    }
+
+@router.get("/shadow")
+def shadow_stats():
+    sh = _registry.shadow
+    return sh.stats() if sh else {"model_id": None}
+
+@router.post("/shadow")
+def set_shadow(model_id: str = "", x_admin_token: Optional[str] = Header(default=None)):
+    _require_admin(x_admin_token)
+    _require_local()
+    try:
+        sh = _registry.set_shadow(model_id or None)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"shadow": sh.entry.model_id if sh else None}
+
 @router.get("/meta")
 def price_meta():
     return {
         "model_path": str(MODEL_PATH),
+        "model_id": _primary_id(),
+        "sidecar": ML_SOCKET or None,
+        "cache": _cache_stats(),
+        "batcher": _batcher.stats(),
+        "threads": ml_threads.budget(),
         "neighborhood_blend": NEIGHBORHOOD_BLEND,
         "furnished": {
             "all_ptypes": FURNISHED_ALL_PTYPES,
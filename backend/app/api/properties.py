@@ -600,7 +600,7 @@ def estimate_price(inp: MLPriceInput):
         if payload.get("building_age") is None:
             payload["building_age"] = 10.0
 
-        y = ml._predict_controlled(ml._get_model(), payload)
+        y = float(ml._predict_cached([payload])[0])
         return {"price_jod": round(max(0.0, y), 2)}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
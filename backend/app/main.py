@@ -2,6 +2,7 @@ import os
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi_limiter import FastAPILimiter
 import redis.asyncio as redis
@@ -13,6 +14,7 @@ from app.api.properties import router as properties_router
 from app.api.favorites import router as favorites_router
 from app.api.uploads import router as uploads_router
 from app.api.ml_price_router import router as ml_price_router
+from app.api import ml_price_router as ml_price
 app = FastAPI(title="Aqarak API")
 allow_origins = (
     ["*"]
@@ -54,10 +56,21 @@ async def _init_rate_limiter():
         logging.info("Rate limiter initialized with %s",url)
     except Exception as e:
         logging.warning("Rate limiter disabled: %s",e)
+@app.on_event("startup")
+def _warm_price_model():
+    ml_price.start_warm_up()
+    ml_price.start_model_watcher()
+
 @app.get("/")
 def root():
     return {"ok": True}
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    if not ml_price.is_ready():
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
\ No newline at end of file
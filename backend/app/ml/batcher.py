@@ -0,0 +1,109 @@
+import asyncio, logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+def _resolve(fut: asyncio.Future, value: Any = None, exc: Optional[BaseException] = None):
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(value)
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one vectorized call.
+
+    The first request of a batch opens a window of window_s seconds (or until
+    max_rows rows are queued); the whole batch then runs through fn in the
+    default executor and every caller's future is resolved with its own
+    value. While a batch is running new arrivals queue up and form the next
+    one, so batches grow with load. window_s <= 0 calls fn per request.
+    """
+    def __init__(self, fn: Callable[[List[Any]], Sequence[float]],
+                 max_rows: int = 64, window_s: float = 0.002):
+        self._fn = fn
+        self.max_rows = max(1, int(max_rows))
+        self.window_s = float(window_s)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._q: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.rows = 0
+        self.max_seen = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_s > 0 and self.max_rows > 1
+
+    async def submit(self, row: Any) -> float:
+        loop = asyncio.get_running_loop()
+        if not self.enabled:
+            ys = await loop.run_in_executor(None, self._fn, [row])
+            return float(ys[0])
+        self._ensure(loop)
+        fut = loop.create_future()
+        self._q.put_nowait((row, fut))
+        return await fut
+
+    def _ensure(self, loop: asyncio.AbstractEventLoop):
+        # bound to the loop that first used it; a new loop (tests, reload) gets a fresh queue
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._q = asyncio.Queue()
+            self._task = loop.create_task(self._run(self._q))
+
+    async def _run(self, q: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await q.get()]
+            deadline = loop.time() + self.window_s
+            while len(batch) < self.max_rows:
+                while len(batch) < self.max_rows and not q.empty():
+                    batch.append(q.get_nowait())
+                timeout = deadline - loop.time()
+                if len(batch) >= self.max_rows or timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(q.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch = [(r, f) for r, f in batch if not f.done()]
+            if batch:
+                await self._flush(loop, batch)
+
+    async def _flush(self, loop: asyncio.AbstractEventLoop, batch: list):
+        rows = [r for r, _ in batch]
+        self.batches += 1
+        self.rows += len(rows)
+        self.max_seen = max(self.max_seen, len(rows))
+        try:
+            ys = await loop.run_in_executor(None, self._fn, rows)
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], exc=e)
+                return
+            # one bad row must not fail everyone else in the batch
+            log.warning("batched prediction failed (%s); retrying %d rows individually", e, len(rows))
+            for r, f in batch:
+                try:
+                    y = (await loop.run_in_executor(None, self._fn, [r]))[0]
+                except Exception as e1:
+                    _resolve(f, exc=e1)
+                else:
+                    _resolve(f, float(y))
+            return
+        for (_, f), y in zip(batch, ys):
+            _resolve(f, float(y))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "window_ms": round(self.window_s * 1000.0, 3),
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_seen,
+        }
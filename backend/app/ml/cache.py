@@ -0,0 +1,125 @@
+import hashlib, json, logging, threading, time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+def payload_key(model_id: str, payload: Dict[str, Any]) -> str:
+    """stable key for a normalized payload; ints/floats collapse (3 == 3.0)"""
+    def canon(v):
+        if isinstance(v, bool) or v is None or isinstance(v, str):
+            return v
+        try:
+            return float(v)
+        except (TypeError, ValueError):
+            return str(v)
+    body = json.dumps({k: canon(v) for k, v in payload.items()}, sort_keys=True, separators=(",", ":"))
+    return f"{model_id}:{hashlib.sha1(body.encode('utf-8')).hexdigest()}"
+
+class PredictionCache:
+    """
+    In-process LRU with TTL, optionally backed by a shared Redis tier.
+    Keys carry the model id, so entries from a previous model never hit.
+    Redis errors are counted and skipped; they never fail a prediction.
+    """
+    def __init__(self, maxsize: int = 4096, ttl: float = 600.0,
+                 redis_url: Optional[str] = None, prefix: str = "aqarak:price:"):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self.prefix = prefix
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+        self._redis_down_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.redis_hits = 0
+        self.redis_errors = 0
+        if redis_url:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.05,
+                                                   socket_connect_timeout=0.05)
+            except Exception as e:
+                log.warning("prediction cache: redis tier disabled: %s", e)
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 or self._redis is not None
+
+    def get(self, key: str) -> Optional[float]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is not None:
+                if hit[1] > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return hit[0]
+                del self._data[key]
+        if self._redis_ok(now):
+            try:
+                raw = self._redis.get(self.prefix + key)
+            except Exception:
+                raw = None
+                self._redis_failed(now)
+            if raw is not None:
+                v = float(raw)
+                self._put_local(key, v, now)
+                with self._lock:
+                    self.hits += 1
+                    self.redis_hits += 1
+                return v
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, value: float):
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        self._put_local(key, float(value), now)
+        if self._redis_ok(now):
+            try:
+                self._redis.set(self.prefix + key, repr(float(value)), ex=max(1, int(self.ttl)))
+            except Exception:
+                self._redis_failed(now)
+
+    def _redis_ok(self, now: float) -> bool:
+        return self._redis is not None and now >= self._redis_down_until
+
+    def _redis_failed(self, now: float):
+        # back off so a dead redis costs one timeout per window, not one per request
+        self.redis_errors += 1
+        self._redis_down_until = now + 30.0
+
+    def _put_local(self, key: str, value: float, now: float):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, now + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "redis": self._redis is not None,
+                "redis_hits": self.redis_hits,
+                "redis_errors": self.redis_errors,
+            }
@@ -0,0 +1,214 @@
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+_UNSEEN = "\x00__unseen__"
+
+class _Passthrough:
+    kind = "passthrough"
+
+    def __init__(self, out: slice, cols: List[str]):
+        self.out, self.cols = out, cols
+
+    def spec(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "out": [self.out.start, self.out.stop], "cols": self.cols}
+
+    def apply(self, blk, X: np.ndarray):
+        for k, c in enumerate(self.cols):
+            X[:, self.out.start + k] = blk.column(c)
+
+class _Lookup:
+    """one output column per input column: value -> encoded float, default for unseen"""
+    kind = "lookup"
+
+    def __init__(self, out: slice, cols: List[str], tables: List[Dict[str, float]], defaults: List[float]):
+        self.out, self.cols, self.tables, self.defaults = out, cols, tables, defaults
+
+    def spec(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "out": [self.out.start, self.out.stop], "cols": self.cols,
+                "tables": self.tables, "defaults": self.defaults}
+
+    def apply(self, blk, X: np.ndarray):
+        for k, c in enumerate(self.cols):
+            t, d = self.tables[k], self.defaults[k]
+            X[:, self.out.start + k] = [t.get(v, d) for v in blk.column(c)]
+
+class _OneHot:
+    """fixed column offset per category; unseen -> all zeros (handle_unknown='ignore')"""
+    kind = "onehot"
+
+    def __init__(self, out: slice, cols: List[str], offsets: List[Dict[str, int]]):
+        self.out, self.cols, self.offsets = out, cols, offsets
+
+    def spec(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "out": [self.out.start, self.out.stop], "cols": self.cols,
+                "offsets": self.offsets}
+
+    def apply(self, blk, X: np.ndarray):
+        X[:, self.out] = 0.0
+        rows = np.arange(X.shape[0])
+        for k, c in enumerate(self.cols):
+            off = self.offsets[k]
+            idx = np.fromiter((off.get(v, -1) for v in blk.column(c)), dtype=np.int64, count=X.shape[0])
+            hit = idx >= 0
+            X[rows[hit], self.out.start + idx[hit]] = 1.0
+
+def step_from_spec(d: Dict[str, Any]):
+    out = slice(*d["out"])
+    if d["kind"] == "passthrough":
+        return _Passthrough(out, d["cols"])
+    if d["kind"] == "lookup":
+        return _Lookup(out, d["cols"], d["tables"], d["defaults"])
+    if d["kind"] == "onehot":
+        return _OneHot(out, d["cols"], d["offsets"])
+    raise ValueError(f"unknown step kind {d['kind']!r}")
+
+def _target_encoder_tables(te, cols: List[str]) -> Tuple[List[Dict[str, float]], List[float]]:
+    import pandas as pd
+    known = {d["col"]: [v for v in d["mapping"].index if isinstance(v, str)]
+             for d in te.ordinal_encoder.mapping}
+    tables, defaults = [], []
+    for c in cols:
+        cats = known[c] + ["nan", "", _UNSEEN]
+        probe = pd.DataFrame({cc: (cats if cc == c else [_UNSEEN] * len(cats)) for cc in cols})
+        enc = te.transform(probe)[c].to_numpy(dtype=float)
+        defaults.append(float(enc[-1]))
+        tables.append({k: float(v) for k, v in zip(cats[:-1], enc[:-1])})
+    return tables, defaults
+
+def _compile_step(trans, cols, out: slice, num_cols, cat_cols):
+    from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+    cols = list(cols)
+    if trans == "passthrough" or (isinstance(trans, FunctionTransformer) and trans.func is None):
+        return _Passthrough(out, cols) if all(c in num_cols for c in cols) else None
+    if any(c not in cat_cols for c in cols):
+        return None
+    if isinstance(trans, OneHotEncoder):
+        if trans.handle_unknown != "ignore" or trans.drop_idx_ is not None \
+                or getattr(trans, "_infrequent_enabled", False):
+            return None
+        offsets, pos = [], 0
+        for cats in trans.categories_:
+            offsets.append({str(v): pos + i for i, v in enumerate(cats)})
+            pos += len(cats)
+        return _OneHot(out, cols, offsets)
+    name = type(trans).__name__
+    if name == "TargetEncoder" and hasattr(trans, "ordinal_encoder"):
+        tables, defaults = _target_encoder_tables(trans, cols)
+        return _Lookup(out, cols, tables, defaults)
+    if name == "NeighborhoodIndex" and len(cols) == 1:
+        return _Lookup(out, cols, [{str(k): float(v) for k, v in trans.map_.items()}], [float(trans.fallback_)])
+    return None
+
+class CompiledModel:
+    """
+    A fitted prep+estimator Pipeline with the ColumnTransformer flattened
+    into lookup tables; predict() on a FeatureBlock builds the dense matrix
+    directly and hands it to the booster.
+    """
+    def __init__(self, pipeline, steps: list, n_out: int, estimator, booster=None):
+        self.pipeline = pipeline
+        self.steps = steps
+        self.n_out = n_out
+        self.estimator = estimator
+        self.booster = booster
+        self.iteration_range = (0, 0)
+        self.missing = np.nan
+        self.bulk_rows = 0
+        self._bulk_threads = 0
+        self._bulk_booster = None
+        self._bulk_lock = threading.Lock()
+        if type(estimator).__name__ in {"XGBRegressor", "XGBModel"}:
+            self.booster = estimator.get_booster()
+            best = getattr(estimator, "best_iteration", None)
+            if best is not None:
+                self.iteration_range = (0, int(best) + 1)
+            self.missing = estimator.missing
+
+    def probe_rows(self, n: int = 64) -> List[Dict[str, Any]]:
+        """synthetic rows covering the known categories, used to verify the tables"""
+        vals: Dict[str, List[str]] = {}
+        for s in self.steps:
+            if isinstance(s, _Lookup):
+                for c, t in zip(s.cols, s.tables):
+                    vals.setdefault(c, []).extend(t)
+            elif isinstance(s, _OneHot):
+                for c, off in zip(s.cols, s.offsets):
+                    vals.setdefault(c, []).extend(off)
+        for c in ("city", "neighborhood", "property_type"):
+            vals.setdefault(c, []).append(_UNSEEN)
+        n = max(n, *(len(v) for v in vals.values()))
+        rows = []
+        for i in range(n):
+            r: Dict[str, Any] = {c: v[i % len(v)] for c, v in vals.items()}
+            r.update(bedrooms=i % 7, bathrooms=i % 5, area_sqm=40.0 + 17.5 * (i % 200),
+                     floor=(i % 9) - 2, building_age=float(i % 40), furnished=bool(i % 2))
+            rows.append(r)
+        return rows
+
+    def transform(self, blk) -> np.ndarray:
+        X = np.empty((len(blk), self.n_out), dtype=np.float32)
+        for s in self.steps:
+            s.apply(blk, X)
+        return X
+
+    def set_threads(self, threads: int, bulk_threads: int, bulk_rows: int) -> None:
+        """
+        nthread for request-sized calls; calls of bulk_rows+ rows go to a
+        second booster copy with bulk_threads (set_param isn't safe while
+        other threads are predicting, so the copies are never re-tuned)
+        """
+        if self.booster is None:
+            if hasattr(self.estimator, "n_jobs"):
+                self.estimator.n_jobs = threads
+            return
+        self.booster.set_param({"nthread": threads})
+        self.bulk_rows = int(bulk_rows) if bulk_threads > threads else 0
+        self._bulk_threads = int(bulk_threads)
+        self._bulk_booster = None
+
+    def _booster_for(self, n_rows: int):
+        if not self.bulk_rows or n_rows < self.bulk_rows:
+            return self.booster
+        if self._bulk_booster is None:
+            with self._bulk_lock:
+                if self._bulk_booster is None:
+                    b = self.booster.copy()
+                    b.set_param({"nthread": self._bulk_threads})
+                    self._bulk_booster = b
+        return self._bulk_booster
+
+    def predict_dense(self, X: np.ndarray) -> np.ndarray:
+        if self.booster is not None:
+            return self._booster_for(X.shape[0]).inplace_predict(
+                X, iteration_range=self.iteration_range, missing=self.missing, validate_features=False)
+        return self.estimator.predict(X)
+
+    def predict(self, X):
+        if hasattr(X, "iloc"):
+            if self.pipeline is None:
+                raise TypeError("native artifact has no sklearn pipeline; pass a FeatureBlock")
+            return self.pipeline.predict(X)
+        return self.predict_dense(self.transform(X))
+
+def compile_pipeline(model, num_cols, cat_cols) -> Optional[CompiledModel]:
+    """None when the artifact isn't a prep+estimator Pipeline we can flatten exactly."""
+    from sklearn.pipeline import Pipeline
+    if not isinstance(model, Pipeline) or len(model.steps) != 2:
+        return None
+    pre, est = model.steps[0][1], model.steps[1][1]
+    if not hasattr(pre, "transformers_") or not hasattr(pre, "output_indices_"):
+        return None
+    if pre.remainder != "drop" or getattr(pre, "sparse_output_", False):
+        return None
+    steps = []
+    for name, trans, cols in pre.transformers_:
+        out = pre.output_indices_[name]
+        if trans == "drop" or out.stop == out.start:
+            continue
+        step = _compile_step(trans, cols, out, num_cols, cat_cols)
+        if step is None:
+            return None
+        steps.append(step)
+    n_out = max(s.stop for s in pre.output_indices_.values())
+    return CompiledModel(model, steps, n_out, est)
@@ -0,0 +1,313 @@
+"""
+Bulk valuation jobs: an uploaded CSV/NDJSON file is spooled to disk, read
+back in fixed-size chunks, scored and written out row by row, so memory
+depends on the chunk size and not on the file size.
+
+    <root>/<job_id>/input.csv|input.ndjson
+    <root>/<job_id>/result.csv|result.ndjson
+    <root>/<job_id>/status.json
+
+Finished jobs are kept for ttl_s seconds and at most max_jobs of them;
+older ones are swept, files included, as new jobs are created.
+"""
+import csv, json, logging, shutil, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+COPY_BUF = 1 << 20
+FINISHED = ("done", "failed", "cancelled")
+SWEEP_EVERY_S = 60.0
+
+class JobError(ValueError):
+    pass
+
+class Job:
+    __slots__ = ("job_id", "fmt", "dir", "status", "rows_total", "rows_done", "rows_failed",
+                 "error", "created_at", "started_at", "finished_at", "filename")
+
+    def __init__(self, job_id: str, fmt: str, job_dir: Path, filename: str = ""):
+        self.job_id, self.fmt, self.dir, self.filename = job_id, fmt, job_dir, filename
+        self.status = "queued"
+        self.rows_total = 0
+        self.rows_done = 0
+        self.rows_failed = 0
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def input_path(self) -> Path:
+        return self.dir / f"input.{self.fmt}"
+
+    @property
+    def result_path(self) -> Path:
+        return self.dir / f"result.{self.fmt}"
+
+    def summary(self) -> Dict[str, Any]:
+        took = ((self.finished_at or time.time()) - self.started_at) if self.started_at else None
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "format": self.fmt,
+            "filename": self.filename,
+            "rows_total": self.rows_total,
+            "rows_done": self.rows_done,
+            "rows_failed": self.rows_failed,
+            "progress": round(min(1.0, self.rows_done / self.rows_total), 4) if self.rows_total else 0.0,
+            "error": self.error,
+            "created_at": self.created_at,
+            "elapsed_s": round(took, 2) if took is not None else None,
+            "rows_per_s": round(self.rows_done / took, 1) if took else None,
+        }
+
+def _read_ndjson(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = {"_error": f"bad json: {e}"}
+            yield row if isinstance(row, dict) else {"_error": "not a json object"}
+
+def _chunks(it: Iterator[Dict[str, Any]], n: int) -> Iterator[List[Dict[str, Any]]]:
+    buf: List[Dict[str, Any]] = []
+    for r in it:
+        buf.append(r)
+        if len(buf) >= n:
+            yield buf
+            buf = []
+    if buf:
+        yield buf
+
+class JobManager:
+    """
+    prepare_fn turns one raw input row into a model payload (raising on bad
+    rows); predict_fn scores a list of payloads. Jobs run on a small
+    dedicated pool so they never compete with request threads for more
+    than `workers` threads. ttl_s / max_jobs <= 0 turn that limit off.
+    """
+    def __init__(self, root: Path, prepare_fn: Callable[[Dict[str, Any]], dict],
+                 predict_fn: Callable[[List[dict]], Sequence[float]],
+                 chunk_rows: int = 2000, workers: int = 1, max_bytes: int = 512 << 20,
+                 ttl_s: float = 86400.0, max_jobs: int = 100):
+        self.root = Path(root)
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.max_bytes = int(max_bytes)
+        self.ttl_s = float(ttl_s)
+        self.max_jobs = int(max_jobs)
+        self._swept = 0.0
+        self._prepare = prepare_fn
+        self._predict = predict_fn
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="price-job")
+
+    def create(self, filename: str, content_type: Optional[str] = None) -> Job:
+        fmt = FORMATS.get(Path(filename or "").suffix.lower())
+        if fmt is None and content_type:
+            fmt = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else (
+                "csv" if "csv" in content_type else None)
+        if fmt is None:
+            raise JobError("upload must be .csv, .ndjson or .jsonl")
+        if time.time() - self._swept >= SWEEP_EVERY_S:
+            self.sweep()
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.root / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        job = Job(job_id, fmt, job_dir, filename or "")
+        with self._lock:
+            self._jobs[job_id] = job
+        return job
+
+    def spool(self, job: Job, src) -> None:
+        """copy an upload (binary file object) to job.input_path; counts lines for progress and enforces max_bytes"""
+        written, last = 0, b"\n"
+        with open(job.input_path, "wb") as f:
+            while True:
+                data = src.read(COPY_BUF)
+                if not data:
+                    break
+                written += len(data)
+                if written > self.max_bytes:
+                    raise JobError(f"upload exceeds {self.max_bytes >> 20} MB")
+                f.write(data)
+                job.rows_total += data.count(b"\n")
+                last = data[-1:]
+        if last != b"\n":
+            job.rows_total += 1
+        if job.fmt == "csv":
+            job.rows_total = max(0, job.rows_total - 1)  # header
+
+    def submit(self, job: Job):
+        self._save(job)
+        self._pool.submit(self._run, job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        d = self.root / job_id
+        if job is not None and job.status in ("queued", "running"):
+            job.status = "cancelled"
+        if d.is_dir():
+            shutil.rmtree(d, ignore_errors=True)
+            return True
+        return job is not None
+
+    def discard(self, job: Job):
+        with self._lock:
+            self._jobs.pop(job.job_id, None)
+        shutil.rmtree(job.dir, ignore_errors=True)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """
+        Delete job dirs untouched for ttl_s (finished, or abandoned by a dead
+        worker), then the oldest finished ones beyond max_jobs. Jobs still
+        queued or running in this process are never touched. Returns how
+        many were deleted.
+        """
+        now = time.time() if now is None else now
+        self._swept = now
+        with self._lock:
+            live = {k for k, j in self._jobs.items() if j.status not in FINISHED}
+        try:
+            dirs = [d for d in self.root.iterdir() if d.is_dir() and d.name not in live]
+        except OSError:
+            return 0
+        expired, finished = [], []
+        for d in dirs:
+            st = d / "status.json"
+            try:
+                mtime = (st if st.exists() else d).stat().st_mtime
+                status = json.loads(st.read_text()).get("status") if st.exists() else None
+            except (OSError, ValueError):
+                continue
+            if self.ttl_s > 0 and now - mtime > self.ttl_s:
+                expired.append(d)
+            elif status in FINISHED:
+                finished.append((mtime, d))
+        if self.max_jobs > 0 and len(finished) > self.max_jobs:
+            finished.sort()
+            expired += [d for _, d in finished[:len(finished) - self.max_jobs]]
+        for d in expired:
+            with self._lock:
+                self._jobs.pop(d.name, None)
+            shutil.rmtree(d, ignore_errors=True)
+        if expired:
+            log.info("price jobs: swept %d finished/stale job(s)", len(expired))
+        return len(expired)
+
+    def _run(self, job: Job):
+        if job.status == "cancelled":
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        self._save(job)
+        try:
+            if job.fmt == "csv":
+                self._run_csv(job)
+            else:
+                self._run_ndjson(job)
+        except Exception as e:
+            log.exception("price job %s failed", job.job_id)
+            job.status, job.error = "failed", str(e)
+        else:
+            if job.status == "running":
+                job.status = "done"
+                job.rows_total = job.rows_done
+        job.finished_at = time.time()
+        self._save(job)
+
+    def _score(self, rows: List[Dict[str, Any]]) -> List[tuple]:
+        """(price, error) per input row; bad rows get an error instead of failing the chunk"""
+        res: List[tuple] = [(None, None)] * len(rows)
+        idx, payloads = [], []
+        for i, r in enumerate(rows):
+            if "_error" in r:
+                res[i] = (None, r["_error"])
+                continue
+            try:
+                payloads.append(self._prepare(r))
+                idx.append(i)
+            except Exception as e:
+                res[i] = (None, str(e).replace("\n", " "))
+        if payloads:
+            ys = self._predict(payloads)
+            for i, y in zip(idx, ys):
+                res[i] = (round(max(0.0, float(y)), 2), None)
+        return res
+
+    def _tick(self, job: Job, res: List[tuple]):
+        job.rows_done += len(res)
+        job.rows_failed += sum(1 for _, e in res if e is not None)
+        self._save(job)
+
+    def _run_csv(self, job: Job):
+        with open(job.input_path, newline="", encoding="utf-8") as fin, \
+             open(job.result_path, "w", newline="", encoding="utf-8") as fout:
+            reader = csv.DictReader(fin)
+            fields = list(reader.fieldnames or [])
+            w = csv.DictWriter(fout, fieldnames=fields + ["price_jod", "error"], extrasaction="ignore")
+            w.writeheader()
+            for chunk in _chunks(iter(reader), self.chunk_rows):
+                if job.status == "cancelled":
+                    return
+                res = self._score(chunk)
+                for r, (y, err) in zip(chunk, res):
+                    w.writerow({**r, "price_jod": "" if y is None else y, "error": err or ""})
+                self._tick(job, res)
+
+    def _run_ndjson(self, job: Job):
+        with open(job.result_path, "w", encoding="utf-8") as fout:
+            for chunk in _chunks(_read_ndjson(job.input_path), self.chunk_rows):
+                if job.status == "cancelled":
+                    return
+                res = self._score(chunk)
+                for r, (y, err) in zip(chunk, res):
+                    out = {k: v for k, v in r.items() if k != "_error"}
+                    out["price_jod"] = y
+                    if err is not None:
+                        out["error"] = err
+                    fout.write(json.dumps(out, default=str) + "\n")
+                self._tick(job, res)
+
+    def _save(self, job: Job):
+        if not job.dir.is_dir():
+            return
+        try:
+            (job.dir / "status.json").write_text(json.dumps(job.summary()))
+        except OSError as e:
+            log.warning("price job %s: status write failed: %s", job.job_id, e)
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        """jobs started by another worker process are reported from their last status.json"""
+        if not job_id.isalnum():
+            return None
+        p = self.root / job_id / "status.json"
+        try:
+            s = json.loads(p.read_text())
+        except (OSError, ValueError):
+            return None
+        job = Job(job_id, s.get("format", "csv"), p.parent, s.get("filename", ""))
+        job.status = s.get("status", "failed")
+        job.rows_total = int(s.get("rows_total") or 0)
+        job.rows_done = int(s.get("rows_done") or 0)
+        job.rows_failed = int(s.get("rows_failed") or 0)
+        job.error = s.get("error")
+        job.created_at = float(s.get("created_at") or 0.0)
+        return job
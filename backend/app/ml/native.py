@@ -0,0 +1,73 @@
+"""
+Native price-model artifact: the XGBoost booster in its own UBJSON format
+plus the compiled preprocessing tables as JSON, next to the .joblib:
+
+    aqarak_price_model_xgb_<id>.ubj         booster.save_model()
+    aqarak_price_model_xgb_<id>.prep.json   steps, n_out, iteration_range, probe
+
+Loading needs numpy + xgboost only: no pickle, sklearn, category_encoders
+or pandas. The prep file carries a few probe rows and the log-predictions
+the exporting process got for them; load_native() refuses the artifact if
+it doesn't reproduce them exactly.
+"""
+import json, logging, math
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from app.ml.compiled import CompiledModel, step_from_spec
+
+log = logging.getLogger(__name__)
+
+FORMAT = "aqarak-native-v1"
+_N_PROBE = 32
+
+def native_paths(artifact: str) -> Tuple[Path, Path]:
+    """sibling paths for a .joblib artifact; symlinks (…_latest) resolve to their target"""
+    p = Path(artifact).resolve()
+    return p.with_suffix(".ubj"), p.with_suffix(".prep.json")
+
+def export_native(cm: CompiledModel, artifact: str, featurize) -> Dict[str, str]:
+    """write the .ubj/.prep.json pair for a compiled XGBoost model; returns their file names"""
+    if cm.booster is None:
+        raise ValueError("only XGBoost models have a native format")
+    ubj, prep = native_paths(artifact)
+    probe = cm.probe_rows()[:_N_PROBE]
+    expect = cm.predict(featurize(probe))
+    spec = {
+        "format": FORMAT,
+        "n_out": cm.n_out,
+        "iteration_range": list(cm.iteration_range),
+        "missing": None if math.isnan(cm.missing) else float(cm.missing),
+        "steps": [s.spec() for s in cm.steps],
+        "probe": {"rows": probe, "log_pred": [float(v) for v in expect]},
+    }
+    cm.booster.save_model(str(ubj))
+    tmp = prep.with_suffix(".tmp")
+    tmp.write_text(json.dumps(spec))
+    tmp.replace(prep)
+    return {"booster": ubj.name, "prep": prep.name}
+
+def load_native(artifact: str, featurize) -> Optional[CompiledModel]:
+    """the native form of `artifact` if both files exist and pass the probe check, else None"""
+    ubj, prep = native_paths(artifact)
+    if not (ubj.exists() and prep.exists()):
+        return None
+    try:
+        spec: Dict[str, Any] = json.loads(prep.read_text())
+        if spec.get("format") != FORMAT:
+            raise ValueError(f"unsupported format {spec.get('format')!r}")
+        import xgboost as xgb
+        booster = xgb.Booster(model_file=str(ubj))
+        cm = CompiledModel(None, [step_from_spec(d) for d in spec["steps"]], int(spec["n_out"]), None,
+                           booster=booster)
+        cm.iteration_range = tuple(spec.get("iteration_range") or (0, 0))
+        miss = spec.get("missing")
+        cm.missing = np.nan if miss is None else float(miss)
+        got = cm.predict(featurize(spec["probe"]["rows"]))
+        want = np.asarray(spec["probe"]["log_pred"], dtype=got.dtype)
+        if not np.array_equal(got, want):
+            raise ValueError("probe predictions differ from export")
+    except Exception as e:
+        log.warning("native artifact %s ignored: %s", ubj.name, e)
+        return None
+    return cm
@@ -0,0 +1,219 @@
+"""
+Request/listing normalization shared by serving, evaluation, bulk jobs and
+training prep: neighborhood aliases, the house/villa total_floors -> floor
+rule, area_sq and the building_age parser.
+
+normalize() works on one dict (the /predict path); normalize_records() and
+normalize_frame() do the same on a batch, mapping each distinct
+neighborhood once instead of once per row.
+"""
+import re
+from typing import Any, Dict, List
+import numpy as np
+
+HV_TYPES = {"House", "Villa", "Townhouse"}
+
+NEIGH_MAP = {
+    "shmesani": "Shmaisani",
+    "um uthina": "Um Uthaiena",
+    "rabieh": "Al Rabiah",
+    "swefieh": "Swefieh",
+    "abdoun": "Abdoun",
+    "abdoun al janobi": "Abdoun",
+    "abdoun al shamali": "Abdoun",
+    "dabouq": "Dabouq",
+    "deir ghbar": "Deir Ghbar",
+    "mecca st": "Mecca St",
+    "mecca street": "Mecca St",
+    "mecca": "Mecca St",
+    "jabal amman": "Jabal Amman",
+    "khalda": "Khalda",
+    "tla ali": "Tla Ali",
+    "tla al ali": "Tla Ali",
+    "tla al ali al shamali": "Tla Ali",
+    "tla al ali al sharqi": "Tla Ali",
+    "jubeiha": "Jubaiha",
+    "jubaiha": "Jubaiha",
+    "university": "University District",
+    "university street": "University District",
+    "seventh circle": "7th Circle",
+    "7th circle": "7th Circle",
+    "al gardens": "Gardens",
+    "gardens": "Gardens",
+    "um uthaiena al gharbi": "Um Uthaiena",
+    "um uthaiena al sharqi": "Um Uthaiena",
+    "nazzal": "Hai Nazzal",
+    "yasmeen": "Daheit Al Yasmeen",
+    "al yasmeen": "Daheit Al Yasmeen",
+    "rasheed": "Daheit Al Rasheed",
+    "al rasheed": "Daheit Al Rasheed",
+    "hussain": "Jabal Al Hussain",
+    "jabal hussain": "Jabal Al Hussain",
+    "lweibdeh": "Jabal Al-Lweibdeh",
+    "al lweibdeh": "Jabal Al-Lweibdeh",
+    "nuzha": "Jabal Al Nuzha",
+    "al nuzha": "Jabal Al Nuzha",
+    "taj": "Jabal Al-Taj",
+    "al taj": "Jabal Al-Taj",
+    "bayader": "Al Bayader",
+    "al bayader wadi al seer": "Al Bayader",
+    "bnayyat": "Al Bnayyat",
+    "jandaweel": "Al Jandaweel",
+    "kursi": "Al Kursi",
+    "rawnaq": "Al Rawnaq",
+    "ridwan": "Al Ridwan",
+    "urdon st": "Al Urdon Street",
+    "urdon street": "Al Urdon Street",
+    "yadudah": "Al Yadudah",
+    "summaq": "Um El Summaq",
+    "um summaq": "Um El Summaq",
+    "umm summaq": "Um El Summaq",
+    "bunayat": "Al Bnayyat",
+    "jubeiha": "Jubaiha",
+    "jubaiha": "Jubaiha",
+    "university": "University District",
+    "ashrafyeh": "Al Ashrafyeh",
+    "al ashrafyeh": "Al Ashrafyeh",
+    "muqabalain": "Al Muqabalain",
+    "al muqabalain": "Al Muqabalain",
+    "qwaismeh": "Al Qwaismeh",
+    "al qwaismeh": "Al Qwaismeh",
+    "nakheel": "Dahiet Al-Nakheel",
+    "al nakheel": "Dahiet Al-Nakheel",
+    "rawda": "Dahiet Al-Rawda",
+    "al rawda": "Dahiet Al-Rawda",
+    "zohor": "Jabal Al Zohor",
+    "al zohor": "Jabal Al Zohor",
+    "zohoor": "Jabal Al Zohor",
+    "al zohoor": "Jabal Al Zohor",
+    "nathif": "Jabal Al-Nathif",
+    "al nathif": "Jabal Al-Nathif",
+    "marj al hamam": "Marj El Hamam",
+    "tabarbour": "Tabarboor",
+    "kamaliya": "Al Kamaliya",
+    "al kamaliya": "Al Kamaliya",
+    "haj hassan": "Daheit Al-Haj Hassan",
+    "al haj hassan": "Daheit Al-Haj Hassan",
+    "ameer hasan": "Daheit Al Ameer Hasan",
+    "al ameer hasan": "Daheit Al Ameer Hasan",
+}
+
+def fix_neighborhood(n) -> str:
+    s = str(n).strip().lower()
+    if s in NEIGH_MAP:
+        return NEIGH_MAP[s]
+    return s.title()
+
+def _floor_and_area(d: dict) -> dict:
+    pt = str(d.get("property_type","")).title()
+    if pt in HV_TYPES and d.get("floor") is None:
+        tf = d.get("total_floors")
+        if tf is not None:
+            d["floor"] = tf
+    d.pop("total_floors", None)
+    try:
+        a = float(d.get("area_sqm", None))
+        if a > 0:
+            d["area_sq"] = a * a
+    except (TypeError, ValueError):
+        pass
+    return d
+
+def normalize(d: dict) -> dict:
+    if "neighborhood" in d:
+        d["neighborhood"] = fix_neighborhood(d["neighborhood"])
+    return _floor_and_area(d)
+
+def _is_missing(v) -> bool:
+    return v is None or (isinstance(v, float) and v != v)
+
+def normalize_records(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """normalize() over many dicts, in place; each distinct neighborhood is mapped once"""
+    look: Dict[Any, str] = {}
+    for r in rows:
+        if "neighborhood" in r:
+            v = r["neighborhood"]
+            if _is_missing(v):
+                r["neighborhood"] = fix_neighborhood(v)
+            else:
+                m = look.get(v)
+                if m is None:
+                    m = look[v] = fix_neighborhood(v)
+                r["neighborhood"] = m
+        _floor_and_area(r)
+    return rows
+
+def normalize_frame(df):
+    """
+    Columnar normalize() for a pandas DataFrame; returns a new frame.
+    Missing values stay NaN instead of becoming absent keys.
+    """
+    import pandas as pd
+    out = df.copy()
+    if "neighborhood" in out.columns:
+        codes, uniq = pd.factorize(out["neighborhood"], use_na_sentinel=False)
+        mapped = pd.Index([fix_neighborhood(None if _is_missing(u) else u) for u in uniq], dtype=object)
+        out["neighborhood"] = mapped.take(codes) if len(out) else out["neighborhood"].astype(object)
+    if "total_floors" in out.columns:
+        if "property_type" in out.columns:
+            floor = out["floor"] if "floor" in out.columns else pd.Series(float("nan"), index=out.index)
+            take = (out["property_type"].astype(str).str.title().isin(HV_TYPES)
+                    & floor.isna() & out["total_floors"].notna())
+            out["floor"] = floor.where(~take, out["total_floors"])
+        out = out.drop(columns=["total_floors"])
+    if "area_sqm" in out.columns:
+        a = pd.to_numeric(out["area_sqm"], errors="coerce")
+        out["area_sq"] = (a * a).where(a > 0)
+    return out
+
+def frame_records(df) -> List[Dict[str, Any]]:
+    """rows of a (normalized) frame as dicts, NaN -> None"""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+AGE_MONTHS = {"0-11 months", "0 to 11 months", "0-11 month"}
+AGE_BANDS = {
+    "1-5 years": 3.0, "5-10 years": 7.5, "10-19 years": 15.0,
+    "20-29 years": 25.0, "30-39 years": 35.0, "40-49 years": 45.0,
+}
+_DASH = re.compile(r"\s*[-\u2013\u2014]\s*")
+_BAND = r"(\d+-\d+ years)"
+
+def _parse_age_text(s):
+    """building_age strings (pandas Series) -> float ndarray"""
+    import pandas as pd
+    s = s.astype(str).str.strip().str.lower().str.replace(_DASH, "-", regex=True)
+    band = s.str.extract(_BAND, expand=False).map(AGE_BANDS)
+    digits = pd.to_numeric(s.str.replace(r"[^\d.]", "", regex=True), errors="coerce")
+    plain = pd.to_numeric(s, errors="coerce")
+    return np.select([s.isin(AGE_MONTHS).to_numpy(), band.notna().to_numpy(),
+                      s.str.contains("year", regex=False).to_numpy()],
+                     [0.5, band.to_numpy(dtype=float), digits.to_numpy(dtype=float)],
+                     plain.to_numpy(dtype=float))
+
+def parse_building_age(values) -> np.ndarray:
+    """
+    building_age as years, for a Series/array/list: numbers pass through;
+    "0-11 months" -> 0.5, "<a>-<b> years" bands -> AGE_BANDS (either dash),
+    other "... years" text -> its digits, anything else float() or NaN.
+    Text is parsed once per distinct value. Used by featurize() and by the
+    training prep, so both parse alike.
+    """
+    dtype = getattr(values, "dtype", None)
+    if dtype is not None and dtype.kind in "iuf":
+        return np.asarray(values, dtype=float)
+    if dtype is None and not any(isinstance(v, (bool, np.bool_)) for v in values):
+        try:
+            return np.array(values, dtype=float)  # numbers/None (the /predict case)
+        except (TypeError, ValueError):
+            pass
+    obj = values.to_numpy(dtype=object) if hasattr(values, "to_numpy") else np.asarray(values, dtype=object)
+    out = np.full(len(obj), np.nan)
+    num = np.fromiter((isinstance(v, (int, float, np.integer, np.floating))
+                       and not isinstance(v, (bool, np.bool_)) for v in obj), dtype=bool, count=len(obj))
+    out[num] = obj[num].astype(float)
+    text = ~num & np.fromiter((not _is_missing(v) for v in obj), dtype=bool, count=len(obj))
+    if text.any():
+        import pandas as pd
+        codes, uniq = pd.factorize(obj[text])
+        out[text] = _parse_age_text(pd.Series(uniq, dtype=object))[codes]
+    return out
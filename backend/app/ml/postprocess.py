@@ -0,0 +1,142 @@
+"""
+Business rules applied on top of the raw model price, on whole arrays:
+neighborhood blend, per-sqm market uplift, furnished anchoring and the
+apartment floor / house-villa stories factors.
+
+The serving router and scripts/eval_price_model.py both go through
+apply_rules(), so evaluation measures exactly what the API returns.
+"""
+from typing import Dict, List, Sequence
+import numpy as np
+
+NEIGHBORHOOD_BLEND = 0.85
+FURNISHED_ALL_PTYPES = True
+FURNISHED_ANCHOR = "furnished"
+UNFURNISHED_PCT = 0.107
+APT_FURNISHED_CAP = 0.15
+APT_FURNISHED_FLOOR = 0.08
+APT_FURNISHED_BOOST = 2.0
+
+APT_GF_PREMIUM = 0.11
+APT_UP_STEP = 0.035
+APT_B1_DROP = 0.20
+APT_DOWN_STEP = 0.035
+APT_UP_CAP= 0.20
+APT_DOWN_CAP= 0.35
+HV_STORIES_STEP = 0.05
+HV_STORIES_CAP  = 0.15
+MARKET_BLEND= 0.35
+
+_PSQM_BASE = {
+    ("amman", "abdoun", "apartment"): 950.0,
+    ("amman", "khalda", "apartment"): 700.0,
+    ("amman", "jubihaa", "apartment"): 520.0,
+    ("amman", "khalda", "villa"): 900.0,
+}
+_PSQM_CITY_FALLBACK = {"amman": 500.0}
+_PSQM_GLOBAL_FALLBACK = 450.0
+
+HV_TYPES = ("House", "Villa", "Townhouse")
+
+def _norm(s) -> str:
+    return str(s or "").strip().lower()
+
+def psqm_baseline(city, neighborhood, property_type) -> float:
+    city, nb, pt = _norm(city), _norm(neighborhood), _norm(property_type)
+    v = _PSQM_BASE.get((city, nb, pt))
+    if v: return float(v)
+    v = _PSQM_BASE.get((city, nb, "*")) or _PSQM_BASE.get((city, "*", pt))
+    if v: return float(v)
+    if city in _PSQM_CITY_FALLBACK:
+        return float(_PSQM_CITY_FALLBACK[city])
+    return float(_PSQM_GLOBAL_FALLBACK)
+
+def to_float_arr(vals) -> np.ndarray:
+    out = np.full(len(vals), np.nan, dtype=float)
+    for i, v in enumerate(vals):
+        try:
+            out[i] = float(v)
+        except (TypeError, ValueError):
+            pass
+    return out
+
+def controlled_variants(base: dict) -> List[dict]:
+    """furnished/unfurnished x neighborhood/neutral rows, scored together"""
+    p_t = dict(base); p_t["furnished"] = True
+    p_f = dict(base); p_f["furnished"] = False
+    n_t = dict(p_t); n_t["neighborhood"] = ""
+    n_f = dict(p_f); n_f["neighborhood"] = ""
+    return [p_t, n_t, p_f, n_f]
+
+def rule_inputs(payloads: Sequence[dict]) -> Dict[str, np.ndarray]:
+    """the per-row columns apply_rules needs, pulled out of normalized payloads"""
+    return {
+        "property_type": np.array([str(p.get("property_type") or "").strip().title() for p in payloads], dtype=object),
+        "furnished": np.array([bool(p.get("furnished") or False) for p in payloads]),
+        "floor": to_float_arr([p.get("floor") for p in payloads]),
+        "area_sqm": to_float_arr([p.get("area_sqm") for p in payloads]),
+        "psqm": np.array([psqm_baseline(p.get("city"), p.get("neighborhood"), p.get("property_type"))
+                          for p in payloads], dtype=float),
+    }
+
+def neigh_blend(y_neigh: np.ndarray, y_neutral: np.ndarray, blend: float = NEIGHBORHOOD_BLEND) -> np.ndarray:
+    return y_neutral + blend * (y_neigh - y_neutral)
+
+def market_blend(y: np.ndarray, area: np.ndarray, psqm: np.ndarray) -> np.ndarray:
+    """lift predictions toward area x per-sqm floor"""
+    area = np.nan_to_num(area, nan=0.0)
+    y_market = np.maximum(1.0, psqm) * area
+    lift = (area > 0) & (y > 0) & (y_market > y)
+    ratio = np.where(lift, y_market / np.where(y > 0, y, 1.0), 1.0)
+    return np.where(lift, y * ratio ** MARKET_BLEND, y)
+
+def furnished_anchor(y_t: np.ndarray, y_f: np.ndarray, furnished: np.ndarray, pt: np.ndarray) -> np.ndarray:
+    apply_furn = FURNISHED_ALL_PTYPES | (pt == "Apartment")
+    y_plain = np.where(furnished, y_t, y_f)
+    if FURNISHED_ANCHOR == "furnished":
+        y_ctrl = np.where(furnished, y_t, y_t * (1.0 - UNFURNISHED_PCT))
+    else:
+        mid = np.maximum(1.0, 0.5 * (y_t + y_f))
+        cap_amt   = abs(APT_FURNISHED_CAP)   * mid
+        floor_amt = abs(APT_FURNISHED_FLOOR) * mid
+        raw_delta = (y_t - y_f) * max(0.0, APT_FURNISHED_BOOST)
+        target = np.where(raw_delta >= 0,
+                          np.minimum(np.maximum(raw_delta, floor_amt), cap_amt),
+                          np.maximum(np.minimum(raw_delta, -floor_amt), -cap_amt))
+        y_ctrl = np.where(furnished, y_f + target, y_t - target)
+    return np.where(apply_furn, y_ctrl, y_plain)
+
+def apt_floor_factor(floor: np.ndarray) -> np.ndarray:
+    floor = np.asarray(floor, dtype=float)
+    ok = np.isfinite(floor)
+    f = np.round(np.where(ok, floor, 0.0))
+    up = np.maximum(0.0, 1.0 - np.minimum(APT_UP_CAP, np.maximum(0.0, f - 1) * APT_UP_STEP))
+    b1 = max(0.0, 1.0 - APT_B1_DROP)
+    down = np.maximum(1.0 - APT_B1_DROP - APT_DOWN_CAP,
+                      b1 * (1.0 - APT_DOWN_STEP) ** np.maximum(0.0, np.abs(f) - 1))
+    out = np.select([f == 0, f > 0, f == -1], [1.0 + APT_GF_PREMIUM, up, b1], down)
+    return np.where(ok, out, 1.0)
+
+def hv_stories_factor(floor: np.ndarray) -> np.ndarray:
+    floor = np.asarray(floor, dtype=float)
+    f = np.where(np.isfinite(floor) & (floor != 0), floor, 1.0)
+    stories = np.maximum(1.0, np.round(f))
+    return 1.0 + np.minimum(HV_STORIES_CAP, (stories - 1) * HV_STORIES_STEP)
+
+def floor_adjust(y: np.ndarray, floor: np.ndarray, pt: np.ndarray) -> np.ndarray:
+    y = np.maximum(0.0, y)
+    fac = np.where(pt == "Apartment", apt_floor_factor(floor),
+                   np.where(np.isin(pt, HV_TYPES), hv_stories_factor(floor), 1.0))
+    return y * fac
+
+def apply_rules(ys: np.ndarray, cols: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    ys: raw prices shaped (N, 2, 2) = [furnished, unfurnished] x [neighborhood, neutral],
+    i.e. controlled_variants() order. cols: rule_inputs() of the N base rows.
+    """
+    ys = np.asarray(ys, dtype=float).reshape(-1, 2, 2)
+    y_tf = neigh_blend(ys[:, :, 0], ys[:, :, 1])
+    y_t = market_blend(y_tf[:, 0], cols["area_sqm"], cols["psqm"])
+    y_f = market_blend(y_tf[:, 1], cols["area_sqm"], cols["psqm"])
+    y = furnished_anchor(y_t, y_f, cols["furnished"], cols["property_type"])
+    return floor_adjust(y, cols["floor"], cols["property_type"])
@@ -1,43 +1,23 @@
-import os, joblib, numpy as np, pandas as pd
+import os, numpy as np
 from typing import Dict, Any, List, Optional
-from app.ml.neigh_index import NeighborhoodIndex 
+from app.ml.compiled import CompiledModel, compile_pipeline
+from app.ml.normalize import parse_building_age
 
 _MODEL = None
 
 def _alias_neigh_index_for_pickle():
     import sys, types
+    from app.ml.neigh_index import NeighborhoodIndex
     sys.modules.setdefault("__mp_main__", types.ModuleType("__mp_main__"))
     setattr(sys.modules["__mp_main__"], "NeighborhoodIndex",NeighborhoodIndex)
 
-def _parse_building_age(v):
-    if pd.isna(v): 
-        return np.nan
-    s=str(v).strip().lower()
-    if s in {"0–11 months", "0-11 months"}: 
-        return 0.5
-    bands = {
-        "1-5 years": 3, "5-10 years": 7.5, "10-19 years": 15,
-        "20-29 years": 25, "30-39 years": 35, "40-49 years": 45
-    }
-    for k, v in bands.items():
-        if k in s: return float(v)
-    if "year" in s:
-        digits = "".join(ch for ch in s if ch.isdigit() or ch==".")
-        try: 
-            return float(digits) if digits else np.nan
-        except:
-            return np.nan
-    try: 
-        return float(s)
-    except: 
-        return np.nan
-
 def _to_bool(v):
     if isinstance(v, (bool, np.bool_)): return bool(v)
     s = str(v).strip().lower()
     return s in {"1","true","yes","y","t","فurnished","مفروش"}
 
-def _build_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+def _build_frame(rows: List[Dict[str, Any]]):
+    import pandas as pd
     df = pd.DataFrame(rows)
     cols = ["bedrooms","bathrooms","area_sqm","floor","building_age",
             "city","neighborhood","property_type","furnished"]
@@ -48,7 +28,8 @@ def _build_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
     df["bathrooms"]= pd.to_numeric(df["bathrooms"], errors="coerce").fillna(1)
     df["area_sqm"]= pd.to_numeric(df["area_sqm"], errors="coerce").fillna(0)
     df["floor"]= pd.to_numeric(df["floor"], errors="coerce").fillna(0)
-    df["building_age"]  = df["building_age"].map(_parse_building_age).fillna(5)
+    age = parse_building_age(df["building_age"])
+    df["building_age"]  = np.where(np.isnan(age), 5.0, age)
     df["city"]= df["city"].astype(str)
     df["neighborhood"]  = df["neighborhood"].astype(str)
     df["property_type"] = df["property_type"].astype(str).str.title()
@@ -67,21 +48,136 @@ def _build_frame(rows: List[Dict[str, Any]]) -> pd.DataFrame:
     df["furn_apt"]=(df["furnished"].astype(int) *  is_apartment).astype(float)
     return df
 
-def load_model(model_path:Optional[str] = None):
+NUM_COLS = ["bedrooms","bathrooms","area_sqm","floor","building_age",
+            "area_log","area_sq","area_per_bed","bed_per_bath","area_bin","furn_apt"]
+CAT_COLS = ["city","neighborhood","property_type"]
+_AREA_EDGES = np.array([60,90,120,160,220,10000], dtype=float)
+
+class FeatureBlock:
+    """Featurized rows: float32 numeric buffer (NUM_COLS order) + string columns."""
+    __slots__ = ("num", "cat", "furnished")
+
+    def __init__(self, num: np.ndarray, cat: Dict[str, np.ndarray], furnished: np.ndarray):
+        self.num = num
+        self.cat = cat
+        self.furnished = furnished
+
+    def __len__(self):
+        return self.num.shape[0]
+
+    def column(self, name: str) -> np.ndarray:
+        if name in self.cat:
+            return self.cat[name]
+        return self.num[:, NUM_COLS.index(name)]
+
+    def to_frame(self):
+        import pandas as pd
+        d: Dict[str, Any] = {c: self.num[:, i] for i, c in enumerate(NUM_COLS)}
+        d.update(self.cat)
+        d["furnished"] = self.furnished
+        return pd.DataFrame(d)
+
+def _num(v) -> float:
+    if v is None:
+        return np.nan
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+def featurize(rows: List[Dict[str, Any]], out: Optional[np.ndarray] = None) -> FeatureBlock:
+    """
+    Same features as _build_frame, without pandas: request dicts are read
+    once and the derived columns written into a float32 buffer.
+    """
+    n = len(rows)
+    num = out if out is not None else np.empty((n, len(NUM_COLS)), dtype=np.float32)
+    def col(name, fill):
+        a = np.fromiter((_num(r.get(name)) for r in rows), dtype=float, count=n)
+        return np.where(np.isnan(a), fill, a)
+    bd = col("bedrooms", 0.0)
+    ba_raw = col("bathrooms", 1.0)
+    area_raw = col("area_sqm", 0.0)
+    floor = col("floor", 0.0)
+    age = parse_building_age([r.get("building_age") for r in rows])
+    age = np.where(np.isnan(age), 5.0, age)
+    cat = {
+        "city": np.array([str(r["city"]) if "city" in r else "nan" for r in rows], dtype=object),
+        "neighborhood": np.array([str(r["neighborhood"]) if "neighborhood" in r else "nan" for r in rows], dtype=object),
+        "property_type": np.array([str(r["property_type"]).title() if "property_type" in r else "Nan" for r in rows], dtype=object),
+    }
+    furn = np.fromiter((_to_bool(r["furnished"]) if "furnished" in r else False for r in rows), dtype=bool, count=n)
+    area = np.clip(area_raw, 0, None)
+    ba = np.where(ba_raw == 0, 1.0, ba_raw)
+    denom = np.clip(np.where(bd == 0, 1.0, bd), 1, None)
+    area_bin = np.searchsorted(_AREA_EDGES, area, side="left").astype(float)
+    area_bin[area_bin >= len(_AREA_EDGES)] = np.nan
+    num[:, 0] = bd
+    num[:, 1] = ba_raw
+    num[:, 2] = area_raw
+    num[:, 3] = floor
+    num[:, 4] = age
+    num[:, 5] = np.log1p(area)
+    num[:, 6] = np.square(area)
+    num[:, 7] = area / denom
+    num[:, 8] = bd / ba
+    num[:, 9] = area_bin
+    num[:, 10] = (furn & (cat["property_type"] == "Apartment")).astype(float)
+    return FeatureBlock(num, cat, furn)
+
+def load_model(model_path:Optional[str] = None, prefer_native: bool = True):
+    """
+    Native .ubj/.prep.json next to the artifact when present (numpy + xgboost
+    only); otherwise the joblib pipeline, compiled when possible.
+    AQARAK_NATIVE_MODEL=0 always takes the joblib path.
+    """
     global _MODEL
     if not model_path:
         model_path = os.getenv("AQARAK_MODEL_PATH")
     if not model_path:
         raise RuntimeError("Model path not provided and AQARAK_MODEL_PATH not set")
     mp = os.path.abspath(model_path)
+    if prefer_native and os.getenv("AQARAK_NATIVE_MODEL", "1") != "0":
+        from app.ml.native import load_native
+        nm = load_native(mp, featurize)
+        if nm is not None:
+            _MODEL = nm
+            print(f"[ML] loaded native model for: {mp}")
+            return _MODEL
+    import joblib
     _alias_neigh_index_for_pickle()
-    _MODEL = joblib.load(mp)
+    _MODEL = _compile(joblib.load(mp))
     print(f"[ML] loaded model from: {mp}")
     return _MODEL
 
+def _compile(model):
+    """swap in the lookup-table form of the pipeline when it reproduces Pipeline.predict exactly"""
+    if os.getenv("AQARAK_COMPILE_MODEL", "1") == "0":
+        return model
+    try:
+        cm = compile_pipeline(model, NUM_COLS, CAT_COLS)
+        if cm is None:
+            return model
+        blk = featurize(cm.probe_rows())
+        if not np.array_equal(model.predict(blk.to_frame()), cm.predict(blk)):
+            print("[ML] compiled preprocessing disagrees with pipeline, using pipeline")
+            return model
+    except Exception as e:
+        print(f"[ML] pipeline compile skipped: {e}")
+        return model
+    return cm
+
+def export_native_artifact(model, artifact: str) -> Optional[Dict[str, str]]:
+    """write <artifact>.ubj/.prep.json for an XGBoost pipeline; None when it can't be compiled exactly"""
+    from app.ml.native import export_native
+    cm = model if isinstance(model, CompiledModel) else _compile(model)
+    if not isinstance(cm, CompiledModel) or cm.booster is None:
+        return None
+    return export_native(cm, artifact, featurize)
+
 def predict_batch(model, rows: List[Dict[str, Any]]) -> np.ndarray:
-    x=_build_frame(rows)
-    y=model.predict(x)
+    x=featurize(rows)
+    y=model.predict(x if isinstance(model, CompiledModel) else x.to_frame())
     y = np.expm1(y)
     return np.asarray(y,dtype=float)
 
@@ -0,0 +1,212 @@
+import json, logging, queue, threading, time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+ARTIFACT_GLOB = "aqarak_price_model_*.joblib"
+
+class ModelEntry:
+    __slots__ = ("model_id", "path", "meta")
+
+    def __init__(self, model_id: str, path: Path, meta: Dict[str, Any]):
+        self.model_id, self.path, self.meta = model_id, path, meta
+
+    @property
+    def created_at(self) -> str:
+        return str(self.meta.get("created_at", ""))
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "model_id": self.model_id,
+            "file": self.path.name,
+            "created_at": self.meta.get("created_at"),
+            "model_type": self.meta.get("model_type"),
+            "metrics": self.meta.get("metrics", {}),
+            "features": self.meta.get("features", {}),
+        }
+
+def _id_from_stem(stem: str) -> str:
+    for pre in ("aqarak_price_model_xgb_", "aqarak_price_model_"):
+        if stem.startswith(pre):
+            return stem[len(pre):]
+    return stem
+
+def index_models(models_dir: Path) -> Dict[str, ModelEntry]:
+    """
+    model_id -> entry for every artifact in models_dir. The JSON sidecar's
+    model_path is ignored (it's absolute on whatever box trained it); the
+    artifact is the .joblib next to the sidecar.
+    """
+    out: Dict[str, ModelEntry] = {}
+    for p in sorted(Path(models_dir).glob(ARTIFACT_GLOB)):
+        if p.is_symlink():
+            continue
+        meta: Dict[str, Any] = {}
+        side = p.with_suffix(".json")
+        if side.exists():
+            try:
+                meta = json.loads(side.read_text())
+            except (OSError, ValueError) as e:
+                log.warning("registry: unreadable sidecar %s: %s", side, e)
+        mid = str(meta.get("model_id") or _id_from_stem(p.stem))
+        out[mid] = ModelEntry(mid, p, meta)
+    return out
+
+class ShadowScorer:
+    """
+    Scores a candidate model on copies of live payloads in a background
+    thread. submit() never blocks: when the queue is full the sample is
+    dropped and counted. Each request's primary/shadow delta is kept in a
+    bounded window.
+    """
+    def __init__(self, entry: ModelEntry, load_fn: Callable[[str], Any],
+                 predict_fn: Callable[[Any, List[dict]], np.ndarray],
+                 queue_size: int = 256, window: int = 2000, log_path: Optional[str] = None):
+        self.entry = entry
+        self._load_fn = load_fn
+        self._predict_fn = predict_fn
+        self._q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._recent: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._log_path = log_path
+        self.model = None
+        self.error: Optional[str] = None
+        self.submitted = 0
+        self.scored = 0
+        self.dropped = 0
+        self.failed = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"shadow-{entry.model_id}", daemon=True)
+        self._thread.start()
+
+    def submit(self, payloads: List[dict], primary: np.ndarray):
+        if self._stop.is_set():
+            return
+        try:
+            self._q.put_nowait(([dict(p) for p in payloads], np.asarray(primary, dtype=float).copy()))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self._q.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _run(self):
+        try:
+            self.model = self._load_fn(str(self.entry.path))
+        except Exception as e:
+            self.error = f"load failed: {e}"
+            log.warning("shadow %s: %s", self.entry.model_id, self.error)
+            self._stop.set()
+            return
+        while not self._stop.is_set():
+            item = self._q.get()
+            if item is None:
+                break
+            payloads, primary = item
+            try:
+                shadow = np.asarray(self._predict_fn(self.model, payloads), dtype=float)
+            except Exception as e:
+                self.failed += 1
+                self.error = str(e)
+                continue
+            self._record(payloads, primary, shadow)
+
+    def _record(self, payloads: List[dict], primary: np.ndarray, shadow: np.ndarray):
+        delta = shadow - primary
+        rel = delta / np.clip(np.abs(primary), 1.0, None)
+        rec = {
+            "ts": time.time(),
+            "n": int(len(payloads)),
+            "primary_mean": float(primary.mean()),
+            "shadow_mean": float(shadow.mean()),
+            "mean_abs_delta": float(np.abs(delta).mean()),
+            "mean_rel_delta": float(rel.mean()),
+            "max_abs_rel_delta": float(np.abs(rel).max()),
+        }
+        with self._lock:
+            self._recent.append(rec)
+            self.scored += 1
+        if self._log_path:
+            try:
+                with open(self._log_path, "a") as f:
+                    f.write(json.dumps({"shadow_model_id": self.entry.model_id, **rec}) + "\n")
+            except OSError as e:
+                log.warning("shadow log write failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            recs = list(self._recent)
+        out: Dict[str, Any] = {
+            "model_id": self.entry.model_id,
+            "loaded": self.model is not None,
+            "error": self.error,
+            "submitted": self.submitted,
+            "scored": self.scored,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "queue": self._q.qsize(),
+            "window": len(recs),
+        }
+        if recs:
+            abs_d = np.array([r["mean_abs_delta"] for r in recs])
+            rel_d = np.array([r["mean_rel_delta"] for r in recs])
+            out.update({
+                "mean_abs_delta_jod": round(float(abs_d.mean()), 2),
+                "p90_abs_delta_jod": round(float(np.percentile(abs_d, 90)), 2),
+                "mean_rel_delta_pct": round(float(rel_d.mean()) * 100.0, 3),
+                "mean_abs_rel_delta_pct": round(float(np.abs(rel_d).mean()) * 100.0, 3),
+                "last": recs[-1],
+            })
+        return out
+
+class ModelRegistry:
+    """Index of models/ plus the optional shadow candidate scored next to the primary."""
+    def __init__(self, models_dir: Path, load_fn: Callable[[str], Any],
+                 predict_fn: Callable[[Any, List[dict]], np.ndarray], log_path: Optional[str] = None):
+        self.models_dir = Path(models_dir)
+        self._load_fn = load_fn
+        self._predict_fn = predict_fn
+        self._log_path = log_path
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+        self.shadow: Optional[ShadowScorer] = None
+
+    def refresh(self) -> Dict[str, ModelEntry]:
+        entries = index_models(self.models_dir)
+        with self._lock:
+            self._entries = entries
+        return entries
+
+    def entries(self) -> List[ModelEntry]:
+        if not self._entries:
+            self.refresh()
+        return sorted(self._entries.values(), key=lambda e: e.created_at, reverse=True)
+
+    def get(self, model_id: str) -> Optional[ModelEntry]:
+        if model_id not in self._entries:
+            self.refresh()
+        return self._entries.get(model_id)
+
+    def set_shadow(self, model_id: Optional[str]) -> Optional[ShadowScorer]:
+        entry = self.get(model_id) if model_id else None
+        if model_id and entry is None:
+            raise KeyError(f"unknown model_id {model_id!r}")
+        old = self.shadow
+        self.shadow = (ShadowScorer(entry, self._load_fn, self._predict_fn, log_path=self._log_path)
+                       if entry is not None else None)
+        if old is not None:
+            old.stop()
+        return self.shadow
+
+    def submit_shadow(self, payloads: List[dict], primary: np.ndarray):
+        sh = self.shadow
+        if sh is not None:
+            sh.submit(payloads, primary)
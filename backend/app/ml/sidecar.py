@@ -0,0 +1,220 @@
+"""
+Inference sidecar: one process owns the model and serves controlled price
+predictions to the API workers over a Unix domain socket.
+
+    python -m app.ml.sidecar --socket /tmp/aqarak-ml.sock
+
+API workers started with AQARAK_ML_SOCKET pointing at the same path never
+import pandas/sklearn/xgboost or unpickle the artifact themselves.
+
+Wire format (little endian), one request/response per frame:
+
+    request   = "AQPR" u8 op u32 n  body
+    op 1 body = f64[n*5] (bedrooms, bathrooms, area_sqm, floor, building_age; NaN = missing)
+                u8[n] furnished (0/1, 2 = missing)
+                3 x n x (u16 len, utf-8)  city, neighborhood, property_type; len 0xFFFF = missing
+    op 2 body = (empty)                       -> info
+
+    response  = "AQRS" u8 status u32 n  u8 id_len id  body
+    status 0  -> f64[n] prices      status 1 -> u32 len, utf-8 error
+    op 2 body = u32 len, json
+"""
+import argparse, json, logging, os, socket, socketserver, struct, threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+REQ_MAGIC = b"AQPR"
+RES_MAGIC = b"AQRS"
+OP_PREDICT = 1
+OP_INFO = 2
+_HDR = struct.Struct("<4sBI")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_MISSING = 0xFFFF
+NUM_FIELDS = ("bedrooms", "bathrooms", "area_sqm", "floor", "building_age")
+STR_FIELDS = ("city", "neighborhood", "property_type")
+
+def _recv_exact(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("sidecar connection closed")
+        buf += chunk
+    return bytes(buf)
+
+def _num(v) -> float:
+    if v is None:
+        return np.nan
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+def encode_rows(rows: List[Dict[str, Any]]) -> bytes:
+    n = len(rows)
+    num = np.array([[_num(r.get(f)) for f in NUM_FIELDS] for r in rows], dtype="<f8").reshape(n, len(NUM_FIELDS))
+    furn = np.array([2 if r.get("furnished") is None else int(bool(r["furnished"])) for r in rows], dtype=np.uint8)
+    parts = [_HDR.pack(REQ_MAGIC, OP_PREDICT, n), num.tobytes(), furn.tobytes()]
+    for f in STR_FIELDS:
+        for r in rows:
+            v = r.get(f)
+            if v is None:
+                parts.append(_U16.pack(_MISSING))
+                continue
+            b = str(v).encode("utf-8")[:_MISSING - 1]
+            parts.append(_U16.pack(len(b)))
+            parts.append(b)
+    return b"".join(parts)
+
+def decode_rows(n: int, sock: socket.socket) -> List[Dict[str, Any]]:
+    num = np.frombuffer(_recv_exact(sock, n * len(NUM_FIELDS) * 8), dtype="<f8").reshape(n, len(NUM_FIELDS))
+    furn = np.frombuffer(_recv_exact(sock, n), dtype=np.uint8)
+    rows: List[Dict[str, Any]] = [{} for _ in range(n)]
+    for i, r in enumerate(rows):
+        for j, f in enumerate(NUM_FIELDS):
+            v = num[i, j]
+            if not np.isnan(v):
+                r[f] = float(v)
+        if furn[i] != 2:
+            r["furnished"] = bool(furn[i])
+    for f in STR_FIELDS:
+        for r in rows:
+            (ln,) = _U16.unpack(_recv_exact(sock, 2))
+            if ln != _MISSING:
+                r[f] = _recv_exact(sock, ln).decode("utf-8")
+    return rows
+
+def _response(status: int, n: int, model_id: str, body: bytes) -> bytes:
+    mid = model_id.encode("ascii", "replace")[:255]
+    return _HDR.pack(RES_MAGIC, status, n) + bytes([len(mid)]) + mid + body
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        from app.api import ml_price_router as MLR
+        sock = self.request
+        while True:
+            try:
+                magic, op, n = _HDR.unpack(_recv_exact(sock, _HDR.size))
+            except ConnectionError:
+                return
+            if magic != REQ_MAGIC:
+                return
+            if op == OP_INFO:
+                info = json.dumps(MLR.local_info()).encode("utf-8")
+                state = MLR._state
+                sock.sendall(_response(0, 0, state.model_id if state else "", _U32.pack(len(info)) + info))
+                continue
+            rows = decode_rows(n, sock)
+            try:
+                state = MLR._get_state()
+                ys = np.asarray(MLR._predict_cached(rows), dtype="<f8")
+                sock.sendall(_response(0, n, state.model_id, ys.tobytes()))
+            except Exception as e:
+                msg = str(e).encode("utf-8")
+                sock.sendall(_response(1, n, "", _U32.pack(len(msg)) + msg))
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class SidecarError(RuntimeError):
+    pass
+
+class SidecarClient:
+    """Thread-safe client; one persistent connection per calling thread, one reconnect on failure."""
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self.model_id: Optional[str] = None
+        self._local = threading.local()
+
+    def _sock(self) -> socket.socket:
+        s = getattr(self._local, "sock", None)
+        if s is None:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            s.settimeout(self.timeout)
+            s.connect(self.path)
+            self._local.sock = s
+        return s
+
+    def _drop(self):
+        s = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if s is not None:
+            try:
+                s.close()
+            except OSError:
+                pass
+
+    def _call(self, frame: bytes, read_body: Callable[[socket.socket, int], Any]) -> Tuple[int, str, Any]:
+        """
+        One whole request/response exchange: (status, model id, body), body
+        being read_body(sock, n) or the error text. Any failure part way
+        through drops the connection, so a half-read frame is never left
+        for the next call; OSErrors get one retry on a fresh connection.
+        """
+        for attempt in (0, 1):
+            try:
+                s = self._sock()
+                s.sendall(frame)
+                _, status, n = _HDR.unpack(_recv_exact(s, _HDR.size))
+                (ln,) = _recv_exact(s, 1)
+                mid = _recv_exact(s, ln).decode("ascii") if ln else ""
+                if status != 0:
+                    (ln,) = _U32.unpack(_recv_exact(s, 4))
+                    return status, mid, _recv_exact(s, ln).decode("utf-8")
+                return status, mid, read_body(s, n)
+            except BaseException as e:
+                self._drop()
+                if attempt or not isinstance(e, OSError):
+                    raise
+        raise SidecarError("unreachable")
+
+    def info(self) -> Dict[str, Any]:
+        def body(s, n):
+            (ln,) = _U32.unpack(_recv_exact(s, 4))
+            return json.loads(_recv_exact(s, ln).decode("utf-8"))
+        status, mid, info = self._call(_HDR.pack(REQ_MAGIC, OP_INFO, 0), body)
+        if status != 0:
+            raise SidecarError(info)
+        self.model_id = mid or self.model_id
+        return info
+
+    def predict(self, rows: List[Dict[str, Any]]) -> np.ndarray:
+        def body(s, n):
+            return np.frombuffer(_recv_exact(s, n * 8), dtype="<f8").astype(float)
+        status, mid, ys = self._call(encode_rows(rows), body)
+        if status != 0:
+            raise SidecarError(ys)
+        self.model_id = mid
+        return ys
+
+def serve(path: str):
+    from app.api import ml_price_router as MLR
+    if os.path.exists(path):
+        os.unlink(path)
+    srv = _Server(path, _Handler)
+    os.chmod(path, 0o660)
+    MLR.start_warm_up()
+    MLR.start_model_watcher()
+    log.info("inference sidecar listening on %s", path)
+    try:
+        srv.serve_forever()
+    finally:
+        srv.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+def main():
+    ap = argparse.ArgumentParser(description="Aqarak price-model inference sidecar")
+    ap.add_argument("--socket", default=os.getenv("AQARAK_ML_SOCKET_LISTEN", "/tmp/aqarak-ml.sock"))
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    # the sidecar itself always scores locally
+    os.environ.pop("AQARAK_ML_SOCKET", None)
+    serve(args.socket)
+
+if __name__ == "__main__":
+    main()
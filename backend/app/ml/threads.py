@@ -0,0 +1,72 @@
+"""
+Inference thread budget. Artifacts are trained with n_jobs=-1, so an
+unconfigured booster predicts with every core; with several uvicorn
+workers (plus the sidecar and job threads) that oversubscribes the box.
+
+    AQARAK_ML_THREADS        threads per request-sized predict   (default 1; -1 = leave as trained)
+    AQARAK_ML_BATCH_THREADS  threads for large batches           (default 0 = all cores)
+    AQARAK_ML_BATCH_ROWS     model rows at which a call is large (default 4096)
+
+apply() sets the budget on one loaded model. The OpenMP/BLAS pools are
+process-wide, so only the serving entrypoints (API startup, sidecar) cap
+them to AQARAK_ML_THREADS, via limit_serving_pools(); training and eval
+scripts that load a model keep every core.
+"""
+import logging, os
+from typing import Any, Dict
+
+log = logging.getLogger(__name__)
+
+ML_THREADS = int(os.getenv("AQARAK_ML_THREADS", "1"))
+ML_BATCH_THREADS = int(os.getenv("AQARAK_ML_BATCH_THREADS", "0"))
+ML_BATCH_ROWS = int(os.getenv("AQARAK_ML_BATCH_ROWS", "4096"))
+
+def _cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+def budget() -> Dict[str, Any]:
+    if ML_THREADS < 0:
+        return {"managed": False, "threads": None, "batch_threads": None, "batch_rows": None, "cores": _cores()}
+    small = ML_THREADS if ML_THREADS > 0 else _cores()
+    bulk = ML_BATCH_THREADS if ML_BATCH_THREADS > 0 else _cores()
+    return {"managed": True, "threads": small, "batch_threads": max(small, bulk),
+            "batch_rows": ML_BATCH_ROWS, "cores": _cores()}
+
+_native_limited = False
+
+def limit_native_pools(n: int) -> None:
+    """cap OpenMP/BLAS pools process-wide (once)"""
+    global _native_limited
+    if _native_limited:
+        return
+    _native_limited = True
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(n))
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=n)
+    except Exception as e:
+        log.warning("thread budget: native pools not limited: %s", e)
+
+def limit_serving_pools() -> None:
+    """cap OpenMP/BLAS pools to the per-request budget; serving processes only"""
+    b = budget()
+    if b["managed"]:
+        limit_native_pools(b["threads"])
+
+def apply(model: Any) -> Any:
+    """set the thread budget on a loaded (compiled or pipeline) model; returns it"""
+    b = budget()
+    if not b["managed"]:
+        return model
+    if hasattr(model, "set_threads"):
+        model.set_threads(b["threads"], b["batch_threads"], b["batch_rows"])
+        return model
+    est = model.steps[-1][1] if hasattr(model, "steps") else model
+    if hasattr(est, "get_booster"):
+        est.n_jobs = b["threads"]
+        est.get_booster().set_param({"nthread": b["threads"]})
+    return model
@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 load_dotenv()
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 app = FastAPI(title="Aqarak API", version="0.1.0")
 origins = [o.strip() for o in os.getenv("CORS_ORIGINS", "*").split(",")]
@@ -21,6 +22,7 @@ async def startup():
     r = redis.from_url("redis://localhost:6379", encoding="utf-8", decode_responses=True)
     await FastAPILimiter.init(r)
 from app.api.ml_price_router import router as ml_price_router
+from app.api import ml_price_router as ml_price
 app.include_router(ml_price_router)
 from app.api.auth import router as auth_router
 app.include_router(auth_router)
@@ -43,10 +45,21 @@ STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
 if STATIC_DIR.exists():
     app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
 
+@app.on_event("startup")
+def _warm_price_model():
+    ml_price.start_warm_up()
+    ml_price.start_model_watcher()
+
 @app.get("/")
 def root():
     return {"ok": True}
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    if not ml_price.is_ready():
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
\ No newline at end of file
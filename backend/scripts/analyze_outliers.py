@@ -1,14 +1,9 @@
-import pandas as pd
-import numpy as np
 import argparse
+from scripts import feature_store
 
 def analyze_outliers(csv_path):
     print(f"Loading {csv_path}...")
-    df = pd.read_csv(csv_path)
-    
-    # Basic cleaning (similar to training script)
-    df['price'] = pd.to_numeric(df['price'], errors='coerce')
-    df['area_sqm'] = pd.to_numeric(df['area_sqm'], errors='coerce')
+    df = feature_store.load(csv_path)
     df = df.dropna(subset=['price', 'area_sqm'])
     
     print(f"\nTotal records: {len(df)}")
@@ -22,7 +17,6 @@ def analyze_outliers(csv_path):
     print(df['area_sqm'].describe().apply(lambda x: format(x, 'f')))
     
     # Price per SQM
-    df['price_per_sqm'] = df['price'] / df['area_sqm']
     print("\n--- Price per SQM Statistics ---")
     print(df['price_per_sqm'].describe().apply(lambda x: format(x, 'f')))
     
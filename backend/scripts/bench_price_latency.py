@@ -0,0 +1,101 @@
+import argparse, asyncio, json, os, subprocess, sys, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import numpy as np
+import pandas as pd
+from app.ml.normalize import normalize_frame, frame_records
+
+def _rows(csv_path: str, n: int) -> List[dict]:
+    df = pd.read_csv(csv_path).drop(columns=["price", "unit_floor"], errors="ignore")
+    recs = frame_records(normalize_frame(df))
+    return [recs[i % len(recs)] for i in range(n)]
+
+def _summary(tag: str, lat_s: List[float], wall_s: float) -> dict:
+    lat = np.asarray(lat_s) * 1000.0
+    return {
+        "mode": tag,
+        "n": int(len(lat)),
+        "rps": round(len(lat) / wall_s, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        "max_ms": round(float(lat.max()), 2),
+    }
+
+def bench_inprocess(rows: List[dict], concurrency: int, batch: int) -> dict:
+    """N threads calling the uncached controlled predictor, like N request threads / workers"""
+    from app.api import ml_price_router as MLR
+    from app.ml import threads
+    threads.limit_serving_pools()
+    model = MLR._get_model()
+    MLR._predict_controlled_batch(model, rows[:batch])
+    chunks = [rows[i:i+batch] for i in range(0, len(rows), batch)]
+    def one(chunk):
+        t = time.perf_counter()
+        MLR._predict_controlled_batch(model, chunk)
+        return time.perf_counter() - t
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        lat = list(ex.map(one, chunks))
+    out = _summary("inprocess", lat, time.perf_counter() - t0)
+    out.update(concurrency=concurrency, batch=batch, **threads.budget())
+    return out
+
+async def _bench_http(url: str, rows: List[dict], concurrency: int) -> dict:
+    import httpx
+    sem = asyncio.Semaphore(concurrency)
+    lat: List[float] = []
+    keep = ("bedrooms", "bathrooms", "area_sqm", "floor", "building_age",
+            "city", "neighborhood", "property_type", "furnished")
+    async with httpx.AsyncClient(base_url=url, timeout=60) as c:
+        async def one(i, r):
+            body = {k: r.get(k) for k in keep}
+            body["bedrooms"] = int(body["bedrooms"] or 0)
+            body["bathrooms"] = int(body["bathrooms"] or 0)
+            body["furnished"] = bool(body["furnished"])
+            body["area_sqm"] = float(body["area_sqm"]) + (i % 97) * 0.01  # defeat the cache
+            async with sem:
+                t = time.perf_counter()
+                resp = await c.post("/ml/price/predict", json=body)
+                lat.append(time.perf_counter() - t)
+                resp.raise_for_status()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, r) for i, r in enumerate(rows)))
+        wall = time.perf_counter() - t0
+    out = _summary("http", lat, wall)
+    out.update(concurrency=concurrency, url=url)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="price-model latency under concurrent load")
+    ap.add_argument("--csv", default=os.path.join("data", "eval-cleaned-data.csv"))
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--batch", type=int, default=1, help="rows per call (in-process mode)")
+    ap.add_argument("--url", default="", help="benchmark a running server instead, e.g. http://localhost:8000")
+    ap.add_argument("--compare", default="",
+                    help="comma list of AQARAK_ML_THREADS values to run side by side, e.g. --compare=-1,1 (-1 = as trained, i.e. every core: the old behaviour)")
+    args = ap.parse_args()
+
+    if args.compare:
+        results = []
+        for v in [x.strip() for x in args.compare.split(",") if x.strip()]:
+            cmd = [sys.executable, "-m", "scripts.bench_price_latency", "--csv", args.csv,
+                   "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                   "--batch", str(args.batch)]
+            env = dict(os.environ, AQARAK_ML_THREADS=v)
+            out = subprocess.run(cmd, env=env, capture_output=True, text=True, check=True).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        cols = ["managed", "threads", "batch_threads", "cores", "concurrency", "batch", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+        print(pd.DataFrame(results)[cols].to_string(index=False))
+        return
+
+    rows = _rows(args.csv, args.requests * (1 if args.url else args.batch))
+    if args.url:
+        res = asyncio.run(_bench_http(args.url, rows, args.concurrency))
+    else:
+        res = bench_inprocess(rows, args.concurrency, args.batch)
+    print(json.dumps(res))
+
+if __name__ == "__main__":
+    main()
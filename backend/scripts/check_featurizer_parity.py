@@ -0,0 +1,68 @@
+import argparse, os, sys
+import numpy as np
+import pandas as pd
+from app.ml.predictor import load_model, _build_frame, featurize, NUM_COLS, CAT_COLS, CompiledModel
+from app.api import ml_price_router as MLR
+
+def _records(df: pd.DataFrame) -> list:
+    """same shaping as the router: NaN -> None, then _normalize"""
+    def _noneify(v): return None if (isinstance(v, float) and not np.isfinite(v)) else v
+    return [MLR._normalize({k: _noneify(v) for k, v in r.items()}) for r in df.to_dict(orient="records")]
+
+def _compare(rows: list) -> list:
+    ref = _build_frame(rows)
+    blk = featurize(rows)
+    bad = []
+    for c in NUM_COLS:
+        a = ref[c].to_numpy(dtype=np.float32)
+        b = blk.column(c)
+        same = (a == b) | (np.isnan(a) & np.isnan(b))
+        if not same.all():
+            bad.append((c, int((~same).sum())))
+    for c in CAT_COLS:
+        same = ref[c].to_numpy(dtype=object) == blk.column(c)
+        if not same.all():
+            bad.append((c, int((~same).sum())))
+    if not (ref["furnished"].to_numpy(dtype=bool) == blk.furnished).all():
+        bad.append(("furnished", int((ref["furnished"].to_numpy(dtype=bool) != blk.furnished).sum())))
+    return bad
+
+def main():
+    ap = argparse.ArgumentParser(description="featurize() vs _build_frame() parity check")
+    ap.add_argument("csv", nargs="?", default=os.path.join("data", "eval-cleaned-data.csv"))
+    ap.add_argument("--model", default=os.getenv("AQARAK_MODEL_PATH", os.path.join("models", "aqarak_price_model_latest.joblib")))
+    ap.add_argument("--no-model", action="store_true", help="only compare feature columns")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.csv).drop(columns=["price"], errors="ignore")
+    rows = _records(df)
+    # the neutral-neighborhood and sparse-row variants the router also sends
+    variants = [dict(r, neighborhood="") for r in rows[:500]]
+    sparse = [{k: v for k, v in r.items() if v is not None} for r in rows[:500]]
+
+    failed = False
+    for tag, rs in [("eval", rows), ("neutral", variants), ("sparse", sparse)]:
+        bad = _compare(rs)
+        print(f"[features] {tag:8s} n={len(rs)}  mismatched={bad or 'none'}")
+        failed |= bool(bad)
+
+    if not args.no_model:
+        model = load_model(args.model, prefer_native=False)
+        y_ref = model.predict(_build_frame(rows))
+        y_new = model.predict(featurize(rows).to_frame())
+        diff = float(np.max(np.abs(np.asarray(y_ref) - np.asarray(y_new)))) if len(rows) else 0.0
+        print(f"[model]    max |log-pred diff|={diff:.3g}")
+        failed |= diff != 0.0
+        if isinstance(model, CompiledModel):
+            y_cm = model.predict(featurize(rows))
+            diff = float(np.max(np.abs(np.asarray(y_ref) - np.asarray(y_cm)))) if len(rows) else 0.0
+            print(f"[compiled] max |log-pred diff|={diff:.3g}")
+            failed |= diff != 0.0
+
+    if failed:
+        print("featurizer parity FAILED", file=sys.stderr)
+        sys.exit(1)
+    print("featurizer parity OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Core budget for the hyper-parameter searches in train_price_model_v3.
+
+A search with n_jobs=-1 around an XGBRegressor(n_jobs=-1) starts cores x
+cores threads. Here the cores are split once: `workers` processes each
+train one trial at a time with `threads` booster threads, so
+workers * threads <= cores (AQARAK_TRAIN_WORKERS / AQARAK_TRAIN_THREADS or
+the script flags override the split).
+
+The per-fold matrices are written once to .npy files (FoldStore) and every
+worker opens them memory-mapped, so nothing but the file names is pickled
+per task. Each trial reports its wall time and the worker's peak RSS while
+it ran.
+"""
+import os, resource, shutil, tempfile, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from app.ml import threads as ml_threads
+
+def core_split(n_tasks: int, workers: int = 0, threads: int = 0) -> Tuple[int, int]:
+    """(worker processes, booster threads per worker) for n_tasks independent fits"""
+    cores = ml_threads._cores()
+    workers = workers or int(os.getenv("AQARAK_TRAIN_WORKERS", "0"))
+    threads = threads or int(os.getenv("AQARAK_TRAIN_THREADS", "0"))
+    if workers <= 0:
+        workers = max(1, min(n_tasks, cores // threads if threads > 0 else cores))
+    if threads <= 0:
+        threads = max(1, cores // workers)
+    return workers, threads
+
+class FoldStore:
+    """per-fold arrays as .npy files in a temp dir; `folds` is the list of {name: path} handed to workers"""
+    def __init__(self, folds: List[Dict[str, np.ndarray]], root: Optional[str] = None):
+        self.dir = tempfile.mkdtemp(prefix="aqarak-folds-", dir=root)
+        self.folds = []
+        for i, arrays in enumerate(folds):
+            paths = {}
+            for name, a in arrays.items():
+                paths[name] = os.path.join(self.dir, f"fold{i}-{name}.npy")
+                np.save(paths[name], np.ascontiguousarray(a))
+            self.folds.append(paths)
+
+    def close(self) -> None:
+        _MATS.clear()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+_MATS: Dict[tuple, tuple] = {}  # per process: (fold train file, quantile) -> DMatrices, built once and reused by later trials
+
+def _fold_mats(paths: Dict[str, str], quantile: bool = False) -> tuple:
+    key = (paths["X_fit"], quantile)
+    if key not in _MATS:
+        import xgboost as xgb
+        a = {k: np.load(p, mmap_mode="r") for k, p in paths.items()}
+        if quantile:
+            dfit = xgb.QuantileDMatrix(a["X_fit"], label=a["y_fit"], weight=a["w_fit"])
+            dval = xgb.QuantileDMatrix(a["X_val"], label=a["y_val"], ref=dfit)
+        else:
+            dfit = xgb.DMatrix(a["X_fit"], label=a["y_fit"], weight=a["w_fit"])
+            dval = xgb.DMatrix(a["X_val"], label=a["y_val"])
+        _MATS[key] = (dfit, dval, np.asarray(a["y_val"], dtype=float))
+    return _MATS[key]
+
+def reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def _status_mb(field: str) -> Optional[float]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+def peak_rss_mb() -> float:
+    """peak RSS since the last reset_peak_rss() (Linux), else since the process started"""
+    v = _status_mb("VmHWM")
+    return v if v is not None else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+def rss_mb() -> float:
+    v = _status_mb("VmRSS")
+    return v if v is not None else peak_rss_mb()
+
+def run_trial(task: dict) -> dict:
+    """
+    Train one config on every fold. task: params (xgb.train), rounds,
+    early_stopping (None = all rounds), folds (FoldStore.folds), nthread,
+    quantile (hist-binned QuantileDMatrix inputs instead of float DMatrix).
+    Fold targets are log1p prices; the MAE is reported in log space and in JOD.
+    """
+    import xgboost as xgb
+    reset_peak_rss()
+    t0 = time.perf_counter()
+    params = dict(task["params"], nthread=task["nthread"])
+    its, maes, maes_log, trained = [], [], [], 0
+    for paths in task["folds"]:
+        dfit, dval, yval = _fold_mats(paths, task.get("quantile", False))
+        es = task.get("early_stopping")
+        bst = xgb.train(params, dfit, num_boost_round=task["rounds"], evals=[(dval, "val")] if es else (),
+                        early_stopping_rounds=es, verbose_eval=False)
+        it = int(bst.best_iteration) + 1 if es else bst.num_boosted_rounds()
+        pred = bst.predict(dval, iteration_range=(0, it))
+        its.append(it)
+        maes_log.append(float(np.mean(np.abs(pred - yval))))
+        maes.append(float(np.mean(np.abs(np.expm1(pred) - np.expm1(yval)))))
+        trained += bst.num_boosted_rounds()
+    return {"fold_iterations": its, "val_mae": float(np.mean(maes)), "val_mae_log": float(np.mean(maes_log)),
+            "rounds_trained": trained, "secs": round(time.perf_counter() - t0, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1)}
+
+def _init_worker(n: int) -> None:
+    ml_threads.limit_native_pools(n)
+
+class Scheduler:
+    """runs run_trial tasks on `workers` spawned processes (in-process when workers == 1)"""
+    def __init__(self, workers: int, threads: int, quantile: bool = False):
+        self.workers, self.threads, self.quantile = workers, threads, quantile
+        self._pool = None
+        if workers > 1:
+            self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"),
+                                             initializer=_init_worker, initargs=(threads,))
+
+    def run(self, tasks: Iterable[dict]) -> Iterator[Tuple[int, dict]]:
+        """(index, result) per task, in completion order"""
+        tasks = [dict(t, nthread=self.threads, quantile=self.quantile) for t in tasks]
+        if self._pool is None:
+            for i, t in enumerate(tasks):
+                yield i, run_trial(t)
+            return
+        futs = {self._pool.submit(run_trial, t): i for i, t in enumerate(tasks)}
+        for fut in as_completed(futs):
+            yield futs[fut], fut.result()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,241 @@
+"""
+Latency-budgeted serving model from a trained price model (the teacher).
+
+Two kinds of candidate, all scored through the router path on the eval CSV:
+
+  prune:N     the teacher's first N boosting rounds (trailing trees dropped)
+  student:TxD a small booster (T rounds, depth D) fit to the teacher's
+              log-price on the training rows plus jittered copies of them
+
+A candidate is promoted only if its router MAE is within
+--max-mae-increase-pct of the teacher's and its per-request latency is
+under --max-latency-ms (default: 10% faster than the teacher). Promotion
+writes a normal artifact set (joblib pipeline with the teacher's prep,
+JSON meta, native .ubj/.prep.json); --link-latest also repoints
+aqarak_price_model_latest.joblib at it. No candidate within budget is a
+normal outcome: nothing is written and the exit status is 0.
+
+    python -m scripts.distill_price_model --promote
+"""
+import argparse, json, os, sys, time, uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.ml.compiled import CompiledModel
+from app.ml.predictor import load_model, featurize, export_native_artifact
+from app.ml.normalize import normalize_frame, frame_records
+from app.ml import threads
+from app.api import ml_price_router as MLR
+from scripts import feature_store
+
+def _records(df: pd.DataFrame) -> List[dict]:
+    """router records from a feature_store frame, exactly as eval_price_model builds them"""
+    return frame_records(normalize_frame(df[feature_store.RAW_COLS]))
+
+def _augment(recs: List[dict], copies: int, seed: int) -> List[dict]:
+    """jittered copies of the training rows, including the neutral-neighborhood rows the router asks for"""
+    rng = np.random.default_rng(seed)
+    by_city: Dict[str, List[str]] = {}
+    for r in recs:
+        by_city.setdefault(str(r.get("city") or ""), []).append(str(r.get("neighborhood") or ""))
+    out = list(recs)
+    for _ in range(copies):
+        for r in recs:
+            a = dict(r)
+            if a.get("area_sqm") is not None:
+                a["area_sqm"] = float(a["area_sqm"]) * float(np.exp(rng.normal(0.0, 0.15)))
+                a["area_sq"] = a["area_sqm"] ** 2
+            for k in ("bedrooms", "bathrooms"):
+                if a.get(k) is not None:
+                    a[k] = max(0, int(a[k]) + int(rng.integers(-1, 2)))
+            if a.get("floor") is not None:
+                a["floor"] = int(a["floor"]) + int(rng.integers(-1, 2))
+            if a.get("building_age") is not None and rng.random() < 0.5:
+                a["building_age"] = float(rng.integers(0, 30))
+            a["furnished"] = bool(rng.random() < 0.5)
+            u = rng.random()
+            if u < 0.25:
+                a["neighborhood"] = ""
+            elif u < 0.5:
+                pool = by_city[str(r.get("city") or "")]
+                a["neighborhood"] = pool[int(rng.integers(len(pool)))]
+            out.append(a)
+    return out
+
+def _clone(teacher: CompiledModel, booster) -> CompiledModel:
+    cm = CompiledModel(None, teacher.steps, teacher.n_out, None, booster=booster)
+    cm.missing = teacher.missing
+    return threads.apply(cm)
+
+def _pruned(teacher: CompiledModel, rounds: int) -> CompiledModel:
+    return _clone(teacher, teacher.booster[:rounds])
+
+def _student(teacher: CompiledModel, X: np.ndarray, y: np.ndarray, rounds: int, depth: int, seed: int) -> CompiledModel:
+    import xgboost as xgb
+    params = {"objective": "reg:squarederror", "tree_method": "hist", "max_depth": depth,
+              "eta": 0.1, "subsample": 0.8, "colsample_bytree": 0.8, "min_child_weight": 1,
+              "seed": seed, "nthread": 0}
+    b = xgb.train(params, xgb.DMatrix(X, label=y, missing=teacher.missing), num_boost_round=rounds)
+    return _clone(teacher, b)
+
+def _latency_ms(model, recs: List[dict], n: int, repeats: int = 3) -> float:
+    """median wall time of one controlled request (4 model rows), like /predict on a cache miss; best of `repeats`"""
+    MLR._predict_controlled_batch(model, recs[:1])
+    best = float("inf")
+    for _ in range(repeats):
+        lat = []
+        for i in range(n):
+            t = time.perf_counter()
+            MLR._predict_controlled_batch(model, [recs[i % len(recs)]])
+            lat.append(time.perf_counter() - t)
+        best = min(best, float(np.median(lat)))
+    return best * 1000.0
+
+def _bulk_us(model, X: np.ndarray, repeats: int = 3) -> float:
+    model.predict_dense(X)  # builds the bulk booster copy, if any
+    best = float("inf")
+    for _ in range(repeats):
+        t = time.perf_counter()
+        model.predict_dense(X)
+        best = min(best, time.perf_counter() - t)
+    return best / len(X) * 1e6
+
+def _score(tag: str, model, eval_recs: List[dict], y_true: np.ndarray, X_eval: np.ndarray,
+           teacher_log: Optional[np.ndarray], latency_n: int) -> dict:
+    y = np.maximum(0.0, MLR._predict_controlled_batch(model, eval_recs))
+    err = y - y_true
+    log_pred = model.predict_dense(X_eval)
+    trees = model.booster.num_boosted_rounds()
+    return {
+        "candidate": tag,
+        "trees": int(trees),
+        "MAE": float(np.mean(np.abs(err))),
+        "MAPE%": float(np.mean(np.abs(err / np.clip(np.abs(y_true), 1e-9, None))) * 100.0),
+        "fidelity_MAE_log": float(np.mean(np.abs(log_pred - teacher_log))) if teacher_log is not None else 0.0,
+        "request_ms": _latency_ms(model, eval_recs, latency_n),
+        "bulk_us_per_row": _bulk_us(model, X_eval),
+    }
+
+def _promote(teacher_path: str, teacher_meta: dict, cm: CompiledModel, res: dict, outdir: str) -> str:
+    import joblib
+    import xgboost as xgb
+    from sklearn.pipeline import Pipeline
+    pipe = joblib.load(teacher_path)
+    mid = uuid.uuid4().hex[:10]
+    stem = os.path.join(outdir, f"aqarak_price_model_xgb_{mid}")
+    cm.booster.save_model(stem + ".ubj")
+    reg = xgb.XGBRegressor()
+    reg.load_model(stem + ".ubj")
+    reg.n_jobs = -1
+    student = Pipeline([(pipe.steps[0][0], pipe.steps[0][1]), (pipe.steps[-1][0], reg)])
+    joblib.dump(student, stem + ".joblib")
+    native = export_native_artifact(load_model(stem + ".joblib", prefer_native=False), stem + ".joblib")
+    meta = {
+        "model_path": os.path.abspath(stem + ".joblib"),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "model_id": mid,
+        "model_type": "XGBoost-distilled",
+        "parent_model_id": teacher_meta.get("model_id"),
+        "distill": res,
+        "metrics": {"MAE_JOD": round(res["MAE"], 2), "MAPE_%": round(res["MAPE%"], 2)},
+        "features": teacher_meta.get("features"),
+        "config": teacher_meta.get("config", {}),
+    }
+    if native:
+        meta["native"] = native
+    with open(stem + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return stem + ".joblib"
+
+def main():
+    ap = argparse.ArgumentParser(description="prune or distill the price model to fit a latency budget")
+    ap.add_argument("--model", default=os.path.join("models", "aqarak_price_model_latest.joblib"))
+    ap.add_argument("--train-csv", default=os.path.join("data", "all-cleaned-data_v3.csv"))
+    ap.add_argument("--eval-csv", default=os.path.join("data", "eval-cleaned-data.csv"))
+    ap.add_argument("--prune", default="0.25,0.5,0.75", help="fractions of the teacher's rounds to keep")
+    ap.add_argument("--students", default="100x6,200x6,300x8", help="ROUNDSxDEPTH student boosters")
+    ap.add_argument("--augment", type=int, default=8, help="jittered copies per training row")
+    ap.add_argument("--max-mae-increase-pct", type=float, default=1.0)
+    ap.add_argument("--max-latency-ms", type=float, default=None,
+                    help="per-request budget; default: the teacher's latency / --min-speedup")
+    ap.add_argument("--min-speedup", type=float, default=1.1)
+    ap.add_argument("--latency-requests", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--promote", action="store_true", help="write the best passing candidate as an artifact")
+    ap.add_argument("--link-latest", action="store_true", help="with --promote: repoint the latest symlink")
+    ap.add_argument("--outdir", default="models")
+    args = ap.parse_args()
+
+    teacher = load_model(args.model, prefer_native=False)
+    if not isinstance(teacher, CompiledModel) or teacher.booster is None:
+        print("teacher must be a compilable XGBoost pipeline", file=sys.stderr)
+        sys.exit(1)
+    meta_path = os.path.splitext(os.path.realpath(args.model))[0] + ".json"
+    teacher_meta = json.load(open(meta_path)) if os.path.exists(meta_path) else {}
+    total = teacher.booster.num_boosted_rounds()
+    if teacher.iteration_range[1]:
+        total = min(total, teacher.iteration_range[1])
+
+    df_ev = feature_store.load(args.eval_csv).dropna(subset=feature_store.RAW_COLS + ["price"])
+    eval_recs = _records(df_ev)
+    y_true = df_ev["price"].to_numpy(dtype=float)
+    X_eval = teacher.transform(featurize(eval_recs))
+    teacher_log = teacher.predict_dense(X_eval)
+
+    results = [_score("teacher", teacher, eval_recs, y_true, X_eval, teacher_log, args.latency_requests)]
+    models = {"teacher": teacher}
+    for frac in [float(x) for x in args.prune.split(",") if x.strip()]:
+        k = max(1, int(round(total * frac)))
+        tag = f"prune:{k}"
+        models[tag] = _pruned(teacher, k)
+        results.append(_score(tag, models[tag], eval_recs, y_true, X_eval, teacher_log, args.latency_requests))
+
+    specs = [s.strip() for s in args.students.split(",") if s.strip()]
+    if specs:
+        aug = _augment(_records(feature_store.load(args.train_csv)), args.augment, args.seed)
+        X_aug = teacher.transform(featurize(aug))
+        y_aug = teacher.predict_dense(X_aug)
+        print(f"[distill] {len(aug)} teacher-labelled rows")
+        for s in specs:
+            rounds, depth = (int(v) for v in s.lower().split("x"))
+            tag = f"student:{rounds}x{depth}"
+            t0 = time.perf_counter()
+            models[tag] = _student(teacher, X_aug, y_aug, rounds, depth, args.seed)
+            print(f"[distill] {tag} fit in {time.perf_counter() - t0:.1f}s")
+            results.append(_score(tag, models[tag], eval_recs, y_true, X_eval, teacher_log, args.latency_requests))
+
+    base = results[0]
+    max_ms = args.max_latency_ms if args.max_latency_ms is not None else base["request_ms"] / args.min_speedup
+    for r in results:
+        r["MAE_increase_%"] = (r["MAE"] / base["MAE"] - 1.0) * 100.0
+        r["passes"] = (r["candidate"] != "teacher" and r["MAE_increase_%"] <= args.max_mae_increase_pct
+                       and r["request_ms"] < max_ms)
+    out = pd.DataFrame(results)
+    pd.set_option("display.width", 200)
+    print(out.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\nbudget: MAE +{args.max_mae_increase_pct:.2f}% max, request < {max_ms:.3f} ms")
+
+    passing = [r for r in results if r["passes"]]
+    if not passing:
+        # a normal outcome, not a failure: the teacher stays what it is
+        print("no candidate meets the budget; nothing promoted")
+        return
+    best = min(passing, key=lambda r: r["request_ms"])
+    print(f"best: {best['candidate']}  MAE {best['MAE']:.0f} ({best['MAE_increase_%']:+.2f}%)  "
+          f"{best['request_ms']:.3f} ms/request vs {base['request_ms']:.3f}")
+    if not args.promote:
+        return
+    path = _promote(os.path.realpath(args.model), teacher_meta, models[best["candidate"]], best, args.outdir)
+    print(f"[distill] promoted {path}")
+    if args.link_latest:
+        link = os.path.join(args.outdir, "aqarak_price_model_latest.joblib")
+        tmp = link + ".tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        os.symlink(os.path.basename(path), tmp)
+        os.replace(tmp, link)
+        print(f"[distill] {link} -> {os.path.basename(path)}")
+
+if __name__ == "__main__":
+    main()
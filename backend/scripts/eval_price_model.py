@@ -1,26 +1,27 @@
-import argparse, os, sys, time
-from typing import List, Tuple, Iterable
+import argparse, contextlib, glob, io, json, os, pickle, sys, tempfile, time, warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from typing import Dict, List, Tuple, Iterable
 import numpy as np
 import pandas as pd
-from app.ml.predictor import load_model as _load_model, predict_batch
-from app.api import ml_price_router as MLR
+from app.ml import threads as ml_threads
+from app.ml.compiled import CompiledModel
+from app.ml.predictor import load_model as _load_model, predict_batch, featurize
+from app.ml.postprocess import controlled_variants, rule_inputs, apply_rules
+from app.ml.normalize import normalize_frame, frame_records
+from scripts import cv_scheduler, feature_store
 
 def _require_cols(df: pd.DataFrame, cols: List[str]) -> Tuple[pd.DataFrame, List[str]]:
     missing = [c for c in cols if c not in df.columns]
     return df, missing
 
 def _to_norm_records(df: pd.DataFrame) -> List[dict]:
-    """Apply router's _normalize row-by-row (adds area_sq handles total_floors->floor for villas)"""
-    recs: List[dict] = []
-    def _noneify(v): return None if (isinstance(v, float) and not np.isfinite(v)) else v
-    for row in df.to_dict(orient="records"):
-        row = {k: _noneify(v) for k, v in row.items()}
-        recs.append(MLR._normalize(row))
-    return recs
+    """router normalization on the whole frame (area_sq, villas total_floors->floor), NaN -> None"""
+    return frame_records(normalize_frame(df))
 
 def _predict_df(model, df: pd.DataFrame) -> np.ndarray:
     """predict via production preprocessor (predict_batch) in chunks"""
-    recs = _to_norm_records(df)
+    recs = _to_norm_records(df[feature_store.RAW_COLS])
     out: List[float] = []
     B = 10000
     for i in range(0, len(recs), B):
@@ -45,84 +46,286 @@ def _print_overall(tag: str, took_s: float, m: dict):
     print(f"n={m['n']}  time={took_s:.2f}s  mode={tag}")
     print(f"R2={m['R2']:.4f}  MAPE={m['MAPE%']:.2f}%  wMAPE={m['wMAPE%']:.2f}%  ACC≈{max(0.0, 100.0 - m['wMAPE%']):.2f}%")
 
+def _group_table(df: pd.DataFrame, y_true: np.ndarray, y_pred: np.ndarray, keys: List[str]) -> pd.DataFrame:
+    """_metrics per group of `keys` (plus medians), from one groupby aggregation over per-row error columns"""
+    y_true = np.asarray(y_true, dtype=float)
+    err = np.asarray(y_pred, dtype=float) - y_true
+    t = df[keys].reset_index(drop=True).assign(
+        _y=y_true, _p=np.asarray(y_pred, dtype=float), _ae=np.abs(err), _se=err ** 2,
+        _ape=np.abs(err / np.clip(np.abs(y_true), 1e-9, None)), _ay=np.abs(y_true))
+    g = t.groupby(keys, dropna=False)
+    t["_dev"] = (t["_y"] - g["_y"].transform("mean")) ** 2
+    a = t.groupby(keys, dropna=False).agg(
+        n=("_y", "size"), ae=("_ae", "sum"), se=("_se", "sum"), ape=("_ape", "mean"), ay=("_ay", "sum"),
+        dev=("_dev", "sum"), median_true=("_y", "median"), median_pred=("_p", "median"))
+    out = pd.DataFrame({
+        "n": a["n"],
+        "MAE": a["ae"] / a["n"],
+        "RMSE": np.sqrt(a["se"] / a["n"]),
+        "R2": np.where(a["dev"] > 0, 1.0 - a["se"] / a["dev"].where(a["dev"] > 0, 1.0), np.nan),
+        "MAPE%": a["ape"] * 100.0,
+        "wMAPE%": a["ae"] / a["ay"].clip(lower=1e-9) * 100.0,
+        "median_true": a["median_true"],
+        "median_pred": a["median_pred"],
+    }, index=a.index)
+    return out.reset_index().sort_values(by="MAE", ascending=False)
+
 def _print_groupby(df: pd.DataFrame, y_true: np.ndarray, y_pred: np.ndarray, keys: Iterable[str]):
-    if not keys:
+    keys = list(keys)
+    if not keys or len(y_true) == 0:
         return
-    g = df.assign(_y=y_true, _p=y_pred).groupby(list(keys), dropna=False)
-    rows = []
-    for grp, sub in g:
-        yt = sub["_y"].to_numpy(dtype=float)
-        yp = sub["_p"].to_numpy(dtype=float)
-        if len(yt) == 0:
-            continue
-        m = _metrics(yt, yp)
-        label = grp if isinstance(grp, tuple) else (grp,)
-        rows.append((*label, len(sub), m["MAE"], m["RMSE"], m["R2"], m["MAPE%"], m["wMAPE%"],
-                     float(np.median(yt)), float(np.median(yp))))
-    if not rows:
-        return
-    cols = list(keys) + ["n","MAE","RMSE","R2","MAPE%","wMAPE%","median_true","median_pred"]
-    out = pd.DataFrame(rows, columns=cols).sort_values(by="MAE", ascending=False)
+    out = _group_table(df, y_true, y_pred, keys)
     pd.set_option("display.max_rows", 200)
     print(f"\n=== By {', '.join(keys)} ===")
     print(out.to_string(index=False))
-    
+
+BOOT_CHUNK = 250  # resamples per pool task; fixed so the draws don't depend on the worker count
+BOOT_POOL_MIN_WORK = 1e8  # rows x models x resamples below which spawning workers costs more than it saves
+
+def _bootstrap_chunk(task: tuple) -> tuple:
+    """
+    `reps` resamples of the rows, each as per-row draw counts. Returns MAE
+    and wMAPE% per (resample, model) and, with group codes, per (resample,
+    model, group); groups missing from a resample are NaN.
+    """
+    abs_err, y_abs, codes, n_groups, reps, seed = task
+    rng = np.random.default_rng(seed)
+    m, n = abs_err.shape
+    mae, wmape = np.empty((reps, m)), np.empty((reps, m))
+    g_mae = g_wmape = None
+    if codes is not None:
+        g_mae, g_wmape = np.empty((reps, m, n_groups)), np.empty((reps, m, n_groups))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for r in range(reps):
+            w = np.bincount(rng.integers(0, n, n), minlength=n).astype(float)
+            e = abs_err * w
+            tot = e.sum(axis=1)
+            mae[r] = tot / n
+            wmape[r] = tot / float(w @ y_abs) * 100.0
+            if codes is not None:
+                cnt = np.bincount(codes, weights=w, minlength=n_groups)
+                ysum = np.bincount(codes, weights=w * y_abs, minlength=n_groups)
+                for j in range(m):
+                    es = np.bincount(codes, weights=e[j], minlength=n_groups)
+                    g_mae[r, j] = np.where(cnt > 0, es / cnt, np.nan)
+                    g_wmape[r, j] = np.where(cnt > 0, es / ysum * 100.0, np.nan)
+    return mae, wmape, g_mae, g_wmape
+
+def _bootstrap(y_true: np.ndarray, preds: np.ndarray, reps: int, seed: int, workers: int,
+               codes: np.ndarray = None, n_groups: int = 0) -> dict:
+    """
+    Paired bootstrap of MAE / wMAPE% for preds (models x rows): every model
+    is scored on the same resamples, so differences between rows of `preds`
+    can be read off directly. Chunks of BOOT_CHUNK resamples run on a
+    process pool.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    abs_err = np.abs(np.atleast_2d(np.asarray(preds, dtype=float)) - y_true)
+    y_abs = np.abs(y_true)
+    sizes = [min(BOOT_CHUNK, reps - i) for i in range(0, reps, BOOT_CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(abs_err, y_abs, codes, n_groups, k, sd) for k, sd in zip(sizes, seeds)]
+    workers = min(workers, len(tasks))
+    if workers > 1 and abs_err.size * reps >= BOOT_POOL_MIN_WORK:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            parts = list(pool.map(_bootstrap_chunk, tasks))
+    else:
+        parts = [_bootstrap_chunk(t) for t in tasks]
+    out = {"MAE": np.concatenate([p[0] for p in parts]), "wMAPE%": np.concatenate([p[1] for p in parts])}
+    if codes is not None:
+        out["group_MAE"] = np.concatenate([p[2] for p in parts])
+        out["group_wMAPE%"] = np.concatenate([p[3] for p in parts])
+    return out
+
+def _ci(samples: np.ndarray, level: float) -> Tuple[np.ndarray, np.ndarray]:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns: models with non-finite predictions
+        lo, hi = np.nanpercentile(samples, [(100.0 - level) / 2.0, 100.0 - (100.0 - level) / 2.0], axis=0)
+    return lo, hi
+
+def _print_bootstrap(df: pd.DataFrame, y_true: np.ndarray, y_pred: np.ndarray, args) -> None:
+    """overall and per-`--bootstrap-by` MAE / wMAPE% with --ci percentile intervals"""
+    key = args.bootstrap_by
+    codes, groups = pd.factorize(df[key].astype(str), sort=True)
+    workers, _ = cv_scheduler.core_split((args.bootstrap + BOOT_CHUNK - 1) // BOOT_CHUNK, args.workers)
+    t0 = time.perf_counter()
+    b = _bootstrap(y_true, y_pred, args.bootstrap, args.seed, workers, codes, len(groups))
+    took = time.perf_counter() - t0
+    if len(y_true) * args.bootstrap < BOOT_POOL_MIN_WORK:
+        workers = 1
+    m = _metrics(y_true, y_pred)
+    lo_m, hi_m = _ci(b["MAE"][:, 0], args.ci)
+    lo_w, hi_w = _ci(b["wMAPE%"][:, 0], args.ci)
+    print(f"\n=== Bootstrap ({args.bootstrap} resamples, {args.ci:g}% CI, {workers} worker(s), {took:.2f}s) ===")
+    print(f"MAE={m['MAE']:.0f} [{lo_m:.0f}, {hi_m:.0f}]  wMAPE={m['wMAPE%']:.2f}% [{lo_w:.2f}, {hi_w:.2f}]")
+
+    err = np.abs(np.asarray(y_pred, dtype=float) - y_true)
+    n = np.bincount(codes, minlength=len(groups))
+    ae = np.bincount(codes, weights=err, minlength=len(groups))
+    ay = np.bincount(codes, weights=np.abs(y_true), minlength=len(groups))
+    glo_m, ghi_m = _ci(b["group_MAE"][:, 0, :], args.ci)
+    glo_w, ghi_w = _ci(b["group_wMAPE%"][:, 0, :], args.ci)
+    out = pd.DataFrame({key: groups, "n": n, "MAE": ae / np.maximum(n, 1), "MAE_lo": glo_m, "MAE_hi": ghi_m,
+                        "wMAPE%": ae / np.clip(ay, 1e-9, None) * 100.0, "wMAPE_lo": glo_w, "wMAPE_hi": ghi_w})
+    out = out[out["n"] >= args.min_group_n].sort_values("n", ascending=False)
+    pd.set_option("display.max_rows", 200)
+    print(f"\n=== Bootstrap by {key} (n >= {args.min_group_n}) ===")
+    print(out.to_string(index=False, float_format=lambda v: f"{v:.1f}"))
 
 def _router_predict(model, df_in: pd.DataFrame) -> np.ndarray:
     """
-    mirrors ml_price_router.py:
-      - normalize rows (adds area_sq, villas total_floors->floor)
-      - neighborhood blend
-      - market uplift
-      - furnished anchor policy (unfurnished % off furnished)
-      - floor/story adjustment
+    same path as ml_price_router.py: normalize rows, then
+    app.ml.postprocess.apply_rules (neighborhood blend, market uplift,
+    furnished anchor, floor/story adjustment) on the four variants per row
     """
-    base_recs = _to_norm_records(df_in)
-    base_df = pd.DataFrame(base_recs)
-    if "furnished" not in base_df.columns:
-        base_df["furnished"] = False
-    base_df["furnished"] = base_df["furnished"].fillna(False).astype(bool)
-    def _set(recs: List[dict], **over):
-        out = []
-        for r in recs:
-            rr = dict(r)
-            rr.update(over)
-            out.append(rr)
-        return out
-
-    recs_t  = _set(base_recs, furnished=True)
-    recs_f  = _set(base_recs, furnished=False)
-    recs_t0 = _set(recs_t, neighborhood="")
-    recs_f0 = _set(recs_f, neighborhood="")
-    def _pred(recs: List[dict]) -> np.ndarray:
-        out: List[float] = []
-        B = 10000
-        for i in range(0, len(recs), B):
-            out.extend(predict_batch(model, recs[i:i+B]))
-        return np.asarray(out, dtype=float)
-
-    y_t  = _pred(recs_t)
-    y_f  = _pred(recs_f)
-    y_t0 = _pred(recs_t0)
-    y_f0 = _pred(recs_f0)
-    blend = float(getattr(MLR, "NEIGHBORHOOD_BLEND", 0.85))
-    y_t_b = y_t0 + blend * (y_t - y_t0)
-    y_f_b = y_f0 + blend * (y_f - y_f0)
-    y_t_b = np.array([MLR._market_blend(v, r) for v, r in zip(y_t_b, recs_t)], dtype=float)
-    y_f_b = np.array([MLR._market_blend(v, r) for v, r in zip(y_f_b, recs_f)], dtype=float)
-    anchor = str(getattr(MLR, "FURNISHED_ANCHOR", "furnished")).lower()
-    uf_pct = float(getattr(MLR, "UNFURNISHED_PCT", 0.107))
-    want_furnished = base_df["furnished"].values
-    if anchor == "furnished":
-        y_when_f  = y_t_b
-        y_when_uf = y_t_b * (1.0 - max(0.0, min(0.5, uf_pct)))
+    from app.api import ml_price_router as MLR
+    recs = _to_norm_records(df_in[feature_store.RAW_COLS])
+    out: List[np.ndarray] = []
+    B = 10000
+    for i in range(0, len(recs), B):
+        out.append(MLR._predict_controlled_batch(model, recs[i:i+B]))
+    return np.maximum(0.0, np.concatenate(out)) if out else np.zeros(0, dtype=float)
+
+def _group_metrics(keys: pd.DataFrame, y_true: np.ndarray, preds: Dict[str, np.ndarray]) -> pd.DataFrame:
+    """n plus MAE and wMAPE% per model for every group of `keys`, from one groupby over error columns"""
+    names = list(preds)
+    cols = {"_n": np.ones(len(y_true)), "_y": np.abs(y_true)}
+    for i, name in enumerate(names):
+        cols[f"_e{i}"] = np.abs(preds[name] - y_true)
+    g = keys.reset_index(drop=True).assign(**cols).groupby(list(keys.columns), dropna=False).sum()
+    out = pd.DataFrame({"n": g["_n"].astype(int)}, index=g.index)
+    for i, name in enumerate(names):
+        out[f"{name} MAE"] = g[f"_e{i}"] / g["_n"]
+        out[f"{name} wMAPE%"] = g[f"_e{i}"] / g["_y"].clip(lower=1e-9) * 100.0
+    return out.sort_values("n", ascending=False)
+
+# leaderboard workers: the featurized eval set, loaded once per worker process
+_LB: dict = {}
+
+def _lb_init(path: str) -> None:
+    import xgboost  # noqa: F401  (imported up front so load_s times the artifact, not the library)
+    with open(path, "rb") as f:
+        _LB.update(pickle.load(f))
+
+def _lb_request(model, rec: dict) -> float:
+    """one /predict-sized call: ml_price_router._predict_controlled_batch for a single row"""
+    base = {k: v for k, v in rec.items() if v is not None}
+    return apply_rules(predict_batch(model, controlled_variants(base)), rule_inputs([base]))
+
+def _lb_predict(model, block, rules) -> np.ndarray:
+    y = np.expm1(model.predict(block if isinstance(model, CompiledModel) else block.to_frame()))
+    return np.asarray(y, dtype=float) if rules is None else np.maximum(0.0, apply_rules(y, rules))
+
+def _lb_score(path: str) -> dict:
+    """load one artifact in a fresh worker and score the shared eval set: predictions + cost"""
+    with np.errstate(all="ignore"):
+        return _lb_score_quiet(path)
+
+def _lb_score_quiet(path: str) -> dict:
+    recs, n_req = _LB["recs"], _LB["latency_requests"]
+    cv_scheduler.reset_peak_rss()
+    rss0 = cv_scheduler.rss_mb()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # the per-model serving budget; the worker's OpenMP pool is left alone
+        model = ml_threads.apply(_load_model(path))
+    load_s = time.perf_counter() - t0
+    model_mb = cv_scheduler.rss_mb() - rss0
+    _lb_predict(model, _LB["warm"], _LB["warm_rules"])
+    t0 = time.perf_counter()
+    y = _lb_predict(model, _LB["block"], _LB["rules"])
+    bulk_s = time.perf_counter() - t0
+    lat = []
+    for i in range(min(n_req, len(recs))):
+        t0 = time.perf_counter()
+        if _LB["rules"] is not None:
+            _lb_request(model, recs[i])
+        else:
+            predict_batch(model, [recs[i]])
+        lat.append(time.perf_counter() - t0)
+    out = {"y_pred": y, "load_s": load_s, "model_MB": model_mb, "peak_MB": cv_scheduler.peak_rss_mb(),
+           "us_per_row": bulk_s / max(1, len(recs)) * 1e6, "request_ms": float(np.median(lat)) * 1000.0}
+    return out
+
+def _model_label(path: str) -> Tuple[str, str]:
+    stem = os.path.splitext(os.path.basename(path))[0].replace("aqarak_price_model_", "")
+    meta_path = os.path.splitext(path)[0] + ".json"
+    try:
+        with open(meta_path) as f:
+            mtype = json.load(f).get("model_type", "")
+    except (OSError, ValueError):
+        mtype = ""
+    return stem, mtype
+
+def _leaderboard(df: pd.DataFrame, y_true: np.ndarray, paths: List[str], args) -> None:
+    """score every artifact on one featurization of the eval set, each in a fresh worker process (clean load/RSS numbers)"""
+    t_all = time.perf_counter()
+    recs = _to_norm_records(df[feature_store.RAW_COLS])
+    if args.mode == "router":
+        bases = [{k: v for k, v in r.items() if v is not None} for r in recs]
+        variants = [v for b in bases for v in controlled_variants(b)]
+        data = {"block": featurize(variants), "rules": rule_inputs(bases)}
+        data.update(warm=featurize(variants[:4]), warm_rules=rule_inputs(bases[:1]))
     else:
-        y_when_f, y_when_uf = y_t_b, y_f_b
-    y_base = np.where(want_furnished, y_when_f, y_when_uf)
-    pts = base_df.get("property_type", pd.Series(["Apartment"] * len(base_df))).tolist()
-    fls = base_df.get("floor", pd.Series([None] * len(base_df))).tolist()
-    y_final = np.array([MLR._apply_floor_adj(v, f, p) for v, f, p in zip(y_base, fls, pts)], dtype=float)
-    return np.maximum(0.0, y_final)
+        data = {"block": featurize(recs), "rules": None, "warm": featurize(recs[:1]), "warm_rules": None}
+    data.update(recs=recs, latency_requests=args.latency_requests)
+    prep_s = time.perf_counter() - t_all
+
+    workers, threads = cv_scheduler.core_split(len(paths), args.workers)
+    # bulk predicts in each worker get their share of the cores (spawned children inherit the env)
+    os.environ.setdefault("AQARAK_ML_BATCH_THREADS", str(threads))
+    latest = os.path.realpath(os.path.join("models", "aqarak_price_model_latest.joblib"))
+    rows, preds = [], {}
+    with tempfile.TemporaryDirectory(prefix="aqarak-eval-") as tmp:
+        data_path = os.path.join(tmp, "eval.pkl")
+        with open(data_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_lb_init,
+                                 initargs=(data_path,), max_tasks_per_child=1) as pool:
+            futs = {pool.submit(_lb_score, p): p for p in paths}
+            for fut in as_completed(futs):
+                p = futs[fut]
+                name, mtype = _model_label(p)
+                name = ("*" if os.path.realpath(p) == latest else "") + name
+                try:
+                    res = fut.result()
+                except Exception as e:
+                    print(f"[eval] {name}: {type(e).__name__}: {e}", file=sys.stderr)
+                    continue
+                preds[name] = res.pop("y_pred")
+                with np.errstate(all="ignore"):
+                    m = _metrics(y_true, preds[name])
+                rows.append({"model": name, "type": mtype, **{k: m[k] for k in ("MAE", "RMSE", "R2", "MAPE%", "wMAPE%")},
+                             "nonfinite": int((~np.isfinite(preds[name])).sum()), **res})
+    if not rows:
+        print("no artifact could be scored", file=sys.stderr)
+        sys.exit(1)
+    board = pd.DataFrame(rows).sort_values(args.sort, ascending=args.sort != "R2")
+    boot_note = ""
+    if args.bootstrap > 0:
+        names = list(board["model"])
+        ref = next((m for m in names if m.startswith("*")), names[0])
+        t0 = time.perf_counter()
+        b = _bootstrap(y_true, np.vstack([preds[m] for m in names]), args.bootstrap, args.seed,
+                       cv_scheduler.core_split((args.bootstrap + BOOT_CHUNK - 1) // BOOT_CHUNK, args.workers)[0])
+        lo, hi = _ci(b["MAE"], args.ci)
+        dlo, dhi = _ci(b["MAE"] - b["MAE"][:, [names.index(ref)]], args.ci)
+        board = board.assign(MAE_lo=lo, MAE_hi=hi, dMAE_lo=dlo, dMAE_hi=dhi)
+        boot_note = (f"; MAE_lo/hi: {args.ci:g}% bootstrap CI ({args.bootstrap} paired resamples, "
+                     f"{time.perf_counter() - t0:.2f}s); dMAE_lo/hi: MAE minus {ref}'s on the same resamples, "
+                     f"an interval excluding 0 is a real difference")
+    pd.set_option("display.width", 250)
+    pd.set_option("display.max_rows", 200)
+    print(f"\n=== Leaderboard ({args.mode}, n={len(y_true)}, {len(rows)} models, {workers} worker(s) x {threads} thread(s)) ===")
+    print(board.to_string(index=False, float_format=lambda v: f"{v:.4f}" if abs(v) < 10 else f"{v:.1f}"))
+    print(f"\nfeaturized once in {prep_s:.2f}s; total {time.perf_counter() - t_all:.1f}s; * = current latest{boot_note}")
+
+    keys = [k.strip() for k in args.groupby.split(",") if k.strip()]
+    if keys:
+        top = list(board["model"][:args.group_models])
+        g = _group_metrics(df[keys], y_true, {m: preds[m] for m in top})
+        print(f"\n=== By {', '.join(keys)} (best {len(top)} by {args.sort}) ===")
+        print(g.to_string(float_format=lambda v: f"{v:.1f}"))
 
 def main():
     ap = argparse.ArgumentParser()
@@ -131,14 +334,23 @@ def main():
     ap.add_argument("--limit", type=int, default=None)
     ap.add_argument("--mode", choices=["raw", "router"], default="router")
     ap.add_argument("--groupby", default="")
+    ap.add_argument("--models", default=None,
+                    help="glob(s), comma-separated: score every matching artifact into one leaderboard")
+    ap.add_argument("--workers", type=int, default=0, help="leaderboard worker processes (default: one per core)")
+    ap.add_argument("--sort", default="MAE", choices=["MAE", "RMSE", "R2", "MAPE%", "wMAPE%", "request_ms", "us_per_row", "load_s", "model_MB"])
+    ap.add_argument("--latency-requests", type=int, default=200, help="single-row requests timed per model")
+    ap.add_argument("--group-models", type=int, default=4, help="models shown in the --groupby breakdown")
+    ap.add_argument("--bootstrap", type=int, default=0,
+                    help="resamples for bootstrap CIs on MAE/wMAPE (overall, per --bootstrap-by, and per model with --models); 0 = off")
+    ap.add_argument("--bootstrap-by", default="neighborhood", help="segment column for the per-group bootstrap")
+    ap.add_argument("--ci", type=float, default=95.0, help="confidence level, in percent")
+    ap.add_argument("--min-group-n", type=int, default=20, help="smallest segment listed in the bootstrap table")
+    ap.add_argument("--seed", type=int, default=42)
     args = ap.parse_args()
 
-    df = pd.read_csv(args.csv)
+    df = feature_store.load(args.csv)
 
-    need = [
-        "bedrooms", "bathrooms", "furnished", "area_sqm",
-        "floor", "building_age", "city", "neighborhood", "property_type"
-    ]
+    need = feature_store.RAW_COLS
     df, miss = _require_cols(df, need + [args.price_col])
     if miss:
         print(f"Missing columns in CSV: {miss}", file=sys.stderr)
@@ -146,6 +358,14 @@ def main():
     df = df.dropna(subset=need + [args.price_col]).copy()
     if args.limit:
         df = df.head(args.limit).copy()
+    if args.models:
+        paths = sorted({os.path.realpath(p) for pat in args.models.split(",") if pat.strip()
+                        for p in glob.glob(pat.strip()) if p.endswith(".joblib")})
+        if not paths:
+            print(f"No .joblib artifacts match {args.models}", file=sys.stderr)
+            sys.exit(1)
+        _leaderboard(df, df[args.price_col].to_numpy(dtype=float), paths, args)
+        return
     model_path = os.getenv("AQARAK_MODEL_PATH", os.path.join("models", "aqarak_price_model_latest.joblib"))
     model = _load_model(model_path)
     print(f"[ML] loaded model from: {model_path}")
@@ -164,6 +384,8 @@ def main():
     keys = [k.strip() for k in args.groupby.split(",") if k.strip()]
     if keys:
         _print_groupby(df, y_true, y_pred, keys)
+    if args.bootstrap > 0:
+        _print_bootstrap(df, y_true, y_pred, args)
 
 
 if __name__ == "__main__":
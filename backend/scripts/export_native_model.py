@@ -0,0 +1,54 @@
+import argparse, glob, json, os, sys, time
+import numpy as np
+import pandas as pd
+from app.ml.predictor import load_model, export_native_artifact, featurize
+from app.ml.native import load_native
+from app.ml.normalize import normalize_frame, frame_records
+
+def _check_rows(csv_path: str) -> list:
+    df = pd.read_csv(csv_path).drop(columns=["price"], errors="ignore")
+    rows = frame_records(normalize_frame(df))
+    return rows + [dict(r, neighborhood="") for r in rows[:500]]
+
+def main():
+    ap = argparse.ArgumentParser(description="write the native .ubj/.prep.json artifact next to joblib price models")
+    ap.add_argument("models", nargs="*", default=[os.path.join("models", "aqarak_price_model_latest.joblib")],
+                    help="joblib artifacts or globs")
+    ap.add_argument("--csv", default=os.path.join("data", "eval-cleaned-data.csv"), help="rows for the parity check")
+    args = ap.parse_args()
+
+    paths = sorted({os.path.realpath(p) for g in args.models for p in glob.glob(g)})
+    if not paths:
+        print("no artifacts matched", file=sys.stderr)
+        sys.exit(1)
+    blk = featurize(_check_rows(args.csv))
+    failed = False
+    for p in paths:
+        name = os.path.basename(p)
+        try:
+            model = load_model(p, prefer_native=False)
+            native = export_native_artifact(model, p)
+        except Exception as e:
+            print(f"[skip] {name}: {e}")
+            continue
+        if native is None:
+            print(f"[skip] {name}: not a compilable XGBoost pipeline")
+            continue
+        t0 = time.perf_counter()
+        nm = load_native(p, featurize)
+        load_s = time.perf_counter() - t0
+        ok = nm is not None and np.array_equal(model.predict(blk), nm.predict(blk))
+        print(f"[{'ok' if ok else 'FAIL'}] {name} -> {native['booster']}, {native['prep']}"
+              f"  native load {load_s*1000:.0f} ms, parity on {len(blk)} rows")
+        failed |= not ok
+        meta_path = os.path.splitext(p)[0] + ".json"
+        if ok and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            meta["native"] = native
+            with open(meta_path, "w") as f:
+                json.dump(meta, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Cached training/eval dataset prep shared by the scripts.
+
+load(csv) returns the listing CSV cleaned, typed and feature-engineered:
+serving normalization (neighborhood aliases, villa floor rule), numeric
+columns coerced, building_age parsed, furnished as a nullable boolean,
+the derived model features, price_per_sqm and an `in_range` flag for the
+usual outlier bounds. Missing values stay missing; each script applies
+its own fill/drop rules on top.
+
+The frame is cached next to the CSV in .cache/ as Parquet (pickle when no
+Parquet engine is installed), keyed by a hash of the CSV bytes and of the
+prep code (this file + app/ml/normalize.py), so editing either rebuilds
+it. AQARAK_FEATURE_CACHE=0 skips the cache, any other value is used as
+the cache directory.
+"""
+import hashlib, logging, os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from app.ml import normalize as _normalize_mod
+from app.ml.normalize import normalize_frame, parse_building_age
+
+log = logging.getLogger(__name__)
+
+PREP_VERSION = 1
+
+PRICE_MIN, PRICE_MAX = 10000, 5000000
+AREA_MIN, AREA_MAX = 20, 20000
+PSQM_MIN, PSQM_MAX = 100, 10000
+AREA_BINS = [0, 60, 90, 120, 160, 220, 10000]
+
+NUMERIC = ["price", "bedrooms", "bathrooms", "area_sqm", "floor", "unit_floor"]
+RAW_COLS = ["bedrooms", "bathrooms", "furnished", "area_sqm", "floor", "building_age",
+            "city", "neighborhood", "property_type"]
+CATEGORICAL = ["city", "neighborhood", "property_type"]
+
+_TRUE = {"1","true","yes","y","t","فurnished","مفروش"}
+
+def _furnished(col: pd.Series) -> pd.Series:
+    codes, uniq = pd.factorize(col, use_na_sentinel=True)
+    vals = np.array([bool(u) if isinstance(u, (bool, np.bool_)) else str(u).strip().lower() in _TRUE
+                     for u in uniq], dtype=bool)
+    out = pd.array(vals[np.maximum(codes, 0)], dtype="boolean")
+    out[codes < 0] = pd.NA
+    return pd.Series(out, index=col.index)
+
+def prepare(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.rename(columns=lambda c: str(c).strip().lower().replace(" ", "_"))
+    # normalize_frame() spells a missing neighborhood "None" the way the router does; here it stays missing
+    missing = {c: df[c].isna() for c in CATEGORICAL if c in df.columns}
+    df = normalize_frame(df)
+    for c in NUMERIC:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    for c in ("bedrooms", "bathrooms", "area_sqm", "floor", "price"):
+        if c not in df.columns:
+            df[c] = np.nan
+    ba = df["building_age"] if "building_age" in df.columns else pd.Series(np.nan, index=df.index)
+    df["building_age"] = parse_building_age(ba)
+    df["furnished"] = _furnished(df["furnished"]) if "furnished" in df.columns else pd.array([pd.NA] * len(df), dtype="boolean")
+    for c in CATEGORICAL:
+        s = df[c].mask(missing[c]) if c in df.columns else pd.Series(np.nan, index=df.index, dtype=object)
+        df[c] = s.where(s.isna(), s.astype(str))
+    df["property_type"] = df["property_type"].str.title()
+
+    area = df["area_sqm"]
+    df["area_log"] = np.log1p(area)
+    df["area_sq"] = np.square(np.clip(area, 0, None))
+    bd = df["bedrooms"].fillna(0)
+    ba = df["bathrooms"].replace(0, 1).fillna(1)
+    df["area_per_bed"] = (area / np.clip(bd.replace(0, 1), 1, None)).astype(float)
+    df["bed_per_bath"] = (bd / ba).astype(float)
+    df["area_bin"] = pd.cut(area, bins=AREA_BINS, labels=False, include_lowest=True).astype("float")
+    is_apartment = df["property_type"].eq("Apartment")
+    df["furn_apt"] = (df["furnished"].fillna(False).astype(bool) & is_apartment).astype(float)
+    df["price_per_sqm"] = df["price"] / area
+    df["in_range"] = (df["price"].between(PRICE_MIN, PRICE_MAX) & area.between(AREA_MIN, AREA_MAX)
+                      & df["price_per_sqm"].between(PSQM_MIN, PSQM_MAX))
+    return df
+
+def missing_as_category(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The training scripts' rule: a missing city / neighborhood / property_type
+    is kept as its own category (str() of the missing value, as the original
+    trainers' astype(str) produced), not dropped with the incomplete rows.
+    """
+    return df.assign(**{c: df[c].astype(str) for c in CATEGORICAL}).assign(
+        property_type=lambda d: d["property_type"].str.title())
+
+def _code_hash() -> str:
+    h = hashlib.sha1(str(PREP_VERSION).encode())
+    for p in (__file__, _normalize_mod.__file__):
+        h.update(Path(p).read_bytes())
+    return h.hexdigest()[:10]
+
+def _file_hash(path: Path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+def _parquet_ok() -> bool:
+    for mod in ("pyarrow", "fastparquet"):
+        try:
+            __import__(mod)
+            return True
+        except ImportError:
+            pass
+    return False
+
+def cache_path(csv_path: str) -> Path:
+    src = Path(csv_path).resolve()
+    where = os.getenv("AQARAK_FEATURE_CACHE") or str(src.parent / ".cache")
+    ext = ".parquet" if _parquet_ok() else ".pkl"
+    return Path(where) / f"{src.stem}-{_file_hash(src)}-{_code_hash()}{ext}"
+
+def load(csv_path: str) -> pd.DataFrame:
+    """the prepared frame for csv_path, from the cache when it's current"""
+    if os.getenv("AQARAK_FEATURE_CACHE") == "0":
+        return prepare(pd.read_csv(csv_path))
+    path = cache_path(csv_path)
+    if path.exists():
+        try:
+            return pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_pickle(path)
+        except Exception as e:
+            log.warning("feature cache %s unreadable, rebuilding: %s", path.name, e)
+    df = prepare(pd.read_csv(csv_path))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for old in path.parent.glob(f"{Path(csv_path).stem}-{'?' * 16}-{'?' * 10}.*"):
+        old.unlink(missing_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".parquet":
+        df.to_parquet(tmp)
+    else:
+        df.to_pickle(tmp)
+    tmp.replace(path)
+    log.info("feature cache written: %s (%d rows)", path, len(df))
+    return df
@@ -1,20 +1,11 @@
-import pandas as pd
-import argparse
+from scripts import feature_store
 
 def inspect_neighborhoods(csv_path):
     print(f"Loading {csv_path}...")
-    df = pd.read_csv(csv_path)
-    
-    # Basic cleaning
-    df['price'] = pd.to_numeric(df['price'], errors='coerce')
-    df['area_sqm'] = pd.to_numeric(df['area_sqm'], errors='coerce')
+    df = feature_store.load(csv_path)
     
     # Filter valid data (same as training)
-    df = df[df['price'].between(10000, 5000000)]
-    df = df[df['area_sqm'].between(20, 20000)]
-    
-    df['price_per_sqm'] = df['price'] / df['area_sqm']
-    df = df[df['price_per_sqm'].between(100, 10000)]
+    df = df[df['in_range']]
     
     # Group by neighborhood
     stats = df.groupby(['city', 'neighborhood']).agg(
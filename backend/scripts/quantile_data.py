@@ -0,0 +1,84 @@
+"""
+Float32 / QuantileDMatrix inputs for the native XGBoost training path
+(train_price_model_v3 --engine native).
+
+encode() runs the fitted prep (the same ColumnTransformer the artifact
+ships, so serving sees identical target/one-hot encodings) over row
+chunks into one float32 matrix, instead of a float64 copy of every
+intermediate. write_chunks() spills the encoded rows to disk as Parquet
+(.npy when no Parquet engine is installed), and quantile_matrix() streams
+them through an xgb.DataIter into a QuantileDMatrix: hist bins only, the
+float rows are never all in memory at once. With external_memory the
+bins stay paged on disk too (ExtMemQuantileDMatrix).
+"""
+import os
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scripts.feature_store import _parquet_ok
+
+def encode(prep, X: pd.DataFrame, chunk_rows: int) -> np.ndarray:
+    """prep.transform(X) as float32, chunk_rows rows at a time"""
+    out = None
+    for start in range(0, len(X), chunk_rows):
+        part = np.asarray(prep.transform(X.iloc[start:start + chunk_rows]), dtype=np.float32)
+        if out is None:
+            out = np.empty((len(X), part.shape[1]), dtype=np.float32)
+        out[start:start + len(part)] = part
+    return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+def write_chunks(prep, X: pd.DataFrame, y: np.ndarray, w: Optional[np.ndarray], root: str,
+                 chunk_rows: int) -> List[Dict[str, str]]:
+    """encoded rows + label/weight per chunk file under root"""
+    y = np.asarray(y, dtype=np.float32)
+    w = np.ones(len(X), dtype=np.float32) if w is None else np.asarray(w, dtype=np.float32)
+    parquet = _parquet_ok()
+    chunks = []
+    for i, start in enumerate(range(0, len(X), chunk_rows)):
+        sl = slice(start, start + chunk_rows)
+        Xc = encode(prep, X.iloc[sl], chunk_rows)
+        if parquet:
+            path = os.path.join(root, f"chunk{i:05d}.parquet")
+            df = pd.DataFrame(Xc, columns=[f"f{j}" for j in range(Xc.shape[1])])
+            df["__label"], df["__weight"] = y[sl], w[sl]
+            df.to_parquet(path, index=False)
+            chunks.append({"parquet": path})
+        else:
+            paths = {k: os.path.join(root, f"chunk{i:05d}-{k}.npy") for k in ("X", "y", "w")}
+            np.save(paths["X"], Xc)
+            np.save(paths["y"], y[sl])
+            np.save(paths["w"], w[sl])
+            chunks.append(paths)
+    return chunks
+
+def _read_chunk(chunk: Dict[str, str]):
+    if "parquet" in chunk:
+        df = pd.read_parquet(chunk["parquet"])
+        y, w = df.pop("__label").to_numpy(), df.pop("__weight").to_numpy()
+        return df.to_numpy(dtype=np.float32), y, w
+    return np.load(chunk["X"], mmap_mode="r"), np.load(chunk["y"]), np.load(chunk["w"])
+
+class ChunkIter(xgb.DataIter):
+    """feeds write_chunks() files to XGBoost one at a time"""
+    def __init__(self, chunks: List[Dict[str, str]], cache_prefix: Optional[str] = None):
+        self._chunks, self._i = chunks, 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._i == len(self._chunks):
+            return False
+        X, y, w = _read_chunk(self._chunks[self._i])
+        input_data(data=X, label=y, weight=w)
+        self._i += 1
+        return True
+
+    def reset(self) -> None:
+        self._i = 0
+
+def quantile_matrix(chunks: List[Dict[str, str]], external_memory: bool = False, cache_dir: Optional[str] = None,
+                    max_bin: int = 256, nthread: int = 0) -> xgb.DMatrix:
+    if external_memory:
+        it = ChunkIter(chunks, cache_prefix=os.path.join(cache_dir or ".", "xgb-cache"))
+        return xgb.ExtMemQuantileDMatrix(it, max_bin=max_bin, nthread=nthread)
+    return xgb.QuantileDMatrix(ChunkIter(chunks), max_bin=max_bin, nthread=nthread)
@@ -8,30 +8,9 @@ from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import GradientBoostingRegressor
+from scripts import feature_store
 
 rng = np.random.default_rng(42)
-def _parse_building_age(x):
-    if pd.isna(x): return np.nan
-    s = str(x).strip().lower()
-    if s in {"0–11 months","0-11 months","0 to 11 months","0–11 month"}: return 0.5
-    for band, val in {
-        "10–19 years":15, "10-19 years":15,
-        "20–29 years":25, "20-29 years":25,
-        "30–39 years":35, "30-39 years":35,
-        "40–49 years":45, "40-49 years":45,
-    }.items():
-        if band in s: return float(val)
-    if "year" in s:
-        try: return float("".join(ch for ch in s if ch.isdigit() or ch==".")) 
-        except: return np.nan
-    try: return float(s)
-    except: return np.nan
-
-def _bool(v):
-    if isinstance(v, (bool, np.bool_)): return bool(v)
-    s = str(v).strip().lower()
-    return s in {"1","true","yes","y","t","فurnished","مفروش"}
-
 def _clip01(x): return np.minimum(1.0, np.maximum(0.0, x))
 
 def _weights(df: pd.DataFrame) -> np.ndarray:
@@ -53,38 +32,14 @@ def main():
     args = ap.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
-    df = pd.read_csv(args.csv)
-
-    def col(name):
-        m = {c.strip().lower().replace(" ","_"): c for c in df.columns}
-        return m.get(name, name)
-
-    y = df[col("price")].astype(float)
-    prop = df[col("property_type")].astype(str).str.title()
-    city = df[col("city")].astype(str)
-    neigh = df[col("neighborhood")].astype(str)
-    bedrooms = pd.to_numeric(df.get(col("bedrooms")), errors="coerce")
-    bathrooms = pd.to_numeric(df.get(col("bathrooms")), errors="coerce")
-    area = pd.to_numeric(df.get(col("area_sqm")), errors="coerce")
-    floor = pd.to_numeric(df.get(col("floor")), errors="coerce")
-    ba_raw = df.get(col("building_age"))
-    building_age = ba_raw.map(_parse_building_age) if ba_raw is not None else np.nan
-    furn_raw = df.get(col("furnished"))
-    furnished = furn_raw.map(_bool) if furn_raw is not None else False
-    is_apartment = prop.eq("Apartment").astype(int)
-    furn_apt = (furnished.astype(int) * is_apartment).astype(float)
-    X = pd.DataFrame({
-        "bedrooms": bedrooms,
-        "bathrooms": bathrooms,
-        "area_sqm": area,
-        "area_log": np.log1p(area),
-        "floor": floor,                 """apartments level, villas/houses: storeys"""
-        "building_age": building_age,
-        "furn_apt": furn_apt,           """ONLY driver for furnished effect"""
-        "city": city,
-        "neighborhood": neigh,
-        "property_type": prop,
-    })
+    df = feature_store.missing_as_category(feature_store.load(args.csv))
+    y = df["price"]
+    furnished = df["furnished"].fillna(False).astype(bool)
+    X = df[["bedrooms", "bathrooms", "area_sqm", "area_log",
+            "floor",            # apartments: level, villas/houses: storeys
+            "building_age",
+            "furn_apt",         # ONLY driver for furnished effect
+            "city", "neighborhood", "property_type"]]
     mask = y.notna() & X.notna().all(axis=1)
     X = X[mask]
     y2 = y[mask]
@@ -0,0 +1,268 @@
+"""
+Incremental retrain of the price model from new listings in Postgres.
+
+Streams active sale listings with id above the base model's watermark
+(meta warm_start.max_property_id, or --since-id) through a server-side
+cursor, --batch rows per fetch. Each fetched chunk goes through the same
+prep and outlier filter as train_price_model_v3, then either
+
+  boost   continues boosting the base booster (xgb_model warm start, --rounds
+          small --learning-rate steps per update) as the chunks arrive; an
+          update runs once at least max(--batch, --min-rows) usable rows are
+          pending, and the last one takes the remainder, so memory holds a
+          couple of batches, not the whole pull. The fitted prep / target
+          encoders are kept
+  refit   refits the whole v3 pipeline, target encoders included, on the
+          training CSV plus the new rows with the base model's best_params;
+          it needs every new row at once, so their feature frames are kept
+
+A random --holdout share of the new rows is kept out of training (and in
+memory) and both models are scored on it. The output is a normal artifact set (.joblib,
+.json with warm_start + parent_model_id, native .ubj/.prep.json);
+--link-latest repoints aqarak_price_model_latest.joblib at it unless the
+new model is worse than the base on the holdout.
+
+    python -m scripts.train_price_model_incremental --link-latest
+"""
+import argparse, json, logging, os, sys, time, uuid
+from datetime import datetime
+from typing import Iterator, Tuple
+import numpy as np
+import pandas as pd
+import joblib
+import xgboost as xgb
+from sklearn.pipeline import Pipeline
+from sqlalchemy import create_engine, select, table, column
+from app.ml.predictor import export_native_artifact, _alias_neigh_index_for_pickle
+from scripts import feature_store
+from scripts.train_price_model_v3 import (NUM, TE_FEATS, OH_FEATS, _weights, build_pipeline,
+                                          furn_apt_dropout, training_frame)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Core constructs rather than app.db.models: no pgvector import, no DATABASE_URL check at import
+properties = table(
+    "properties",
+    column("id"), column("price"), column("is_for_sale"), column("is_active"),
+    column("city"), column("neighborhood"), column("bedrooms"), column("bathrooms"),
+    column("area_sqm"), column("property_type"), column("furnished"), column("floor"),
+    column("building_age"),
+)
+LISTING_COLS = ["id", "price"] + feature_store.RAW_COLS
+
+def stream_listings(url: str, since_id: int, batch: int) -> Iterator[pd.DataFrame]:
+    """active sale listings with id > since_id, one frame of up to `batch` rows per fetch"""
+    cols = [properties.c[c] for c in LISTING_COLS]
+    q = (select(*cols)
+         .where(properties.c.is_for_sale.is_(True), properties.c.is_active.is_(True),
+                properties.c.price.isnot(None), properties.c.id > since_id)
+         .order_by(properties.c.id))
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            res = conn.execution_options(stream_results=True, yield_per=batch).execute(q)
+            for part in res.partitions():
+                yield pd.DataFrame(part, columns=LISTING_COLS)
+    finally:
+        engine.dispose()
+
+def _usable(raw: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series, int]:
+    """training_frame() of one fetched chunk"""
+    raw = raw.drop(columns=["id"]).assign(price=pd.to_numeric(raw["price"], errors="coerce"))
+    return training_frame(feature_store.prepare(raw))
+
+def _xgb_params(best_params: dict, eta: float, seed: int) -> dict:
+    """xgb.train params from the base model's search result (sklearn names, xgb__ prefix), at step size eta"""
+    p = {"objective": "reg:squarederror", "tree_method": "hist", "seed": seed, "nthread": 0}
+    for k, v in (best_params or {}).items():
+        k = k.split("__", 1)[-1]
+        if k not in ("n_estimators", "learning_rate"):
+            p[k] = v
+    p["eta"] = eta
+    return p
+
+def _mae(pipe, X: pd.DataFrame, y: pd.Series) -> float:
+    return float(np.mean(np.abs(np.expm1(pipe.predict(X)) - y.to_numpy(dtype=float))))
+
+def _base_booster(base: Pipeline) -> xgb.Booster:
+    booster = base.steps[-1][1].get_booster()
+    for k in ("best_iteration", "best_score"):
+        booster.set_attr(**{k: None})
+    return booster
+
+def _boost(booster: xgb.Booster, prep, Xn: pd.DataFrame, yn: pd.Series, params: dict, rounds: int) -> xgb.Booster:
+    """`rounds` more rounds on one batch of new rows"""
+    W = np.asarray(_weights(Xn[["area_sqm", "property_type", "furnished"]]), dtype=float)
+    d = xgb.DMatrix(prep.transform(Xn.drop(columns=["furnished"])), label=np.log1p(yn), weight=W)
+    return xgb.train(params, d, num_boost_round=rounds, xgb_model=booster)
+
+def _boosted_pipeline(base: Pipeline, booster: xgb.Booster, stem: str) -> Pipeline:
+    booster.save_model(stem + ".ubj")
+    reg = xgb.XGBRegressor()
+    reg.load_model(stem + ".ubj")
+    reg.n_jobs = -1
+    return Pipeline([(base.steps[0][0], base.steps[0][1]), (base.steps[-1][0], reg)])
+
+def _refit(best_params: dict, Xn: pd.DataFrame, yn: pd.Series, csv: str, seed: int) -> Pipeline:
+    Xc, yc, _ = training_frame(feature_store.load(csv))
+    X = pd.concat([Xc, Xn], ignore_index=True)
+    y = pd.concat([yc, yn], ignore_index=True)
+    W = _weights(X[["area_sqm", "property_type", "furnished"]])
+    pipe = build_pipeline(seed).set_params(**best_params)
+    pipe.fit(X.drop(columns=["furnished"]), np.log1p(y), xgb__sample_weight=W)
+    return pipe
+
+def main():
+    ap = argparse.ArgumentParser(description="warm-start the price model on listings added since it was trained")
+    ap.add_argument("--model", default=os.path.join("models", "aqarak_price_model_latest.joblib"))
+    ap.add_argument("--db-url", default=os.getenv("DATABASE_URL"), help="default: $DATABASE_URL")
+    ap.add_argument("--since-id", type=int, default=None, help="default: the base model's warm_start.max_property_id, else 0")
+    ap.add_argument("--mode", choices=["boost", "refit"], default="boost")
+    ap.add_argument("--rounds", type=int, default=50, help="boosting rounds added per update with --mode boost")
+    ap.add_argument("--learning-rate", type=float, default=0.01,
+                    help="eta of the added rounds; small, they only fit the new rows")
+    ap.add_argument("--csv", default=os.path.join("data", "all-cleaned-data_v3.csv"),
+                    help="training CSV the new rows are added to with --mode refit")
+    ap.add_argument("--batch", type=int, default=2000, help="rows per fetch from the server-side cursor; also the boost update size")
+    ap.add_argument("--min-rows", type=int, default=50, help="do nothing if fewer new rows survive the filters")
+    ap.add_argument("--holdout", type=float, default=0.2, help="share of the new rows kept for base-vs-new scoring")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--outdir", default="models")
+    ap.add_argument("--link-latest", action="store_true", help="repoint the latest symlink unless the holdout MAE got worse")
+    args = ap.parse_args()
+    if not args.db_url:
+        ap.error("--db-url or DATABASE_URL is required")
+
+    t0 = time.perf_counter()
+    base_path = os.path.realpath(args.model)
+    meta_path = os.path.splitext(base_path)[0] + ".json"
+    base_meta = json.load(open(meta_path)) if os.path.exists(meta_path) else {}
+    since_id = args.since_id
+    if since_id is None:
+        since_id = int((base_meta.get("warm_start") or {}).get("max_property_id") or 0)
+        if not since_id:
+            logger.warning("base model has no warm_start watermark; using every listing in the database")
+
+    _alias_neigh_index_for_pickle()
+    base = joblib.load(base_path)
+    best_params = base_meta.get("best_params") or {}
+    boost = args.mode == "boost"
+    booster = _base_booster(base) if boost else None
+    params = _xgb_params(best_params, args.learning_rate, args.seed)
+    # an update needs at least this many rows; the last one takes what's left over (between 1x and 2x)
+    per_update = max(args.batch, args.min_rows)
+
+    rng = np.random.default_rng(args.seed)
+    pending, held_out = [], []
+    n_pending = n_raw = n_train = dropped = updates = max_id = 0
+    fit_s = 0.0
+
+    def update(Xb: pd.DataFrame, yb: pd.Series) -> None:
+        nonlocal booster, updates, n_train, fit_s
+        t = time.perf_counter()
+        booster = _boost(booster, base.steps[0][1], Xb, yb, params, args.rounds)
+        fit_s += time.perf_counter() - t
+        updates += 1
+        n_train += len(Xb)
+        logger.info(f"update {updates}: +{args.rounds} rounds on {len(Xb)} rows")
+
+    for i, raw in enumerate(stream_listings(args.db_url, since_id, args.batch)):
+        n_raw += len(raw)
+        max_id = max(max_id, int(raw["id"].max()))
+        X, y, d = _usable(raw)
+        dropped += d
+        held = rng.random(len(X)) < args.holdout
+        held_out.append((X[held], y[held]))
+        Xtr = X[~held].copy()
+        furn_apt_dropout(Xtr, args.seed + i)
+        pending.append((Xtr, y[~held]))
+        n_pending += len(Xtr)
+        if boost and n_pending >= 2 * per_update:
+            Xp = pd.concat([x for x, _ in pending], ignore_index=True)
+            yp = pd.concat([v for _, v in pending], ignore_index=True)
+            update(Xp.iloc[:per_update], yp.iloc[:per_update])
+            pending, n_pending = [(Xp.iloc[per_update:], yp.iloc[per_update:])], len(Xp) - per_update
+
+    logger.info(f"Fetched {n_raw} listings with id > {since_id} in {time.perf_counter() - t0:.1f}s")
+    if not n_raw:
+        logger.info("Nothing new; base model kept.")
+        return
+    n_usable = n_train + n_pending + sum(len(x) for x, _ in held_out)
+    logger.info(f"{n_usable} usable rows ({dropped} outliers dropped)")
+    if not updates and n_usable < args.min_rows:
+        logger.info(f"Fewer than --min-rows={args.min_rows}; base model kept.")
+        return
+
+    mid = uuid.uuid4().hex[:10]
+    stem = os.path.join(args.outdir, f"aqarak_price_model_xgb_{mid}")
+    os.makedirs(args.outdir, exist_ok=True)
+    Xtr = pd.concat([x for x, _ in pending], ignore_index=True)
+    ytr = pd.concat([v for _, v in pending], ignore_index=True)
+    if boost:
+        if len(Xtr):
+            update(Xtr, ytr)
+        model = _boosted_pipeline(base, booster, stem)
+    else:
+        t1 = time.perf_counter()
+        model = _refit(best_params, Xtr, ytr, args.csv, args.seed)
+        fit_s, n_train = time.perf_counter() - t1, len(Xtr)
+    logger.info(f"{args.mode} fit in {fit_s:.1f}s")
+
+    scores = {}
+    Xho = pd.concat([x for x, _ in held_out], ignore_index=True)
+    yho = pd.concat([v for _, v in held_out], ignore_index=True)
+    if len(Xho):
+        Xh = Xho.drop(columns=["furnished"])
+        scores = {"holdout_rows": int(len(Xho)),
+                  "base_MAE_JOD": round(_mae(base, Xh, yho), 2),
+                  "MAE_JOD": round(_mae(model, Xh, yho), 2)}
+        logger.info(f"Holdout MAE: base {scores['base_MAE_JOD']:.0f} -> new {scores['MAE_JOD']:.0f} (n={len(Xho)})")
+
+    joblib.dump(model, stem + ".joblib")
+    meta = {
+        "model_path": os.path.abspath(stem + ".joblib"),
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "model_id": mid,
+        "model_type": "XGBoost",
+        "parent_model_id": base_meta.get("model_id"),
+        "metrics": scores,
+        "best_params": best_params,
+        "warm_start": {
+            "mode": args.mode,
+            "since_id": since_id,
+            "max_property_id": max_id,
+            "rows": int(n_train),
+            "rounds": args.rounds * updates if boost else None,
+            "updates": updates if boost else None,
+            "learning_rate": args.learning_rate if boost else None,
+            "fit_seconds": round(fit_s, 1),
+        },
+        "features": base_meta.get("features") or {"numeric": NUM, "target_encoded": TE_FEATS, "onehot": OH_FEATS},
+        "config": base_meta.get("config", {}),
+    }
+    try:
+        native = export_native_artifact(model, stem + ".joblib")
+    except Exception as e:
+        native = None
+        logger.warning(f"Native export failed: {e}")
+    if native:
+        meta["native"] = native
+    with open(stem + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    logger.info(f"Model saved to {stem}.joblib ({time.perf_counter() - t0:.1f}s total)")
+
+    if args.link_latest:
+        if scores and scores["MAE_JOD"] > scores["base_MAE_JOD"]:
+            logger.warning("New model is worse on the holdout; latest symlink left alone.")
+            sys.exit(1)
+        link = os.path.join(args.outdir, "aqarak_price_model_latest.joblib")
+        tmp = link + ".tmp"
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        os.symlink(os.path.basename(stem + ".joblib"), tmp)
+        os.replace(tmp, link)
+        logger.info(f"{link} -> {os.path.basename(stem)}.joblib")
+
+if __name__ == "__main__":
+    main()
@@ -8,25 +8,7 @@ from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import GradientBoostingRegressor
-
-def _parse_building_age(x):
-    if pd.isna(x): return np.nan
-    s = str(x).strip().lower()
-    if s in {"0–11 months","0-11 months","0 to 11 months","0–11 month"}: return 0.5
-    bands = {"10–19 years":15,"20–29 years":25,"30–39 years":35,"40–49 years":45,
-             "10-19 years":15,"20-29 years":25,"30-39 years":35,"40-49 years":45}
-    for k,v in bands.items():
-        if k in s: return float(v)
-    if "year" in s:
-        try: return float("".join(ch for ch in s if ch.isdigit() or ch==".")) 
-        except: return np.nan
-    try: return float(s)
-    except: return np.nan
-
-def _bool(v):
-    if isinstance(v, (bool, np.bool_)): return bool(v)
-    s = str(v).strip().lower()
-    return s in {"1","true","yes","y","t","فurnished","مفروش"}
+from scripts import feature_store
 
 def _weights(df: pd.DataFrame) -> np.ndarray:
     w = np.ones(len(df), dtype=float)
@@ -53,45 +35,12 @@ def main():
     args = ap.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
-    df = pd.read_csv(args.csv)
-
-    def norm_col(name):
-        m = {c.strip().lower().replace(" ","_"): c for c in df.columns}
-        return m.get(name, name)
-
-    y = pd.to_numeric(df[norm_col("price")], errors="coerce")
-    prop = df[norm_col("property_type")].astype(str).str.title()
-    city = df[norm_col("city")].astype(str)
-    neigh = df[norm_col("neighborhood")].astype(str)
-    bedrooms = pd.to_numeric(df.get(norm_col("bedrooms")), errors="coerce")
-    bathrooms = pd.to_numeric(df.get(norm_col("bathrooms")), errors="coerce")
-    area = pd.to_numeric(df.get(norm_col("area_sqm")), errors="coerce")
-    floor = pd.to_numeric(df.get(norm_col("floor")), errors="coerce")
-    ba_raw = df.get(norm_col("building_age"))
-    building_age = ba_raw.map(_parse_building_age) if ba_raw is not None else np.nan
-    furn_raw = df.get(norm_col("furnished"))
-    furnished = furn_raw.map(_bool) if furn_raw is not None else False
-    is_apartment = prop.eq("Apartment").astype(int)
-    furn_apt = (furnished.astype(int) * is_apartment).astype(float)
-    X = pd.DataFrame({
-        "bedrooms": bedrooms,
-        "bathrooms": bathrooms,
-        "area_sqm": area,
-        "area_log": np.log1p(area),
-        "area_sq": np.square(np.clip(area, 0, None)),
-        "floor": floor,
-        "building_age": building_age,
-        "furn_apt": furn_apt,
-        "city": city,
-        "neighborhood": neigh,
-        "property_type": prop,
-        "furnished": furnished.astype(bool), 
-    })
-    bd = X["bedrooms"].fillna(0)
-    denom = np.clip(bd.replace(0, 1), 1, None)
-    X["area_per_bed"] = (X["area_sqm"] / denom).astype(float)
-    bins = [0, 60, 90, 120, 160, 220, 10000]
-    X["area_bin"] = pd.cut(X["area_sqm"], bins=bins, labels=False, include_lowest=True).astype("float")
+    df = feature_store.missing_as_category(feature_store.load(args.csv))
+    y = df["price"]
+    X = df[["bedrooms", "bathrooms", "area_sqm", "area_log", "area_sq", "floor", "building_age", "furn_apt",
+            "city", "neighborhood", "property_type"]].assign(
+        furnished=df["furnished"].fillna(False).astype(bool),
+        area_per_bed=df["area_per_bed"], area_bin=df["area_bin"])
     mask = y.notna() & X.notna().all(axis=1)
     X = X[mask]
     y2 = y[mask]
@@ -1,4 +1,4 @@
-import argparse, json, os, uuid, math, logging
+import argparse, hashlib, json, os, tempfile, time, uuid, math, logging
 from datetime import datetime
 import numpy as np, pandas as pd
 from joblib import dump
@@ -6,34 +6,16 @@ from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-from sklearn.model_selection import train_test_split, RandomizedSearchCV
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, KFold, ParameterSampler
 import xgboost as xgb
 from category_encoders import TargetEncoder
+from app.ml.predictor import export_native_artifact
+from scripts import cv_scheduler, feature_store, quantile_data
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def _parse_building_age(x):
-    if pd.isna(x): return np.nan
-    s = str(x).strip().lower()
-    if s in {"0–11 months","0-11 months","0 to 11 months","0–11 month"}: return 0.5
-    bands = {
-        "1-5 years": 3, "5-10 years": 7.5, "10-19 years": 15,
-        "20-29 years": 25, "30-39 years": 35, "40-49 years": 45
-    }
-    for k, v in bands.items():
-        if k in s: return float(v)
-    if "year" in s:
-        try: return float("".join(ch for ch in s if ch.isdigit() or ch==".")) 
-        except: return np.nan
-    try: return float(s)
-    except: return np.nan
-
-def _bool(v):
-    if isinstance(v, (bool, np.bool_)): return bool(v)
-    s = str(v).strip().lower()
-    return s in {"1","true","yes","y","t","فurnished","مفروش"}
-
 def _weights(df: pd.DataFrame) -> np.ndarray:
     w = np.ones(len(df), dtype=float)
     is_ap = df["property_type"].str.title().eq("Apartment")
@@ -51,109 +33,255 @@ def _onehot(**kw):
     except TypeError:
         return OneHotEncoder(handle_unknown="ignore", sparse=False, **kw)
 
+NUM = ["bedrooms","bathrooms","area_sqm","area_log","area_sq","area_per_bed","bed_per_bath","floor","building_age","furn_apt","area_bin"]
+TE_FEATS = ["city","neighborhood"]
+OH_FEATS = ["property_type"]
+
+def build_pipeline(seed: int) -> Pipeline:
+    """the untuned prep + XGBoost pipeline every v3 model is fit from"""
+    pre = ColumnTransformer(
+        transformers=[
+            ("num", "passthrough", NUM),
+            ("te", TargetEncoder(smoothing=10), TE_FEATS),
+            ("oh", _onehot(), OH_FEATS),
+        ],
+        remainder="drop",
+        verbose_feature_names_out=False,
+    )
+    xgb_model = xgb.XGBRegressor(
+        objective='reg:squarederror',
+        n_jobs=-1,
+        random_state=seed
+    )
+    return Pipeline([("prep", pre), ("xgb", xgb_model)])
+
+def training_frame(df: pd.DataFrame):
+    """(X, y, rows dropped as outliers) from a feature_store frame: complete rows inside the price/area bounds"""
+    df = feature_store.missing_as_category(df)
+    y = df["price"]
+    X = df[["bedrooms", "bathrooms", "area_sqm", "area_log", "area_sq", "floor", "building_age", "furn_apt",
+            "city", "neighborhood", "property_type"]].assign(
+        furnished=df["furnished"].fillna(False).astype(bool),
+        area_per_bed=df["area_per_bed"], bed_per_bath=df["bed_per_bath"], area_bin=df["area_bin"])
+    mask = y.notna() & X.notna().all(axis=1)
+    keep = df["in_range"][mask]
+    return X[mask][keep], y[mask][keep], int((~keep).sum())
+
+def furn_apt_dropout(X: pd.DataFrame, seed: int) -> None:
+    """zero furn_apt on ~40% of apartments (in place) so the model doesn't lean on it"""
+    rng = np.random.default_rng(seed)
+    apt_mask = X["property_type"].eq("Apartment").to_numpy()
+    drop = rng.random(len(X)) < 0.40
+    X.loc[apt_mask & drop, "furn_apt"] = 0.0
+
+def _sample_configs(space: dict, n: int, seed: int) -> list:
+    """n parameter dicts drawn from the grid; deterministic for a seed so a resumed search sees the same trials"""
+    rng = np.random.default_rng(seed)
+    keys = sorted(space)
+    return [{k: space[k][int(rng.integers(len(space[k])))] for k in keys} for _ in range(n)]
+
+def _load_trials(path: str, sig: str) -> dict:
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                rec = json.loads(line)
+                if rec.get("search") == sig:
+                    done[(rec["trial"], rec["rung"])] = rec
+    return done
+
+def _halving_splits(Xtr: pd.DataFrame, args) -> list:
+    if args.cv_folds > 1:
+        return list(KFold(n_splits=args.cv_folds, shuffle=True, random_state=args.seed).split(Xtr))
+    idx = np.arange(len(Xtr))
+    return [train_test_split(idx, test_size=args.val_frac, random_state=args.seed)]
+
+def _fold_arrays(pre, Xtr: pd.DataFrame, ytr_log: pd.Series, W: np.ndarray, splits: list,
+                 chunk_rows: int) -> list:
+    """per fold: prepped train/val matrices, log targets and train weights, with the prep fit on the fold's train part"""
+    folds = []
+    for fit_idx, val_idx in splits:
+        Xfit, Xval = Xtr.iloc[fit_idx], Xtr.iloc[val_idx]
+        yfit, yval = ytr_log.iloc[fit_idx], ytr_log.iloc[val_idx]
+        prep = clone(pre).fit(Xfit, yfit)
+        folds.append({"X_fit": quantile_data.encode(prep, Xfit, chunk_rows), "y_fit": yfit.to_numpy(),
+                      "w_fit": W[fit_idx], "X_val": quantile_data.encode(prep, Xval, chunk_rows),
+                      "y_val": yval.to_numpy()})
+    return folds
+
+def _log_trial(tag: str, rec: dict) -> None:
+    logger.info(f"{tag}: best_it={rec['best_iteration']} val MAE={rec['val_mae']:.0f} "
+                f"({rec['secs']:.1f}s, peak RSS {rec.get('peak_rss_mb', 0):.0f} MB)")
+
+def _random_search(sched: cv_scheduler.Scheduler, store: cv_scheduler.FoldStore, space: dict, n_iter: int, seed: int) -> dict:
+    """
+    RandomizedSearchCV's search (same sampled configs, unshuffled 3-fold
+    split, scored by MAE on log price) with the fits run by the scheduler.
+    """
+    configs = list(ParameterSampler(space, n_iter=n_iter, random_state=seed))
+    tasks = [{"params": dict({k.split("__", 1)[1]: v for k, v in c.items() if k != "xgb__n_estimators"},
+                             objective="reg:squarederror", seed=seed),
+              "rounds": c["xgb__n_estimators"], "early_stopping": None, "folds": store.folds} for c in configs]
+    results = {}
+    for i, res in sched.run(tasks):
+        results[i] = dict(res, best_iteration=configs[i]["xgb__n_estimators"])
+        _log_trial(f"trial {i:3d} ({len(results)}/{len(configs)})", results[i])
+    best = min(results, key=lambda i: results[i]["val_mae_log"])
+    logger.info(f"Random search: best trial {best} val MAE(log)={results[best]['val_mae_log']:.4f}")
+    return {"best_params": configs[best],
+            "search": {"mode": "random", "trial": best, "configs": len(configs),
+                       "val_mae_log": round(results[best]["val_mae_log"], 5),
+                       "trial_secs": [results[i]["secs"] for i in range(len(configs))],
+                       "trial_peak_rss_mb": [results[i]["peak_rss_mb"] for i in range(len(configs))]}}
+
+def _halving_search(sched: cv_scheduler.Scheduler, store: cv_scheduler.FoldStore, n: int, ysum: float,
+                    space: dict, args) -> dict:
+    """
+    Successive halving over early-stopped boosters. The prep is fit once per
+    fold (--cv-folds, or a single --val-frac holdout); every trial trains on
+    each fold's matrix and early-stops on its validation part. Rung r gives
+    each surviving config min_rounds * eta**r rounds (the last rung gets
+    max_rounds) and keeps the best 1/eta by mean validation MAE in JOD; a
+    config that early-stopped inside its budget on every fold is carried up
+    a rung as is. Each finished trial is appended to the JSONL log, and a
+    rerun with the same data/settings skips what's already there.
+    """
+    n_est = space.get("xgb__n_estimators", [3000])
+    max_rounds = max(n_est)
+    space = {k.split("__", 1)[1]: v for k, v in space.items() if k != "xgb__n_estimators"}
+
+    configs = _sample_configs(space, args.trials, args.seed)
+    sig = hashlib.sha1(json.dumps({
+        "n": n, "y": round(ysum, 6), "seed": args.seed, "trials": args.trials,
+        "eta": args.halving_eta, "min_rounds": args.min_rounds, "max_rounds": max_rounds,
+        "cv_folds": args.cv_folds, "val_frac": args.val_frac, "early_stopping": args.early_stopping,
+        "space": space,
+    }, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    done = _load_trials(args.trials_log, sig)
+    if done:
+        logger.info(f"Resuming search {sig}: {len(done)} trials already in {args.trials_log}")
+    log_f = open(args.trials_log, "a") if args.trials_log else None
+
+    alive = list(range(len(configs)))
+    rung, rounds, total_rounds = 0, args.min_rounds, 0
+    results = {}
+    try:
+        while True:
+            last = rounds >= max_rounds or len(alive) <= 1
+            rounds = max_rounds if last else rounds
+            todo = []
+            for t in alive:
+                rec = done.get((t, rung))
+                prev = results.get(t)
+                if rec is None and prev and max(prev["fold_iterations"]) + args.early_stopping < prev["rounds"]:
+                    # stopped early under the smaller budget: more rounds would train the same boosters
+                    rec = dict(prev, rung=rung, rounds=rounds, secs=0.0)
+                if rec is None:
+                    todo.append(t)
+                else:
+                    results[t] = rec
+                    _log_trial(f"rung {rung} trial {t:3d} rounds<={rounds}", rec)
+            tasks = [{"params": dict(configs[t], objective="reg:squarederror", eval_metric="mae",
+                                     tree_method="hist", seed=args.seed),
+                      "rounds": rounds, "early_stopping": args.early_stopping, "folds": store.folds} for t in todo]
+            for i, res in sched.run(tasks):
+                t = todo[i]
+                total_rounds += res["rounds_trained"]
+                its = res["fold_iterations"]
+                rec = {"search": sig, "trial": t, "rung": rung, "rounds": rounds,
+                       "params": configs[t], "best_iteration": int(round(np.mean(its))),
+                       "fold_iterations": its, "val_mae": res["val_mae"],
+                       "secs": res["secs"], "peak_rss_mb": res["peak_rss_mb"]}
+                if log_f:
+                    log_f.write(json.dumps(rec, default=str) + "\n")
+                    log_f.flush()
+                results[t] = rec
+                _log_trial(f"rung {rung} trial {t:3d} rounds<={rounds}", rec)
+            if last:
+                break
+            alive = sorted(alive, key=lambda t: results[t]["val_mae"])[:max(1, len(alive) // args.halving_eta)]
+            rung += 1
+            rounds *= args.halving_eta
+    finally:
+        if log_f:
+            log_f.close()
+    best = min(alive, key=lambda t: results[t]["val_mae"])
+    rec = results[best]
+    logger.info(f"Halving search: best trial {best} val MAE={rec['val_mae']:.0f} "
+                f"({rec['best_iteration']} rounds); {total_rounds} boosting rounds trained this run")
+    out = {f"xgb__{k}": v for k, v in rec["params"].items()}
+    out["xgb__n_estimators"] = rec["best_iteration"]
+    return {"best_params": out, "search": {"mode": "halving", "id": sig, "trial": best,
+                                           "val_mae": round(rec["val_mae"], 2), "configs": len(configs)}}
+
+def _native_fit(pre, best_params: dict, X: pd.DataFrame, y_log: pd.Series, W: np.ndarray, args) -> Pipeline:
+    """
+    --engine native final fit: the prep is fit once, the rows are encoded to
+    float32 chunks on disk and the booster trains with hist trees on a
+    QuantileDMatrix streamed from them. Returns the same prep + XGBRegressor
+    pipeline as the sklearn path, so the artifact and its native export
+    serve identically.
+    """
+    prep = clone(pre).fit(X, y_log)
+    params = {k.split("__", 1)[1]: v for k, v in best_params.items() if k != "xgb__n_estimators"}
+    params.update(objective="reg:squarederror", tree_method="hist", seed=args.seed)
+    with tempfile.TemporaryDirectory(prefix="aqarak-native-") as tmp:
+        chunks = quantile_data.write_chunks(prep, X, y_log.to_numpy(), W, tmp, args.chunk_rows)
+        dtrain = quantile_data.quantile_matrix(chunks, external_memory=args.external_memory, cache_dir=tmp)
+        bst = xgb.train(params, dtrain, num_boost_round=int(best_params.get("xgb__n_estimators", 100)))
+        del dtrain
+        bst.save_model(os.path.join(tmp, "booster.ubj"))
+        reg = xgb.XGBRegressor()
+        reg.load_model(os.path.join(tmp, "booster.ubj"))
+    reg.n_jobs = -1
+    return Pipeline([("prep", prep), ("xgb", reg)])
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--csv", required=True, help="Path to the training CSV file")
     ap.add_argument("--outdir", default="models", help="Directory to save the model and metadata")
     ap.add_argument("--seed", type=int, default=42, help="Random seed")
-    ap.add_argument("--trials", type=int, default=20, help="Number of hyperparameter search trials")
+    ap.add_argument("--trials", type=int, default=20, help="Number of configurations for --search halving")
+    ap.add_argument("--search", choices=["random", "halving"], default="random",
+                    help="random: 50 sampled configs x 3-fold full fits; halving: early stopping + successive halving")
+    ap.add_argument("--halving-eta", type=int, default=3, help="keep 1/eta of the configs per rung")
+    ap.add_argument("--min-rounds", type=int, default=100, help="boosting rounds at the first rung")
+    ap.add_argument("--early-stopping", type=int, default=50, help="early-stopping patience, in rounds")
+    ap.add_argument("--cv-folds", type=int, default=3, help="folds each halving trial is scored on; 1 = one --val-frac holdout")
+    ap.add_argument("--val-frac", type=float, default=0.2, help="validation share with --cv-folds 1")
+    ap.add_argument("--workers", type=int, default=0,
+                    help="search worker processes (default: AQARAK_TRAIN_WORKERS, else a split of the cores)")
+    ap.add_argument("--threads", type=int, default=0,
+                    help="booster threads per search worker (default: AQARAK_TRAIN_THREADS, else cores / workers)")
+    ap.add_argument("--engine", choices=["sklearn", "native"], default="sklearn",
+                    help="native: float32 chunks + QuantileDMatrix/hist for the search and the final fit")
+    ap.add_argument("--chunk-rows", type=int, default=200000, help="rows encoded (and spilled, with --engine native) per chunk")
+    ap.add_argument("--external-memory", action="store_true",
+                    help="with --engine native: keep the final fit's quantized pages on disk (ExtMemQuantileDMatrix)")
+    ap.add_argument("--trials-log", default=None,
+                    help="JSONL trial log (default <outdir>/halving_trials.jsonl); rerunning with the same settings resumes")
     args = ap.parse_args()
 
     os.makedirs(args.outdir, exist_ok=True)
+    if args.trials_log is None:
+        args.trials_log = os.path.join(args.outdir, "halving_trials.jsonl")
     logger.info(f"Loading data from {args.csv}...")
-    df = pd.read_csv(args.csv)
-
-    def norm_col(name):
-        m = {c.strip().lower().replace(" ","_"): c for c in df.columns}
-        return m.get(name, name)
-    logger.info("Preprocessing data...")
-    y = pd.to_numeric(df[norm_col("price")], errors="coerce")
-    prop = df[norm_col("property_type")].astype(str).str.title()
-    city = df[norm_col("city")].astype(str)
-    neigh = df[norm_col("neighborhood")].astype(str)
-    bedrooms = pd.to_numeric(df.get(norm_col("bedrooms")), errors="coerce")
-    bathrooms = pd.to_numeric(df.get(norm_col("bathrooms")), errors="coerce")
-    area = pd.to_numeric(df.get(norm_col("area_sqm")), errors="coerce")
-    floor = pd.to_numeric(df.get(norm_col("floor")), errors="coerce")
-    ba_raw = df.get(norm_col("building_age"))
-    building_age = ba_raw.map(_parse_building_age) if ba_raw is not None else np.nan
-    furn_raw = df.get(norm_col("furnished"))
-    furnished = furn_raw.map(_bool) if furn_raw is not None else False
-    is_apartment = prop.eq("Apartment").astype(int)
-    furn_apt = (furnished.astype(int) * is_apartment).astype(float)
-    X = pd.DataFrame({
-        "bedrooms": bedrooms,
-        "bathrooms": bathrooms,
-        "area_sqm": area,
-        "area_log": np.log1p(area),
-        "area_sq": np.square(np.clip(area, 0, None)),
-        "floor": floor,
-        "building_age": building_age,
-        "furn_apt": furn_apt,
-        "city": city,
-        "neighborhood": neigh,
-        "property_type": prop,
-        "furnished": furnished.astype(bool), 
-    })
-
-    bd = X["bedrooms"].fillna(0)
-    ba = X["bathrooms"].replace(0, 1).fillna(1)
-    denom = np.clip(bd.replace(0, 1), 1, None)
-    X["area_per_bed"] = (X["area_sqm"] / denom).astype(float)
-    X["bed_per_bath"] = (bd / ba).astype(float)
-    
-    bins = [0, 60, 90, 120, 160, 220, 10000]
-    X["area_bin"] = pd.cut(X["area_sqm"], bins=bins, labels=False, include_lowest=True).astype("float")
-    mask = y.notna() & X.notna().all(axis=1)
-    X = X[mask]
-    y2 = y[mask]
-    df_train = X.copy()
-    df_train['price'] = y2
-    
-    initial_len = len(df_train)
-    
-    df_train = df_train[df_train['price'] >= 10000]  
-    df_train = df_train[df_train['price'] <= 5000000]
-    df_train = df_train[df_train['area_sqm'] >= 20]
-    df_train = df_train[df_train['area_sqm'] <= 20000]
-    df_train['price_per_sqm'] = df_train['price'] / df_train['area_sqm']
-    df_train = df_train[df_train['price_per_sqm'] >= 100]
-    df_train = df_train[df_train['price_per_sqm'] <= 10000] 
-    df_train = df_train.drop(columns=['price_per_sqm'])
-
-    logger.info(f"Dropped {initial_len - len(df_train)} rows due to outlier filtering.")
-    
-    X = df_train.drop(columns=['price'])
-    y2 = df_train['price']
+    # cleaned/typed/featurized once per CSV + prep version (scripts/feature_store.py)
+    df = feature_store.load(args.csv)
+    X, y2, dropped = training_frame(df)
+    logger.info(f"Dropped {dropped} rows due to outlier filtering.")
 
     logger.info(f"Dataset size after cleaning: {len(X)}")
     Xtr, Xte, ytr, yte = train_test_split(X, y2, test_size=0.2, random_state=args.seed)
     ytr_log = np.log1p(ytr)
-    rng = np.random.default_rng(args.seed)
-    apt_mask = Xtr["property_type"].eq("Apartment").to_numpy()
-    drop = rng.random(len(Xtr)) < 0.40
-    Xtr.loc[apt_mask & drop, "furn_apt"] = 0.0
+    furn_apt_dropout(Xtr, args.seed)
     
-    num = ["bedrooms","bathrooms","area_sqm","area_log","area_sq","area_per_bed","bed_per_bath","floor","building_age","furn_apt","area_bin"]
-    te_feats = ["city","neighborhood"]
-    oh_feats = ["property_type"]
-
-    pre = ColumnTransformer(
-        transformers=[
-            ("num", "passthrough", num),
-            ("te", TargetEncoder(smoothing=10), te_feats),
-            ("oh", _onehot(), oh_feats),
-        ],
-        remainder="drop",
-        verbose_feature_names_out=False,
-    )
-    xgb_model = xgb.XGBRegressor(
-        objective='reg:squarederror',
-        n_jobs=-1,
-        random_state=args.seed
-    )
-
-    pipeline = Pipeline([("prep", pre), ("xgb", xgb_model)])
+    num, te_feats, oh_feats = NUM, TE_FEATS, OH_FEATS
+    pipeline = build_pipeline(args.seed)
+    pre = pipeline.named_steps["prep"]
     logger.info("Starting hyperparameter tuning...")
     param_dist = {
         'xgb__n_estimators': [500, 800, 1000, 1500, 2000, 2500, 3000],
@@ -170,20 +298,32 @@ def main():
                 area_sqm=Xtr["area_sqm"],
                 furnished=Xtr["furnished"])
     )
-    search = RandomizedSearchCV(
-        pipeline,
-        param_distributions=param_dist,
-        n_iter=50,
-        scoring='neg_mean_absolute_error',
-        cv=3,
-        verbose=1,
-        random_state=args.seed,
-        n_jobs=-1
-    )
-    search.fit(Xtr.drop(columns=["furnished"]), ytr_log, xgb__sample_weight=W_train)
-
-    best_model = search.best_estimator_
-    logger.info(f"Best parameters found: {search.best_params_}")
+    Xfit = Xtr.drop(columns=["furnished"])
+    W_train = np.asarray(W_train, dtype=float)
+    if args.search == "halving":
+        splits, n_tasks = _halving_splits(Xfit, args), args.trials
+    else:
+        splits, n_tasks = list(KFold(n_splits=3).split(Xfit)), 50
+    workers, threads = cv_scheduler.core_split(n_tasks, args.workers, args.threads)
+    logger.info(f"Search on {workers} worker(s) x {threads} booster thread(s)")
+    t_search = time.perf_counter()
+    with cv_scheduler.FoldStore(_fold_arrays(pre, Xfit, ytr_log, W_train, splits, args.chunk_rows)) as store, \
+            cv_scheduler.Scheduler(workers, threads, quantile=args.engine == "native") as sched:
+        if args.search == "halving":
+            res = _halving_search(sched, store, len(Xfit), float(ytr_log.sum()), param_dist, args)
+        else:
+            res = _random_search(sched, store, param_dist, 50, args.seed)
+    best_params, search_info = res["best_params"], res["search"]
+    search_info.update(workers=workers, threads=threads, wall_secs=round(time.perf_counter() - t_search, 1))
+    logger.info(f"Search finished in {search_info['wall_secs']}s")
+    t_fit = time.perf_counter()
+    if args.engine == "native":
+        best_model = _native_fit(pre, best_params, Xfit, ytr_log, W_train, args)
+    else:
+        best_model = clone(pipeline).set_params(**best_params)
+        best_model.fit(Xfit, ytr_log, xgb__sample_weight=W_train)
+    logger.info(f"Final {args.engine} fit in {time.perf_counter() - t_fit:.1f}s")
+    logger.info(f"Best parameters found: {best_params}")
     logger.info("Evaluating best model...")
     pred_log = best_model.predict(Xte.drop(columns=["furnished"]))
     pred_te = np.expm1(pred_log)
@@ -230,10 +370,20 @@ def main():
             "N_train": int(len(Xtr)),
             "N_test": int(len(Xte)),
         },
-        "best_params": search.best_params_,
+        "best_params": best_params,
+        "search": search_info,
+        "engine": args.engine,
         "features": {"numeric": num, "target_encoded": te_feats, "onehot": oh_feats},
         "config": {"apt_furnished_cap_frac": 0.02}
     }
+    try:
+        native = export_native_artifact(best_model, mpath)
+    except Exception as e:
+        native = None
+        logger.warning(f"Native export failed: {e}")
+    if native:
+        meta["native"] = native
+        logger.info(f"Native booster/prep written: {native}")
     
     json_path = os.path.join(args.outdir, f"aqarak_price_model_xgb_{mid}.json")
     with open(json_path, "w") as f:
@@ -0,0 +1,21 @@
+import os
+from pathlib import Path
+import pandas as pd
+import pytest
+
+BACKEND = Path(__file__).resolve().parents[1]
+EVAL_CSV = BACKEND / "data" / "eval-cleaned-data.csv"
+
+# before app.api.ml_price_router is imported: the shipped model, no watcher, no redis tier, no sidecar
+os.environ.setdefault("AQARAK_MODEL_PATH", str(BACKEND / "models" / "aqarak_price_model_latest.joblib"))
+os.environ["AQARAK_MODEL_WATCH_S"] = "0"
+os.environ.pop("AQARAK_PRED_CACHE_REDIS", None)
+os.environ.pop("AQARAK_ML_SOCKET", None)
+
+@pytest.fixture(scope="session")
+def eval_df() -> pd.DataFrame:
+    return pd.read_csv(EVAL_CSV)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,15 @@
+import numpy as np
+from scripts import feature_store
+
+def test_missing_categories_stay_missing(eval_df):
+    df = eval_df.head(20).copy()
+    df.loc[0, "city"] = np.nan
+    df.loc[1, "neighborhood"] = None
+    df.loc[2, "property_type"] = np.nan
+    out = feature_store.prepare(df)
+    assert out[feature_store.CATEGORICAL].isna().sum().tolist() == [1, 1, 1]
+    assert len(out.dropna(subset=feature_store.CATEGORICAL)) == 17
+    # trainers keep them as their own category
+    cats = feature_store.missing_as_category(out)
+    assert cats.loc[[0, 1, 2], feature_store.CATEGORICAL].notna().all().all()
+    assert cats.loc[2, "property_type"] == "Nan"
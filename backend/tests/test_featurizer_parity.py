@@ -0,0 +1,27 @@
+"""featurize() must build exactly the columns the baseline _build_frame() does"""
+import numpy as np
+import pytest
+from app.ml.predictor import CompiledModel, _build_frame, featurize, load_model
+from scripts.check_featurizer_parity import _compare, _records
+
+@pytest.fixture(scope="module")
+def rows(eval_df):
+    return _records(eval_df.drop(columns=["price"]))
+
+def _variant(rows, tag):
+    if tag == "neutral":
+        return [dict(r, neighborhood="") for r in rows]
+    if tag == "sparse":
+        return [{k: v for k, v in r.items() if v is not None} for r in rows]
+    return rows
+
+@pytest.mark.parametrize("tag", ["eval", "neutral", "sparse"])
+def test_features_match_build_frame(rows, tag):
+    assert _compare(_variant(rows, tag)) == []
+
+def test_model_predictions_match_build_frame(rows):
+    model = load_model(None, prefer_native=False)
+    y_ref = np.asarray(model.predict(_build_frame(rows)))
+    np.testing.assert_array_equal(np.asarray(model.predict(featurize(rows).to_frame())), y_ref)
+    if isinstance(model, CompiledModel):
+        np.testing.assert_array_equal(np.asarray(model.predict(featurize(rows))), y_ref)
@@ -0,0 +1,90 @@
+import io
+import os
+import time
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from app.api import ml_price_router as MLR
+from app.ml.jobs import JobError, JobManager
+
+CSV = b"area_sqm,city\n100,Amman\n200,Irbid\n"
+
+def _manager(root, **kw):
+    return JobManager(root, prepare_fn=dict, predict_fn=lambda rows: [float(r["area_sqm"]) for r in rows], **kw)
+
+def _run(jm, name="rows.csv", body=CSV):
+    job = jm.create(name)
+    jm.spool(job, io.BytesIO(body))
+    jm.submit(job)
+    deadline = time.monotonic() + 5.0
+    while job.status not in ("done", "failed"):
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return job
+
+def _age(job, secs):
+    st = job.dir / "status.json"
+    t = os.stat(st).st_mtime - secs
+    os.utime(st, (t, t))
+
+def test_spool_and_score(tmp_path):
+    job = _run(_manager(tmp_path))
+    assert job.status == "done" and job.rows_total == 2
+    assert job.result_path.read_text().splitlines()[1:] == ["100,Amman,100.0,", "200,Irbid,200.0,"]
+
+def test_spool_enforces_max_bytes(tmp_path):
+    jm = _manager(tmp_path, max_bytes=len(CSV) - 1)
+    with pytest.raises(JobError):
+        jm.spool(jm.create("rows.csv"), io.BytesIO(CSV))
+
+def test_sweep_drops_expired_jobs_and_files(tmp_path):
+    jm = _manager(tmp_path, ttl_s=3600)
+    old, new = _run(jm), _run(jm)
+    _age(old, 7200)
+    assert jm.sweep() == 1
+    assert not old.dir.exists() and jm.get(old.job_id) is None
+    assert jm.get(new.job_id).status == "done"
+
+def test_sweep_keeps_at_most_max_jobs(tmp_path):
+    jm = _manager(tmp_path, max_jobs=2)
+    jobs = [_run(jm) for _ in range(4)]
+    for i, job in enumerate(jobs):
+        _age(job, 100 - i)
+    assert jm.sweep() == 2
+    assert [jm.get(j.job_id) is not None for j in jobs] == [False, False, True, True]
+
+def test_sweep_leaves_unfinished_jobs(tmp_path):
+    jm = _manager(tmp_path, ttl_s=1, max_jobs=1)
+    job = jm.create("rows.csv")
+    jm.spool(job, io.BytesIO(CSV))
+    os.utime(job.dir, (0, 0))
+    assert jm.sweep() == 0 and job.dir.exists()
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.include_router(MLR.router)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+@pytest.mark.anyio
+async def test_upload_over_cap_is_rejected_before_reading(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(MLR, "_jobs", _manager(tmp_path, max_bytes=1024))
+    big = b"area_sqm,city\n" + b"100,Amman\n" * 20000
+    r = await client.post("/ml/price/jobs", files={"file": ("rows.csv", big, "text/csv")})
+    assert r.status_code == 413
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.anyio
+async def test_upload_round_trip(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(MLR, "_jobs", _manager(tmp_path))
+    r = await client.post("/ml/price/jobs", files={"file": ("rows.csv", CSV, "text/csv")})
+    assert r.status_code == 202, r.text
+    job = MLR._jobs.get(r.json()["job_id"])
+    deadline = time.monotonic() + 5.0
+    while job.status != "done":
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    r = await client.get(f"/ml/price/jobs/{job.job_id}/result")
+    assert r.status_code == 200
+    assert r.text.splitlines()[1:] == ["100,Amman,100.0,", "200,Irbid,200.0,"]
@@ -0,0 +1,169 @@
+"""
+/ml/price end to end over httpx: the vectorized rules, the prediction cache
+and the micro-batcher must return what the baseline row-at-a-time
+controlled prediction returned.
+"""
+import asyncio
+import math
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from app.api import ml_price_router as MLR
+from app.ml import postprocess as PP
+from app.ml.predictor import predict_one
+
+PER_PTYPE = 12
+
+@pytest.fixture(scope="module")
+def app():
+    a = FastAPI()
+    a.include_router(MLR.router)
+    return a
+
+@pytest.fixture
+async def client(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+def _opt(v):
+    return None if v is None or (isinstance(v, float) and math.isnan(v)) else float(v)
+
+@pytest.fixture(scope="module")
+def bodies(eval_df):
+    """PriceInput bodies from the eval set, every property type and floor range"""
+    df = eval_df.dropna(subset=["bedrooms", "bathrooms", "area_sqm", "city", "neighborhood", "property_type", "furnished"])
+    df = df.groupby("property_type").sample(n=PER_PTYPE, random_state=0)
+    return [{
+        "bedrooms": int(r.bedrooms), "bathrooms": int(r.bathrooms), "area_sqm": float(r.area_sqm),
+        "floor": _opt(r.floor), "total_floors": _opt(r.total_floors), "building_age": _opt(r.building_age),
+        "city": r.city, "neighborhood": r.neighborhood, "property_type": r.property_type,
+        "furnished": bool(r.furnished),
+    } for r in df.itertuples()]
+
+# the per-row rules as the router applied them before they moved to app/ml/postprocess.py
+
+def _market_blend(y, payload):
+    area = float(payload.get("area_sqm") or 0.0)
+    if area <= 0 or y <= 0:
+        return y
+    y_market = max(1.0, PP.psqm_baseline(payload.get("city"), payload.get("neighborhood"),
+                                         payload.get("property_type"))) * area
+    return y if y_market <= y else float(y * (y_market / y) ** PP.MARKET_BLEND)
+
+def _neigh_blend(model, payload):
+    y0 = predict_one(model, dict(payload, neighborhood=""))
+    y1 = predict_one(model, payload)
+    return _market_blend(y0 + PP.NEIGHBORHOOD_BLEND * (y1 - y0), payload)
+
+def _apt_floor_factor(floor):
+    try:
+        f = int(round(float(floor)))
+    except (TypeError, ValueError):
+        return 1.0
+    if f == 0:
+        return 1.0 + PP.APT_GF_PREMIUM
+    if f > 0:
+        return max(0.0, 1.0 - min(PP.APT_UP_CAP, max(0, f - 1) * PP.APT_UP_STEP))
+    base = max(0.0, 1.0 - PP.APT_B1_DROP)
+    if f == -1:
+        return base
+    return max(1.0 - PP.APT_B1_DROP - PP.APT_DOWN_CAP, base * (1.0 - PP.APT_DOWN_STEP) ** (abs(f) - 1))
+
+def _floor_adj(y, floor, pt):
+    y = max(0.0, y)
+    if pt == "Apartment":
+        return y * _apt_floor_factor(floor)
+    if pt in PP.HV_TYPES:
+        try:
+            stories = max(1, int(round(float(floor or 1))))
+        except (TypeError, ValueError):
+            stories = 1
+        return y * (1.0 + min(PP.HV_STORIES_CAP, (stories - 1) * PP.HV_STORIES_STEP))
+    return y
+
+def _reference(model, payload):
+    base = {k: v for k, v in payload.items() if v is not None}
+    pt = str(base.get("property_type", "")).strip().title()
+    y_t = _neigh_blend(model, dict(base, furnished=True))
+    y = y_t if base.get("furnished", False) else y_t * (1.0 - PP.UNFURNISHED_PCT)
+    return _floor_adj(y, base.get("floor"), pt)
+
+def _expected(bodies):
+    model = MLR._get_model()
+    return [round(max(0.0, _reference(model, MLR._normalize(dict(b)))), 2) for b in bodies]
+
+def test_reference_rules_match_config():
+    # _reference only covers the shipped rule configuration
+    assert PP.FURNISHED_ALL_PTYPES and PP.FURNISHED_ANCHOR == "furnished"
+
+@pytest.mark.anyio
+async def test_predict_matches_row_at_a_time_rules(client, bodies):
+    MLR._cache.clear()
+    got = []
+    for b in bodies:
+        r = await client.post("/ml/price/predict", json=b)
+        assert r.status_code == 200, r.text
+        got.append(r.json()["price_jod"])
+    np.testing.assert_allclose(got, _expected(bodies), rtol=0, atol=0.011)
+
+@pytest.mark.anyio
+async def test_predict_batch_matches_predict(client, bodies):
+    r = await client.post("/ml/price/predict-batch", json={"rows": bodies})
+    assert r.status_code == 200, r.text
+    np.testing.assert_allclose(r.json()["prices_jod"], _expected(bodies), rtol=0, atol=0.011)
+
+@pytest.mark.anyio
+async def test_repeat_request_is_served_from_cache(client, bodies):
+    MLR._cache.clear()
+    first = await client.post("/ml/price/predict", json=bodies[0])
+    before = MLR._cache.stats()
+    second = await client.post("/ml/price/predict", json=bodies[0])
+    after = MLR._cache.stats()
+    assert second.json() == first.json()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"]
+
+@pytest.mark.anyio
+async def test_concurrent_requests_are_batched(client, bodies, monkeypatch):
+    MLR._cache.clear()
+    monkeypatch.setattr(MLR._batcher, "window_s", 0.05)
+    batches = MLR._batcher.batches
+    rs = await asyncio.gather(*(client.post("/ml/price/predict", json=b) for b in bodies))
+    assert all(r.status_code == 200 for r in rs)
+    assert MLR._batcher.batches - batches < len(bodies)
+    np.testing.assert_allclose([r.json()["price_jod"] for r in rs], _expected(bodies), rtol=0, atol=0.011)
+
+@pytest.mark.anyio
+async def test_bad_property_type_is_rejected(client, bodies):
+    r = await client.post("/ml/price/predict", json=dict(bodies[0], property_type="Castle"))
+    assert r.status_code == 422
+
+@pytest.mark.anyio
+async def test_surface_grid(client, bodies):
+    req = {"base": bodies[0], "axes": [{"field": "area_sqm", "start": 100, "stop": 200, "step": 50},
+                                       {"field": "furnished"}]}
+    r = await client.post("/ml/price/surface", json=req)
+    assert r.status_code == 200, r.text
+    assert np.asarray(r.json()["prices_jod"]).shape == (3, 2)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("axes,status", [
+    ([{"field": "area_sqm", "start": 1, "stop": 1e12, "step": 1e-6}], 400),
+    ([{"field": "area_sqm", "start": 100, "stop": 1e308, "step": 1e-300}], 400),
+    ([{"field": "area_sqm", "start": 1, "stop": 100, "step": 1},
+      {"field": "building_age", "start": 0, "stop": 99, "step": 1}], 400),
+    ([{"field": "area_sqm", "values": [100.0] * (MLR.SURFACE_MAX_POINTS + 1)}], 422),
+])
+async def test_surface_rejects_oversized_grids(client, bodies, axes, status):
+    r = await client.post("/ml/price/surface", json={"base": bodies[0], "axes": axes})
+    assert r.status_code == status, r.text
+
+@pytest.mark.anyio
+async def test_predict_failure_is_logged(client, bodies, monkeypatch, caplog):
+    async def boom(payload):
+        raise ValueError("model exploded")
+    monkeypatch.setattr(MLR._batcher, "submit", boom)
+    r = await client.post("/ml/price/predict", json=bodies[0])
+    assert r.status_code == 400 and r.json()["detail"] == "model exploded"
+    assert any(rec.name == MLR.__name__ and rec.exc_info for rec in caplog.records)
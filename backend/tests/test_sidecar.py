@@ -0,0 +1,70 @@
+import os
+import socketserver
+import threading
+import time
+import numpy as np
+import pytest
+from app.api import ml_price_router as MLR
+from app.ml import sidecar as SC
+
+ROWS = [dict(r) for r in MLR._WARMUP_ROWS]
+
+def _serve(path, handler):
+    srv = SC._Server(path, handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv
+
+@pytest.fixture
+def sock_path(tmp_path):
+    return os.path.join(str(tmp_path), "ml.sock")
+
+def test_round_trip_matches_local(sock_path, monkeypatch):
+    srv = _serve(sock_path, SC._Handler)
+    try:
+        client = SC.SidecarClient(sock_path)
+        rows = MLR.normalize_records([dict(r) for r in ROWS])
+        ys = client.predict(rows)
+        np.testing.assert_array_equal(ys, MLR._predict_controlled_batch(MLR._get_model(), rows))
+        assert client.model_id == MLR._get_state().model_id
+        # a client-mode worker reports the sidecar's cache, not its own idle one
+        asked = []
+        info = client.info
+        monkeypatch.setattr(client, "info", lambda: asked.append(1) or info())
+        monkeypatch.setattr(MLR, "_sidecar", client)
+        assert MLR.price_meta()["cache"] == MLR._cache.stats()
+        assert asked
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+class _Flaky(socketserver.BaseRequestHandler):
+    """first connection: header, half the prices, then stalls; later ones answer properly"""
+    conns = 0
+
+    def handle(self):
+        type(self).conns += 1
+        first = type(self).conns == 1
+        while True:
+            try:
+                _, _, n = SC._HDR.unpack(SC._recv_exact(self.request, SC._HDR.size))
+            except ConnectionError:
+                return
+            SC.decode_rows(n, self.request)
+            body = np.arange(n, dtype="<f8").tobytes()
+            if first:
+                self.request.sendall(SC._response(0, n, "m", body[:8]))
+                time.sleep(1.0)
+                return
+            self.request.sendall(SC._response(0, n, "m", body))
+
+def test_partial_body_drops_the_connection(sock_path):
+    _Flaky.conns = 0
+    srv = _serve(sock_path, _Flaky)
+    try:
+        client = SC.SidecarClient(sock_path, timeout=0.2)
+        for _ in range(3):
+            np.testing.assert_array_equal(client.predict(ROWS), np.arange(len(ROWS), dtype=float))
+        assert _Flaky.conns == 2
+    finally:
+        srv.shutdown()
+        srv.server_close()
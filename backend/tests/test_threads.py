@@ -0,0 +1,11 @@
+import os
+from app.ml import threads
+from app.ml.predictor import load_model
+
+def test_load_model_leaves_process_pools_alone(monkeypatch):
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    monkeypatch.setattr(threads, "_native_limited", False)
+    load_model(None)
+    load_model(None, prefer_native=False)
+    assert "OMP_NUM_THREADS" not in os.environ
+    assert not threads._native_limited